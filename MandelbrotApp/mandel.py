@@ -1,13 +1,749 @@
 from __future__ import division
 import numpy as np
-from numba import vectorize, guvectorize
+from numba import jit
+import threading
+import multiprocessing
 import time
 
+_is_warm = False
 
-def mandel(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound):
+# default number of threads used for the computation of the mandelbrot set
+default_n_threads = multiprocessing.cpu_count()
+
+# trigger for detecting points inside of the mandelbrot set early (main cardioid, period-2 bulb and periodic orbits).
+# The result does not change, only the computation is faster. Turn off for verification.
+check_interior = True
+
+# rectangles with fewer rows or columns are not subdivided any further by the Mariani-Silver algorithm
+mariani_silver_min_size = 8
+
+# iteration index assigned to points, which are known to be inside of the mandelbrot set. See iterate_mandelbrot_state.
+interior_index = np.iinfo(np.int64).max
+
+# number of rows a thread computes between two checks for cancellation of the computation. See run_rows.
+cancel_rows = 8
+
+
+class ComputationCancelled(Exception):
     """
-    computes the mandelbrot set for a part of the complex plane (computation region). The region is discretized
-    by only computing certain pixel values (corresponding to a given resolution).
+    raised, if a computation of the mandelbrot set has been cancelled (see run_rows).
+    """
+    pass
+
+
+@jit('boolean(float64, float64)', nopython=True, nogil=True, cache=True)
+def is_in_cardioid_or_bulb(c_re, c_im):
+    """
+    checks, whether the point c = [c_re,c_im] lies inside the main cardioid or inside the period-2 bulb of the
+    mandelbrot set. These points never escape.
+    :param c_re: real part of point in the complex plane
+    :param c_im: imaginary part of point in the complex plane
+    :return: True, if the point is inside of the main cardioid or the period-2 bulb
+    """
+    # main cardioid
+    x = c_re - .25
+    yy = c_im * c_im
+    q = x * x + yy
+    if q * (q + x) <= .25 * yy:
+        return True
+    # period-2 bulb
+    x = c_re + 1
+    return x * x + yy <= .0625
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def escape_time_z0(z_re, z_im, c_re, c_im, iterate_max, iteration_bound, check_periodicity):
+    """
+    Calculate the sequence z_n+1 = z_n**2 + c with z_0 = [z_re,z_im] for a single parameter c = [c_re,c_im] until it
+    escapes. For z_0 = 0 this is the mandelbrot sequence of c, for a fixed c and varying z_0 this gives the julia set of
+    c. If check_periodicity is True, the orbit is checked for periodicity using Brent's algorithm: the value of the
+    sequence is saved at the iterations 1, 2, 4, 8, ... and compared with the following values. If a value repeats
+    exactly, the sequence is periodic and never escapes. Since the comparison is exact, the result is identical to the
+    result without checks.
+    :param z_re: real part of the starting value
+    :param z_im: imaginary part of the starting value
+    :param c_re: real part of the parameter
+    :param c_im: imaginary part of the parameter
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the sequence
+    :param check_periodicity: trigger for detecting periodic orbits
+    :return: index of the first value of the sequence exceeding the iteration bound (or iterate_max, if the sequence
+    does not escape) and the squared absolute value of this value of the sequence.
+    """
+    re = z_re
+    im = z_im
+    xx = 0.0
+    yy = 0.0
+    count = iterate_max
+    re_saved = z_re  # z_0 is the first saved value of the sequence
+    im_saved = z_im
+    it_saved = 1
+    for it_n in xrange(iterate_max + 1):
+        xx = re * re
+        yy = im * im
+        xy = re * im
+        re = xx - yy + c_re
+        im = 2 * xy + c_im
+        if (xx + yy) > iteration_bound:
+            count = it_n
+            break
+        if check_periodicity:
+            if re == re_saved and im == im_saved:  # periodic orbit
+                break
+            if it_n == it_saved:
+                re_saved = re
+                im_saved = im
+                it_saved *= 2
+    return count, xx + yy
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def escape_time(c_re, c_im, iterate_max, iteration_bound, check_interior):
+    """
+    Calculate the mandelbrot sequence for a single point c = [c_re,c_im] in the complex plane until it escapes.
+    If check_interior is True, points inside of the main cardioid and the period-2 bulb are not iterated at all and
+    periodic orbits are detected (see escape_time_z0). The result is identical to the result without checks, except for
+    points within rounding errors of the boundary of the cardioid or the bulb.
+    :param c_re: real part of point in the complex plane
+    :param c_im: imaginary part of point in the complex plane
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param check_interior: trigger for detecting points inside of the mandelbrot set early
+    :return: index of the first value of the sequence exceeding the iteration bound (or iterate_max, if the sequence
+    does not escape) and the squared absolute value of this value of the sequence.
+    """
+    if check_interior and is_in_cardioid_or_bulb(c_re, c_im):
+        return iterate_max, 0.0
+    return escape_time_z0(0.0, 0.0, c_re, c_im, iterate_max, iteration_bound, check_interior)
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def smooth_count(count, zz, iterate_max, smooth):
+    """
+    computes the (smoothed) iteration count, which is used for coloring.
+    :param count: index of the first value of the sequence exceeding the iteration bound
+    :param zz: squared absolute value of this value of the sequence
+    :param iterate_max: maximum number of iterations
+    :param smooth: trigger for applying smooth color algorithm or not. See wikipedia on mandelbrot. Without smoothing
+    the iteration count is the integer escape index, which allows comparing the results of different algorithms exactly.
+    :return: iteration count
+    """
+    if count < iterate_max and smooth:
+        log_zn = np.log(zz) * .5
+        nu = np.log(log_zn / np.log(2)) / np.log(2)
+        return count + 1 - nu
+    else:
+        return count
+
+
+@jit('void(float64[:], float64[:], int64, float64, boolean, boolean, float64[:,:])', nopython=True, nogil=True,
+     cache=True)
+def iterate_mandelbrot(c_re, c_im, iterate_max, iteration_bound, check_interior, smooth, it_count):
+    """
+    Calculate the mandelbrot sequence for all points c in the complex plane c = [c_re,c_im]. The grid is given by its
+    axes, i.e. the point in row i and column j is c = c_re[j] + 1j * c_im[i]. The kernel is defined on module level and
+    compiled once, when this module is imported. The compiled machine code is cached on disk (cache=True), therefore
+    later server starts do not have to recompile the kernel at all. The kernel releases the GIL (nogil=True), such that
+    several python threads can run it on different rows of the same image at the same time.
+    :param c_re: array of length N with real part of points in the complex plane.
+    :param c_im: array of length M with imaginary part of points in the complex plane.
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param check_interior: trigger for detecting points inside of the mandelbrot set early (see escape_time)
+    :param smooth: trigger for smoothing the iteration counts (see smooth_count)
+    :param it_count: a MxN array where the iteration count until divergence is saved to.
+    """
+    m, n = it_count.shape
+
+    # mandelbrot iteration algorithm
+    for i in range(m):
+        for j in range(n):
+            count, zz = escape_time(c_re[j], c_im[i], iterate_max, iteration_bound, check_interior)
+            it_count[i, j] = smooth_count(count, zz, iterate_max, smooth)
+
+
+@jit('void(float64[:], float64[:], float64[:], float64[:], int64, float64, boolean, float64[:,:])', nopython=True,
+     nogil=True, cache=True)
+def iterate_mandelbrot_samples(c_re, c_im, offsets_re, offsets_im, iterate_max, iteration_bound, check_interior,
+                               it_count):
+    """
+    Calculate the mandelbrot sequence for several samples around each of the given points. Sample s of point k is
+    c = c_re[k] + offsets_re[s] + 1j * (c_im[k] + offsets_im[s]). This allows to supersample single pixels of an image.
+    :param c_re: array of length K with real part of the points in the complex plane.
+    :param c_im: array of length K with imaginary part of the points in the complex plane.
+    :param offsets_re: array of length S with real part of the offsets of the samples to the points.
+    :param offsets_im: array of length S with imaginary part of the offsets of the samples to the points.
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param check_interior: trigger for detecting points inside of the mandelbrot set early (see escape_time)
+    :param it_count: a KxS array where the iteration count until divergence of each sample is saved to.
+    """
+    for k in range(c_re.shape[0]):
+        for s in range(offsets_re.shape[0]):
+            count, zz = escape_time(c_re[k] + offsets_re[s], c_im[k] + offsets_im[s], iterate_max, iteration_bound,
+                                    check_interior)
+            it_count[k, s] = smooth_count(count, zz, iterate_max, True)
+
+
+@jit('void(float64, float64, float64[:], float64[:], int64, float64, boolean, float64[:,:])', nopython=True, nogil=True,
+     cache=True)
+def iterate_mandelbrot_log_polar(center_re, center_im, log_r, theta, iterate_max, iteration_bound, check_interior,
+                                 it_count):
+    """
+    Calculate the mandelbrot sequence on a log-polar grid around a center. The point in row i and column j is
+    c = center + exp(log_r[j]) * exp(1j * theta[i]). See mandel_zoom.py.
+    :param center_re: real part of the center
+    :param center_im: imaginary part of the center
+    :param log_r: array of length N with the logarithm of the distances to the center
+    :param theta: array of length M with the angles
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param check_interior: trigger for detecting points inside of the mandelbrot set early (see escape_time)
+    :param it_count: a MxN array where the iteration count until divergence is saved to.
+    """
+    m, n = it_count.shape
+    for j in range(n):
+        r = np.exp(log_r[j])
+        for i in range(m):
+            count, zz = escape_time(center_re + r * np.cos(theta[i]), center_im + r * np.sin(theta[i]), iterate_max,
+                                    iteration_bound, check_interior)
+            it_count[i, j] = smooth_count(count, zz, iterate_max, True)
+
+
+@jit('void(float64[:], float64[:], float64, float64, int64, float64, boolean, float64[:,:])', nopython=True, nogil=True,
+     cache=True)
+def iterate_julia(z_re, z_im, c_re, c_im, iterate_max, iteration_bound, check_periodicity, it_count):
+    """
+    Calculate the julia set of the parameter c = [c_re,c_im] for all starting values z_0 = [z_re,z_im] in the complex
+    plane. The grid is given by its axes like in iterate_mandelbrot.
+    :param z_re: array of length N with real part of the starting values.
+    :param z_im: array of length M with imaginary part of the starting values.
+    :param c_re: real part of the parameter
+    :param c_im: imaginary part of the parameter
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the sequence
+    :param check_periodicity: trigger for detecting periodic orbits (see escape_time_z0)
+    :param it_count: a MxN array where the iteration count until divergence is saved to.
+    """
+    m, n = it_count.shape
+    for i in range(m):
+        for j in range(n):
+            count, zz = escape_time_z0(z_re[j], z_im[i], c_re, c_im, iterate_max, iteration_bound, check_periodicity)
+            it_count[i, j] = smooth_count(count, zz, iterate_max, True)
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def _compute_point(c_re, c_im, iterate_max, iteration_bound, check_interior, smooth, i, j, level, it_count):
+    """
+    computes the escape index and the iteration count of point [i,j], if it has not been computed before.
+    """
+    if level[i, j] < 0:
+        count, zz = escape_time(c_re[j], c_im[i], iterate_max, iteration_bound, check_interior)
+        level[i, j] = count
+        it_count[i, j] = smooth_count(count, zz, iterate_max, smooth)
+
+
+@jit('void(float64[:], float64[:], int64, float64, boolean, boolean, float64[:,:])', nopython=True, nogil=True,
+     cache=True)
+def iterate_mandelbrot_mariani_silver(c_re, c_im, iterate_max, iteration_bound, check_interior, smooth, it_count):
+    """
+    Calculate the mandelbrot set on a grid using the Mariani-Silver algorithm. Only the border of a rectangle is
+    computed. If all points on the border have the same escape index, the interior of the rectangle is filled without
+    any computation, otherwise the rectangle is subdivided. Small rectangles are computed point by point. Large regions
+    inside of the mandelbrot set and broad bands with identical escape index therefore cost almost nothing.
+    The algorithm relies on the fact, that the set of points with escape index >= k is simply connected (for an
+    iteration bound >= 4). Therefore a rectangle with a homogeneous border has a homogeneous interior, unless the
+    rectangle contains the whole mandelbrot set; rectangles containing the origin are therefore only filled, if their
+    border lies inside of the mandelbrot set. The escape indices are identical to the brute force computation except for
+    features thinner than a pixel, which cross the border of a rectangle between two grid points. Without smoothing the
+    filled points get the escape index of the border, therefore the result can be compared exactly with the brute force
+    computation (see mandel_benchmark.run_engine_benchmark). The smoothed iteration counts of filled points are
+    interpolated from the border; since all these points have the same escape index, they deviate less than the range
+    of the smoothing term (about one iteration) from the brute force result.
+    Same parameters as iterate_mandelbrot, therefore both kernels can be exchanged.
+    :param c_re: array of length N with real part of points in the complex plane.
+    :param c_im: array of length M with imaginary part of points in the complex plane.
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param check_interior: trigger for detecting points inside of the mandelbrot set early (see escape_time)
+    :param smooth: trigger for smoothing the iteration counts (see smooth_count)
+    :param it_count: a MxN array where the iteration count until divergence is saved to.
+    """
+    m, n = it_count.shape
+    level = -np.ones((m, n), dtype=np.int64)  # escape index of each point, -1 if not yet computed
+
+    # stack of rectangles (first row, last row, first column, last column) that still have to be processed. Every
+    # subdivision replaces a rectangle by its two halves and halves one of the sides, therefore the stack never holds
+    # more rectangles than the number of subdivisions along both sides plus one.
+    stack = np.empty((int(np.log2(m + 1)) + int(np.log2(n + 1)) + 4, 4), dtype=np.int64)
+    stack[0, 0] = 0
+    stack[0, 1] = m - 1
+    stack[0, 2] = 0
+    stack[0, 3] = n - 1
+    n_stack = 1
+
+    while n_stack > 0:
+        n_stack -= 1
+        i0 = stack[n_stack, 0]
+        i1 = stack[n_stack, 1]
+        j0 = stack[n_stack, 2]
+        j1 = stack[n_stack, 3]
+
+        # compute border
+        for j in range(j0, j1 + 1):
+            _compute_point(c_re, c_im, iterate_max, iteration_bound, check_interior, smooth, i0, j, level, it_count)
+            _compute_point(c_re, c_im, iterate_max, iteration_bound, check_interior, smooth, i1, j, level, it_count)
+        for i in range(i0 + 1, i1):
+            _compute_point(c_re, c_im, iterate_max, iteration_bound, check_interior, smooth, i, j0, level, it_count)
+            _compute_point(c_re, c_im, iterate_max, iteration_bound, check_interior, smooth, i, j1, level, it_count)
+
+        if i1 - i0 < 2 or j1 - j0 < 2:  # no interior
+            continue
+
+        # check whether the escape index is the same on the whole border
+        border_level = level[i0, j0]
+        homogeneous = True
+        for j in range(j0, j1 + 1):
+            if level[i0, j] != border_level or level[i1, j] != border_level:
+                homogeneous = False
+                break
+        if homogeneous:
+            for i in range(i0 + 1, i1):
+                if level[i, j0] != border_level or level[i, j1] != border_level:
+                    homogeneous = False
+                    break
+        contains_origin = c_re[j0] * c_re[j1] <= 0 and c_im[i0] * c_im[i1] <= 0
+
+        if homogeneous and (border_level == iterate_max or not contains_origin):
+            # fill interior by interpolating the iteration counts on the border
+            for i in range(i0 + 1, i1):
+                ti = (i - i0) / (i1 - i0)
+                for j in range(j0 + 1, j1):
+                    tj = (j - j0) / (j1 - j0)
+                    level[i, j] = border_level
+                    if border_level == iterate_max or not smooth:
+                        it_count[i, j] = border_level
+                    else:
+                        it_count[i, j] = .5 * ((1 - tj) * it_count[i, j0] + tj * it_count[i, j1] +
+                                               (1 - ti) * it_count[i0, j] + ti * it_count[i1, j])
+        elif i1 - i0 <= mariani_silver_min_size or j1 - j0 <= mariani_silver_min_size:
+            # small rectangle: compute interior point by point
+            for i in range(i0 + 1, i1):
+                for j in range(j0 + 1, j1):
+                    _compute_point(c_re, c_im, iterate_max, iteration_bound, check_interior, smooth, i, j, level,
+                                   it_count)
+        else:
+            # subdivide along the longer side. Both halves share the middle line.
+            if i1 - i0 > j1 - j0:
+                mid = (i0 + i1) // 2
+                stack[n_stack, 0] = i0
+                stack[n_stack, 1] = mid
+                stack[n_stack, 2] = j0
+                stack[n_stack, 3] = j1
+                stack[n_stack + 1, 0] = mid
+                stack[n_stack + 1, 1] = i1
+                stack[n_stack + 1, 2] = j0
+                stack[n_stack + 1, 3] = j1
+            else:
+                mid = (j0 + j1) // 2
+                stack[n_stack, 0] = i0
+                stack[n_stack, 1] = i1
+                stack[n_stack, 2] = j0
+                stack[n_stack, 3] = mid
+                stack[n_stack + 1, 0] = i0
+                stack[n_stack + 1, 1] = i1
+                stack[n_stack + 1, 2] = mid
+                stack[n_stack + 1, 3] = j1
+            n_stack += 2
+
+
+@jit('void(float64[:], float64[:], int64, float64, boolean, float64[:,:], float64[:,:], int64[:,:], boolean[:,:])',
+     nopython=True, nogil=True, cache=True)
+def iterate_mandelbrot_state(c_re, c_im, iterate_max, iteration_bound, check_interior, z_re, z_im, it_n, escaped):
+    """
+    Continues the mandelbrot sequence for all points c in the complex plane c = [c_re,c_im] from a given state up to
+    iterate_max. For each point the state consists of the current value z_n = [z_re,z_im], the index n of z_n and a
+    flag, whether the sequence has already escaped. Points that have escaped or have already been checked up to
+    iterate_max are skipped. A fresh state (z = 0, n = 0, not escaped) results in the same computation as
+    iterate_mandelbrot. Points, which are detected to be inside of the mandelbrot set (see iterate_mandelbrot), get the
+    iteration index interior_index and are never iterated again.
+    :param c_re: array of length N with real part of points in the complex plane.
+    :param c_im: array of length M with imaginary part of points in the complex plane.
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param check_interior: trigger for detecting points inside of the mandelbrot set early
+    :param z_re: a MxN array with the real part of the current value of the sequence
+    :param z_im: a MxN array with the imaginary part of the current value of the sequence
+    :param it_n: a MxN array with the index of the current value of the sequence
+    :param escaped: a MxN array stating, whether the sequence has already escaped
+    """
+    m, n = z_re.shape
+
+    for i in range(m):
+        for j in range(n):
+            if escaped[i, j]:
+                continue
+            re = z_re[i, j]
+            im = z_im[i, j]
+            k = it_n[i, j]
+            if check_interior and k == 0 and is_in_cardioid_or_bulb(c_re[j], c_im[i]):
+                it_n[i, j] = interior_index
+                continue
+            re_saved = re
+            im_saved = im
+            it_saved = k + 1
+            while k <= iterate_max:
+                xx = re * re
+                yy = im * im
+                if (xx + yy) > iteration_bound:
+                    escaped[i, j] = True
+                    break
+                xy = re * im
+                re = xx - yy + c_re[j]
+                im = 2 * xy + c_im[i]
+                k += 1
+                if check_interior:
+                    if re == re_saved and im == im_saved:  # periodic orbit
+                        k = interior_index
+                        break
+                    if k == it_saved:
+                        re_saved = re
+                        im_saved = im
+                        it_saved *= 2
+            z_re[i, j] = re
+            z_im[i, j] = im
+            it_n[i, j] = k
+
+
+@jit('void(int64, float64[:,:], float64[:,:], int64[:,:], boolean[:,:], float64[:,:])',
+     nopython=True, nogil=True, cache=True)
+def state_to_iteration_count(iterate_max, z_re, z_im, it_n, escaped, it_count):
+    """
+    Computes the iteration count from a state of the mandelbrot sequence (see iterate_mandelbrot_state). The result is
+    identical to the result of iterate_mandelbrot, if the state has been iterated at least up to iterate_max.
+    :param iterate_max: maximum number of iterations
+    :param z_re: a MxN array with the real part of the current value of the sequence
+    :param z_im: a MxN array with the imaginary part of the current value of the sequence
+    :param it_n: a MxN array with the index of the current value of the sequence
+    :param escaped: a MxN array stating, whether the sequence has already escaped
+    :param it_count: a MxN array where the iteration count until divergence is saved to.
+    """
+
+    m, n = z_re.shape
+
+    for i in range(m):
+        for j in range(n):
+            if escaped[i, j]:
+                zz = z_re[i, j] * z_re[i, j] + z_im[i, j] * z_im[i, j]
+                it_count[i, j] = smooth_count(min(it_n[i, j], iterate_max), zz, iterate_max, True)
+            else:
+                it_count[i, j] = iterate_max
+
+
+class MandelState:
+    """
+    holds the state of the mandelbrot sequence for every point of a grid in the complex plane. The state allows to
+    continue the computation, if the maximum number of iterations is raised: only the points that have not escaped yet
+    are iterated further and only for the additional iterations. Lowering the maximum number of iterations needs no
+    computation at all.
+    """
+
+    def __init__(self, c_re, c_im, iteration_bound):
+        """
+        :param c_re: array of length N with real part of points in the complex plane.
+        :param c_im: array of length M with imaginary part of points in the complex plane.
+        :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+        """
+        self.c_re = np.asarray(c_re, dtype=np.float64)
+        self.c_im = np.asarray(c_im, dtype=np.float64)
+        self.iteration_bound = float(iteration_bound)
+        shape = (self.c_im.shape[0], self.c_re.shape[0])
+        self.z_re = np.zeros(shape, dtype=np.float64)
+        self.z_im = np.zeros(shape, dtype=np.float64)
+        self.it_n = np.zeros(shape, dtype=np.int64)
+        self.escaped = np.zeros(shape, dtype=np.bool_)
+        self.iterate_max = -1  # maximum number of iterations the whole grid has been iterated to
+        self._lock = threading.Lock()  # the state may be shared between threads
+
+    @property
+    def nbytes(self):
+        """
+        :return: number of bytes occupied by the state
+        """
+        return self.z_re.nbytes + self.z_im.nbytes + self.it_n.nbytes + self.escaped.nbytes
+
+    def inherit(self, coarse_state, i0, j0):
+        """
+        copies the state of every second point in each direction from a state on a grid with half the resolution. Point
+        [2*i, 2*j] of this state equals point [i0 + i, j0 + j] of the coarse state.
+        :param coarse_state: MandelState on the coarse grid
+        :param i0: row offset in the coarse grid
+        :param j0: column offset in the coarse grid
+        """
+        m, n = self.z_re[::2, ::2].shape
+        with coarse_state._lock:
+            self.z_re[::2, ::2] = coarse_state.z_re[i0:i0 + m, j0:j0 + n]
+            self.z_im[::2, ::2] = coarse_state.z_im[i0:i0 + m, j0:j0 + n]
+            self.it_n[::2, ::2] = coarse_state.it_n[i0:i0 + m, j0:j0 + n]
+            self.escaped[::2, ::2] = coarse_state.escaped[i0:i0 + m, j0:j0 + n]
+
+    def iterate(self, iterate_max, n_threads=None, rows=None, cols=None, cancel=None):
+        """
+        iterates the state up to iterate_max. If rows and columns are given, only the points in these rows and columns
+        are iterated. This allows to compute a coarse version first and to refine it later (see mandel_progressive).
+        Points that have already been iterated up to iterate_max need no computation.
+        :param iterate_max: maximum number of iterations that are computed
+        :param n_threads: number of threads used for the computation. If None, default_n_threads is used.
+        :param rows: array of row indices or None for all rows
+        :param cols: array of column indices or None for all columns
+        :param cancel: threading.Event cancelling the computation (see run_rows). The state stays valid, if the
+        computation is cancelled.
+        """
+        iterate_max = int(iterate_max)
+        with self._lock:
+            if iterate_max <= self.iterate_max:  # nothing to do
+                return
+            if rows is None and cols is None:
+                run_threaded(iterate_mandelbrot_state, self.c_re, self.c_im,
+                             (iterate_max, self.iteration_bound, check_interior),
+                             (self.z_re, self.z_im, self.it_n, self.escaped), n_threads, cancel)
+                self.iterate_max = iterate_max
+                return
+            # the selected points are iterated on a copy, which is written back even if the computation is cancelled
+            ix = self._index(rows, cols)
+            sub_state = (self.z_re[ix], self.z_im[ix], self.it_n[ix], self.escaped[ix])
+            try:
+                run_threaded(iterate_mandelbrot_state, self.c_re[ix[1][0, :]], self.c_im[ix[0][:, 0]],
+                             (iterate_max, self.iteration_bound, check_interior), sub_state, n_threads, cancel)
+            finally:
+                self.z_re[ix], self.z_im[ix], self.it_n[ix], self.escaped[ix] = sub_state
+
+    def iteration_count(self, iterate_max, rows=None, cols=None):
+        """
+        computes the iteration count for each point from the state. The state has to be iterated at least up to
+        iterate_max before.
+        :param iterate_max: maximum number of iterations
+        :param rows: array of row indices or None for all rows
+        :param cols: array of column indices or None for all columns
+        :return: array containing number of iterations for each gridpoint
+        """
+        ix = self._index(rows, cols)
+        with self._lock:
+            z_re, z_im, it_n, escaped = self.z_re[ix], self.z_im[ix], self.it_n[ix], self.escaped[ix]
+        it_count = np.zeros(z_re.shape, dtype=np.float64)
+        state_to_iteration_count(int(iterate_max), z_re, z_im, it_n, escaped, it_count)
+        return it_count
+
+    def _index(self, rows, cols):
+        """
+        :param rows: array of row indices or None for all rows
+        :param cols: array of column indices or None for all columns
+        :return: open mesh for indexing the selected points (see np.ix_)
+        """
+        if rows is None:
+            rows = np.arange(self.c_im.shape[0])
+        if cols is None:
+            cols = np.arange(self.c_re.shape[0])
+        return np.ix_(rows, cols)
+
+
+def warm_up():
+    """
+    runs the kernel once on a tiny grid. The kernel is already compiled (or loaded from the on disk cache) on import of
+    this module; calling this function at server start additionally makes sure, that the threads are set up
+    before the first user requests an image. Therefore the first frame of every session is pure computation. Calling
+    this function more than once has no effect.
+    """
+    global _is_warm
+    if _is_warm:
+        return
+    t0 = time.time()
+    mandel(-2.0, -1.5, 3.0, 3.0, 8, 8, 10, 10.0)
+    _is_warm = True
+    print "mandelbrot kernel warm-up took " + str(time.time() - t0) + " sec"
+
+
+def check_cancelled(cancel):
+    """
+    raises ComputationCancelled, if the computation has been cancelled.
+    :param cancel: threading.Event or None
+    """
+    if cancel is not None and cancel.is_set():
+        raise ComputationCancelled()
+
+
+def run_rows(kernel, c_re, c_im, parameters, row_arrays, cancel=None):
+    """
+    calls the kernel as kernel(c_re, c_im, *(parameters + row_arrays)). If cancel is given, the rows are passed to the
+    kernel in chunks of cancel_rows rows and no further chunk is computed, as soon as cancel is set. The caller has to
+    check for cancellation afterwards (see check_cancelled).
+    :param kernel: kernel computing the mandelbrot set row-wise, e.g. iterate_mandelbrot
+    :param c_re: array of length N with real part of points in the complex plane.
+    :param c_im: array of length M with imaginary part of points in the complex plane.
+    :param parameters: tuple of scalar parameters passed to the kernel
+    :param row_arrays: tuple of MxN arrays passed to the kernel, which are split up row-wise
+    :param cancel: threading.Event cancelling the computation or None
+    """
+    if cancel is None:
+        kernel(c_re, c_im, *(parameters + row_arrays))
+        return
+
+    for i in range(0, c_im.shape[0], cancel_rows):
+        if cancel.is_set():
+            return
+        rows = slice(i, i + cancel_rows)
+        kernel(c_re, c_im[rows], *(parameters + tuple(a[rows, :] for a in row_arrays)))
+
+
+def run_threaded(kernel, c_re, c_im, parameters, row_arrays, n_threads=None, cancel=None):
+    """
+    distributes the computation of the mandelbrot set over several threads. Since the rows of the mandelbrot set differ
+    a lot in their computational cost, the rows are distributed in an interleaved fashion: thread t computes the rows
+    t, t + n_threads, t + 2 * n_threads, ... This results in a good load balance between the threads. The kernel is
+    called as kernel(c_re, c_im[rows], *(parameters + row_arrays[rows])).
+    :param kernel: kernel releasing the GIL, e.g. iterate_mandelbrot
+    :param c_re: array of length N with real part of points in the complex plane.
+    :param c_im: array of length M with imaginary part of points in the complex plane.
+    :param parameters: tuple of scalar parameters passed to the kernel
+    :param row_arrays: tuple of MxN arrays passed to the kernel, which are split up row-wise between the threads
+    :param n_threads: number of threads used for the computation. If None, default_n_threads is used.
+    :param cancel: threading.Event. If it is set, the threads stop after their current chunk of rows and
+    ComputationCancelled is raised. If None, the computation cannot be cancelled.
+    """
+    if n_threads is None:
+        n_threads = default_n_threads
+    n_threads = max(1, min(int(n_threads), c_im.shape[0]))
+
+    if n_threads == 1:  # no need for spawning threads
+        run_rows(kernel, c_re, c_im, parameters, row_arrays, cancel)
+    else:
+        threads = [threading.Thread(target=run_rows,
+                                    args=(kernel, c_re, c_im[t::n_threads], parameters,
+                                          tuple(a[t::n_threads, :] for a in row_arrays), cancel))
+                   for t in range(n_threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    check_cancelled(cancel)
+
+
+def run_blocked(kernel, c_re, c_im, parameters, row_arrays, n_threads=None, cancel=None):
+    """
+    distributes the computation of the mandelbrot set over several threads like run_threaded, but splits the grid into
+    contiguous blocks of rows. This is needed by kernels, which exploit the coherence of neighbouring points like
+    iterate_mandelbrot_mariani_silver. For a good load balance there are more blocks than threads; idle threads take
+    the next block.
+    :param kernel: kernel releasing the GIL, e.g. iterate_mandelbrot_mariani_silver
+    :param c_re: array of length N with real part of points in the complex plane.
+    :param c_im: array of length M with imaginary part of points in the complex plane.
+    :param parameters: tuple of scalar parameters passed to the kernel
+    :param row_arrays: tuple of MxN arrays passed to the kernel, which are split up row-wise between the threads
+    :param n_threads: number of threads used for the computation. If None, default_n_threads is used.
+    :param cancel: threading.Event. If it is set, no further block is computed and ComputationCancelled is raised.
+    If None, the computation cannot be cancelled.
+    """
+    if n_threads is None:
+        n_threads = default_n_threads
+    n_threads = max(1, min(int(n_threads), c_im.shape[0]))
+
+    if n_threads == 1 and cancel is None:  # no need for spawning threads
+        kernel(c_re, c_im, *(parameters + row_arrays))
+        return
+
+    n_blocks = min(4 * n_threads, c_im.shape[0])
+    bounds = np.linspace(0, c_im.shape[0], n_blocks + 1).astype(np.int64)
+    blocks = [slice(bounds[b], bounds[b + 1]) for b in range(n_blocks)]
+    blocks_lock = threading.Lock()
+
+    def worker():
+        while cancel is None or not cancel.is_set():
+            with blocks_lock:
+                if not blocks:
+                    return
+                rows = blocks.pop()
+            kernel(c_re, c_im[rows], *(parameters + tuple(a[rows, :] for a in row_arrays)))
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    check_cancelled(cancel)
+
+
+def iterate_mandelbrot_threaded(c_re, c_im, iterate_max, iteration_bound, it_count, n_threads=None, cancel=None):
+    """
+    computes the mandelbrot set using several threads (see run_threaded).
+    :param c_re: array of length N with real part of points in the complex plane.
+    :param c_im: array of length M with imaginary part of points in the complex plane.
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param it_count: a MxN array where the iteration count until divergence is saved to.
+    :param n_threads: number of threads used for the computation. If None, default_n_threads is used.
+    :param cancel: threading.Event cancelling the computation (see run_threaded) or None
+    """
+    run_threaded(iterate_mandelbrot, c_re, c_im, (iterate_max, iteration_bound, check_interior, True), (it_count,),
+                 n_threads, cancel)
+
+
+def iterate_mandelbrot_refine(c_re, c_im, iterate_max, iteration_bound, it_count, n_threads=None, cancel=None):
+    """
+    computes the mandelbrot set on a grid, where every second point in each direction is already known from a grid with
+    half the resolution, i.e. it_count[::2, ::2] holds valid iteration counts. Only the remaining three quarters of the
+    points are computed: all odd rows and the odd columns of the even rows.
+    :param c_re: array of length N with real part of points in the complex plane.
+    :param c_im: array of length M with imaginary part of points in the complex plane.
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param it_count: a MxN array where the iteration count until divergence is saved to.
+    :param n_threads: number of threads used for the computation. If None, default_n_threads is used.
+    :param cancel: threading.Event cancelling the computation (see run_threaded) or None
+    """
+    if c_im.shape[0] > 1:
+        iterate_mandelbrot_threaded(c_re, c_im[1::2], iterate_max, iteration_bound, it_count[1::2, :], n_threads,
+                                    cancel)
+    if c_re.shape[0] > 1:
+        iterate_mandelbrot_threaded(c_re[1::2], c_im[::2], iterate_max, iteration_bound, it_count[::2, 1::2], n_threads,
+                                    cancel)
+
+
+def pass_indices(res, n_passes):
+    """
+    computes the points of the full resolution grid (see mandel_grid), which are sampled by the passes of a progressive
+    computation. Every pass spans the whole view, i.e. its first and its last point are the first and the last point of
+    the full grid. The passes before the last one double the number of intervals of the pass before, therefore their
+    points are nested: every second point of a pass is a point of the pass before. The last pass takes every point.
+    :param res: resolution of the full grid
+    :param n_passes: number of passes
+    :return: list of arrays holding the indices of the gridpoints of each pass
+    """
+    # number of intervals of the first pass, such that the pass before the last one has about half of the resolution
+    n_intervals = -(-(res - 1) // 2 ** (n_passes - 1))
+    indices = [sample_indices(res, n_intervals * 2 ** i + 1) for i in range(n_passes - 1)]
+    return indices + [np.arange(res)]
+
+
+def sample_indices(res, n_samples):
+    """
+    chooses about n_samples equally spaced points of a grid, including its first and its last point.
+    :param res: resolution of the grid
+    :param n_samples: number of points
+    :return: sorted array of indices of the chosen gridpoints. If n_samples exceeds res, every point is chosen once.
+    """
+    return np.unique(np.round(np.linspace(0, res - 1, n_samples)).astype(np.int64))
+
+
+def mandel_progressive(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound, n_passes=4, n_threads=None,
+                       state=None, cancel=None):
+    """
+    computes the mandelbrot set for a part of the complex plane in several passes from coarse to fine. In the last pass
+    the full resolution x_res x y_res is reached, every pass before has about half of the resolution of the following
+    pass and spans the whole view (see pass_indices). The grids of all passes are subsets of the finest grid; therefore
+    every pass reuses the iteration counts of the points it shares with the previous pass and only computes the other
+    points.
+    If a MandelState for the grid is given, the computation continues from that state and the state is updated. This
+    allows to raise the maximum number of iterations later without starting from scratch.
     :param x0: origin x of computation region
     :param y0: origin y of computation region
     :param xw: width of computation region
@@ -16,55 +752,127 @@ def mandel(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound):
     :param y_res: resolution in y direction
     :param iterate_max: maximum number of iterations that are computed
     :param iteration_bound: upper bound for continuing iterating the mandelbrot set
-    :return: array containing number of iterations for each gridpoint
+    :param n_passes: number of passes
+    :param n_threads: number of threads used for the computation. If None, default_n_threads is used.
+    :param state: MandelState of the grid (see mandel_grid) or None.
+    :param cancel: threading.Event cancelling the computation (see run_threaded) or None
+    :return: generator yielding the array containing the number of iterations for each gridpoint after each pass
     """
-    @guvectorize(['void(float64[:,:], float64[:,:],float64[:,:])'], '(m,n),(m,n)->(m,n)', target='parallel')
-    def iterate_mandelbrot(c_re, c_im, it_count):
-        """
-        Calculate the mandelbrot sequence for all points c in the complex plane c = [c_re,c_im]. This function is
-        vectorized by using the decorator @guvectorize above.
-        :param c_re: a NxM array with real part of points in the complex plane.
-        :param c_im: a NxM array with imaginary part of points in the complex plane.
-        :param it_count: a NxM array where the iteration count until divergence is saved to.
-        """
+    iterate_max = int(iterate_max)
+    iteration_bound = float(iteration_bound)
 
-        apply_smoothening = True  # trigger for applying smooth color algorithm or not. See wikipedia on mandelbrot.
+    pass_rows = pass_indices(y_res, n_passes)
+    pass_cols = pass_indices(x_res, n_passes)
 
-        m, n = c_re.shape
+    if state is not None:
+        # the state keeps track of the points that are already computed
+        for rows, cols in zip(pass_rows[:-1], pass_cols[:-1]):
+            state.iterate(iterate_max, n_threads, rows, cols, cancel)
+            yield state.iteration_count(iterate_max, rows, cols)
+        state.iterate(iterate_max, n_threads, cancel=cancel)
+        yield state.iteration_count(iterate_max)
+        return
+
+    # create grid in the complex plane
+    re, im = mandel_grid(x0, y0, xw, yw, x_res, y_res)
+    # initialite array where results are saved to
+    it_count = np.zeros((y_res, x_res), dtype=np.float64)
+
+    # the points known from the previous pass are the product of its rows and columns. Every pass computes the points in
+    # its new rows and the points in its new columns of the known rows.
+    known_rows = np.zeros(0, dtype=np.int64)
+    known_cols = np.zeros(0, dtype=np.int64)
+    for rows, cols in zip(pass_rows, pass_cols):
+        new_rows = np.setdiff1d(rows, known_rows)
+        old_rows = np.intersect1d(rows, known_rows)
+        new_cols = np.setdiff1d(cols, known_cols)
+        for block_rows, block_cols in [(new_rows, cols), (old_rows, new_cols)]:
+            if block_rows.shape[0] > 0 and block_cols.shape[0] > 0:
+                block = np.zeros((block_rows.shape[0], block_cols.shape[0]), dtype=np.float64)
+                iterate_mandelbrot_threaded(re[block_cols], im[block_rows], iterate_max, iteration_bound, block,
+                                            n_threads, cancel)
+                it_count[np.ix_(block_rows, block_cols)] = block
+        known_rows = rows
+        known_cols = cols
+        yield it_count[np.ix_(rows, cols)]
 
-        # mandelbrot iteration algorithm
-        for i in range(m):
-            for j in range(n):
-                re = 0
-                im = 0
-                count = iterate_max
-                for it_n in xrange(iterate_max + 1):
-                    xx = re * re
-                    yy = im * im
-                    xy = re * im
-                    re = xx - yy + c_re[i, j]
-                    im = 2 * xy + c_im[i, j]
-                    if (xx + yy) > iteration_bound:
-                        count = it_n
-                        break
 
-                if count < iterate_max and apply_smoothening:
-                    log_zn = np.log(xx + yy) * .5
-                    nu = np.log(log_zn / np.log(2)) / np.log(2)
-                    count += 1 - nu
+def mandel_grid(x0, y0, xw, yw, x_res, y_res):
+    """
+    creates the grid in the complex plane that is used for the computation of the mandelbrot set
+    :param x0: origin x of computation region
+    :param y0: origin y of computation region
+    :param xw: width of computation region
+    :param yw: height of computation region
+    :param x_res: resolution in x direction
+    :param y_res: resolution in y direction
+    :return: real and imaginary axis of the grid
+    """
+    re = np.linspace(x0, x0 + xw, x_res, dtype=np.float64)
+    im = np.linspace(y0, y0 + yw, y_res, dtype=np.float64)
+    return re, im
 
-                it_count[i, j] = count
 
-    t0 = time.clock()
+def julia(x0, y0, xw, yw, x_res, y_res, c_re, c_im, iterate_max, iteration_bound, n_threads=None, cancel=None):
+    """
+    computes the julia set of the parameter c = [c_re,c_im] for a part of the complex plane.
+    :param x0: origin x of computation region
+    :param y0: origin y of computation region
+    :param xw: width of computation region
+    :param yw: height of computation region
+    :param x_res: resolution in x direction
+    :param y_res: resolution in y direction
+    :param c_re: real part of the parameter
+    :param c_im: imaginary part of the parameter
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the sequence
+    :param n_threads: number of threads used for the computation. If None, default_n_threads is used.
+    :param cancel: threading.Event cancelling the computation (see run_threaded) or None
+    :return: array containing number of iterations for each gridpoint
+    """
+    z_re, z_im = mandel_grid(x0, y0, xw, yw, x_res, y_res)
+    it_count = np.zeros((y_res, x_res), dtype=np.float64)
+    run_threaded(iterate_julia, z_re, z_im, (float(c_re), float(c_im), int(iterate_max), float(iteration_bound),
+                                             check_interior), (it_count,), n_threads, cancel)
+    return it_count
+
+
+def mandel(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound, n_threads=None, engine='brute_force',
+           cancel=None, smooth=True):
+    """
+    computes the mandelbrot set for a part of the complex plane (computation region). The region is discretized
+    by only computing certain pixel values (corresponding to a given resolution).
+    :param x0: origin x of computation region
+    :param y0: origin y of computation region
+    :param xw: width of computation region
+    :param yw: height of computation region
+    :param x_res: resolution in x direction
+    :param y_res: resolution in y direction
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param n_threads: number of threads used for the computation. If None, default_n_threads is used.
+    :param engine: algorithm used for the computation. 'brute_force' computes every point, 'mariani_silver' uses
+    rectangle subdivision (see iterate_mandelbrot_mariani_silver).
+    :param cancel: threading.Event cancelling the computation (see run_threaded) or None
+    :param smooth: trigger for smoothing the iteration counts (see smooth_count)
+    :return: array containing number of iterations for each gridpoint
+    """
+    t0 = time.time()
 
     # create grid in the complex plane
-    re, im = np.meshgrid(np.linspace(x0, x0 + xw, x_res, dtype=np.float64),
-                         np.linspace(y0, y0 + yw, y_res, dtype=np.float64))
+    re, im = mandel_grid(x0, y0, xw, yw, x_res, y_res)
     # initialite array where results are saved to
-    it_count = np.zeros(re.shape, dtype=np.float64)
-    # call vectorized worker function
-    print "calling iterate_mandelbrot."
-    iterate_mandelbrot(re, im, it_count)
-    print "elapsed time:" + str(time.clock() - t0) + " sec"
+    it_count = np.zeros((y_res, x_res), dtype=np.float64)
+    # call multithreaded worker function
+    parameters = (int(iterate_max), float(iteration_bound), check_interior, bool(smooth))
+    if engine == 'brute_force':
+        print "calling iterate_mandelbrot."
+        run_threaded(iterate_mandelbrot, re, im, parameters, (it_count,), n_threads, cancel)
+    elif engine == 'mariani_silver':
+        print "calling iterate_mandelbrot_mariani_silver."
+        run_blocked(iterate_mandelbrot_mariani_silver, re, im, parameters, (it_count,), n_threads, cancel)
+    else:
+        raise Exception("unknown engine " + str(engine) + "!")
+    print "elapsed time:" + str(time.time() - t0) + " sec"
 
-    return it_count
\ No newline at end of file
+    return it_count
@@ -0,0 +1,138 @@
+from __future__ import division
+
+import multiprocessing
+import sys
+import time
+
+import mandel
+import mandel_presets
+import mandelbrot_settings
+
+# this script measures how the computation of the mandelbrot set scales with the number of threads used, how much
+# the detection of interior points (see mandel.check_interior) speeds up the presets from mandel_presets.py and how the
+# Mariani-Silver engine compares to the brute force engine on the presets. Run it with
+#   $ python mandel_benchmark.py [max_threads]
+# benchmark setup: full initial view of the app at 1000 iterations
+x0 = mandelbrot_settings.x0
+y0 = mandelbrot_settings.y0
+xw = mandelbrot_settings.xw
+yw = mandelbrot_settings.yw
+x_res = 400
+y_res = 400
+max_iterations = 1000
+iteration_bound = mandelbrot_settings.iteration_bound
+# number of repetitions per measurement. The best run is reported.
+n_repetitions = 3
+# resolution used for the presets
+preset_res = 200
+
+
+def measure(n_threads):
+    """
+    measures the throughput of the mandelbrot kernel for a given number of threads.
+    :param n_threads: number of threads used for the computation
+    :return: pixels per second
+    """
+    best = float('inf')
+    for _ in range(n_repetitions):
+        t0 = time.time()
+        mandel.mandel(x0, y0, xw, yw, x_res, y_res, max_iterations, iteration_bound, n_threads=n_threads)
+        best = min(best, time.time() - t0)
+    return x_res * y_res / best
+
+
+def run_benchmark(max_threads=None):
+    """
+    runs the benchmark for 1,2,...,max_threads threads and prints a table of pixels per second against thread count.
+    :param max_threads: maximum number of threads. If None, the number of available cores is used.
+    :return: list of tuples (n_threads, pixels per second)
+    """
+    if max_threads is None:
+        max_threads = multiprocessing.cpu_count()
+
+    mandel.warm_up()
+
+    results = []
+    for n_threads in range(1, max_threads + 1):
+        results.append((n_threads, measure(n_threads)))
+
+    print ""
+    print "%d x %d pixels, %d iterations, %d cores available" % (x_res, y_res, max_iterations,
+                                                                   multiprocessing.cpu_count())
+    print "threads | pixels/sec | speedup"
+    for n_threads, pixels_per_second in results:
+        print "%7d | %10.0f | %7.2f" % (n_threads, pixels_per_second, pixels_per_second / results[0][1])
+
+    return results
+
+
+def run_interior_benchmark():
+    """
+    runs all presets with and without detection of interior points and prints a table of the speedup. Additionally the
+    number of pixels, which differ between both runs, is reported.
+    :return: list of tuples (preset name, time without checks, time with checks, number of differing pixels)
+    """
+    mandel.warm_up()
+
+    results = []
+    check_interior = mandel.check_interior
+    for name, preset in mandel_presets.presets.items():
+        times = []
+        it_counts = []
+        for check in [False, True]:
+            mandel.check_interior = check
+            t0 = time.time()
+            it_counts.append(mandel.mandel(preset['cx'] - .5 * preset['d'], preset['cy'] - .5 * preset['d'],
+                                           preset['d'], preset['d'], preset_res, preset_res,
+                                           preset['max_iterations'], preset['iteration_bound']))
+            times.append(time.time() - t0)
+        results.append((name, times[0], times[1], (it_counts[0] != it_counts[1]).sum()))
+    mandel.check_interior = check_interior
+
+    print ""
+    print "%d x %d pixels, presets from mandel_presets.py" % (preset_res, preset_res)
+    print "preset     | no checks [s] | checks [s] | speedup | differing pixels"
+    for name, t_plain, t_check, n_diff in results:
+        print "%-10s | %13.3f | %10.3f | %7.2f | %d" % (name, t_plain, t_check, t_plain / t_check, n_diff)
+
+    return results
+
+
+def run_engine_benchmark():
+    """
+    runs all presets with the brute force and the Mariani-Silver engine and prints a table of the speedup. The iteration
+    counts are not smoothed, therefore both engines should give identical escape indices; the number of pixels, which
+    differ between both runs, is reported.
+    :return: list of tuples (preset name, time brute force, time Mariani-Silver, number of differing pixels)
+    """
+    mandel.warm_up()
+
+    results = []
+    for name, preset in mandel_presets.presets.items():
+        times = []
+        it_counts = []
+        for engine in ['brute_force', 'mariani_silver']:
+            t0 = time.time()
+            it_counts.append(mandel.mandel(preset['cx'] - .5 * preset['d'], preset['cy'] - .5 * preset['d'],
+                                           preset['d'], preset['d'], preset_res, preset_res,
+                                           preset['max_iterations'], preset['iteration_bound'], engine=engine,
+                                           smooth=False))
+            times.append(time.time() - t0)
+        results.append((name, times[0], times[1], (it_counts[0] != it_counts[1]).sum()))
+
+    print ""
+    print "%d x %d pixels, presets from mandel_presets.py, unsmoothed iteration counts" % (preset_res, preset_res)
+    print "preset     | brute force [s] | mariani-silver [s] | speedup | differing pixels"
+    for name, t_brute, t_ms, n_diff in results:
+        print "%-10s | %15.3f | %18.3f | %7.2f | %d" % (name, t_brute, t_ms, t_brute / t_ms, n_diff)
+
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        run_benchmark(int(sys.argv[1]))
+    else:
+        run_benchmark()
+    run_interior_benchmark()
+    run_engine_benchmark()
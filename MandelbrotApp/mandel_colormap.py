@@ -1,5 +1,13 @@
 from scipy.interpolate import PchipInterpolator
 import numpy as np
+from numba import jit
+
+# number of entries in the color lookup table. One period of the colormap is resolved by lut_size colors.
+lut_size = 4096
+_luts = {}
+
+# number of bins of the histogram of iteration counts used for histogram equalization (see EscapeHistogram)
+histogram_bins = 2 ** 16
 
 
 def get_color_interpolator():
@@ -74,3 +82,120 @@ def iteration_count_to_rgb_color(data, frequency, max_value):
     color[2, data == max_value] = 0.0  # blue channel = 0
 
     return color
+
+
+def get_color_lut(size=lut_size):
+    """
+    returns a lookup table containing size colors of one period of the colormap (see get_color_interpolator) as RGBA
+    values encoded in np.uint32 (see rgb_color_to_bokeh_rgba). The table is only computed once.
+    :param size: number of colors in the lookup table
+    :return: array of size np.uint32 values encoding RGBA values
+    """
+    if size not in _luts:
+        c_interp = get_color_interpolator()
+        color = c_interp(np.arange(size) / float(size)).transpose()  # 3 x size array of RGB values
+        _luts[size] = rgb_color_to_bokeh_rgba(color[:, np.newaxis, :])[0, :]
+    return _luts[size]
+
+
+@jit('void(float64[:], float64, float64, uint32[:], uint32[:])', nopython=True, nogil=True, cache=True)
+def apply_color_lut(data, frequency, max_value, lut, img):
+    """
+    colors each value in data by looking up the color of (data % frequency) / frequency in the lookup table. Values that
+    are equal to max_value are colored black.
+    :param data: set of N scalar values in the range [0,max_value]
+    :param frequency: frequency applied for periodical repetition of the colormap
+    :param max_value: maximum value in the dataset
+    :param lut: lookup table with np.uint32 encoded RGBA values (see get_color_lut)
+    :param img: array of N np.uint32 values, where the RGBA values are saved to
+    """
+    size = lut.shape[0]
+    black = np.uint32(255 << (3 * 8))  # Alpha 100%
+    for i in range(data.shape[0]):
+        if data[i] == max_value:
+            img[i] = black
+        else:
+            index = int((data[i] % frequency) / frequency * size)
+            img[i] = lut[min(index, size - 1)]
+
+
+def iteration_count_to_bokeh_rgba(data, frequency, max_value):
+    """
+    calculates a RGBA color encoded in a np.uint32 for each given scalar value in data. Gives the same result as
+    rgb_color_to_bokeh_rgba(iteration_count_to_rgb_color(data, frequency, max_value)), but uses a precomputed lookup
+    table and does not create any intermediate RGB arrays. Due to the finite resolution of the lookup table, the color
+    channels may deviate by one from rgb_color_to_bokeh_rgba.
+    :param data: MxN array of scalar values in the range [0,max_value]
+    :param frequency: frequency applied for periodical repetition of the colormap (see iteration_count_to_rgb_color).
+                      Frequencies smaller than one are replaced by one.
+    :param max_value: maximum value in the dataset. Data values that are equal to max_value are colored black,
+                      regardless of the colormap.
+    :return: MxN array of np.uint32 values that encode RGBA values
+    """
+    img = np.empty(data.shape, dtype=np.uint32)
+    apply_color_lut(np.ascontiguousarray(data, dtype=np.float64).ravel(), max(float(frequency), 1.0),
+                    float(max_value), get_color_lut(), img.ravel())
+    return img
+
+
+class EscapeHistogram:
+    """
+    histogram of the iteration counts of the points outside of the mandelbrot set. Points can be added incrementally,
+    e.g. whenever a pass or a tile of the mandelbrot set has been computed. The cumulative histogram is used for
+    histogram equalized coloring: every color of the colormap is used for the same number of points, independent of
+    the actual distribution of the iteration counts. Therefore the coloring looks similar at every zoom level.
+    """
+
+    def __init__(self, max_iterations, n_bins=histogram_bins):
+        """
+        :param max_iterations: maximum number of iterations. Points with this iteration count are inside of the
+        mandelbrot set and are ignored.
+        :param n_bins: number of bins dividing [0, max_iterations)
+        """
+        self.max_iterations = max_iterations
+        self.counts = np.zeros(n_bins, dtype=np.int64)
+
+    def add(self, iterations):
+        """
+        adds the iteration counts of some points to the histogram.
+        :param iterations: array of iteration counts in the range [0,max_iterations]
+        """
+        outside = iterations[iterations != self.max_iterations]
+        n_bins = self.counts.shape[0]
+        bins = np.clip((outside / self.max_iterations * n_bins).astype(np.int64), 0, n_bins - 1)
+        self.counts += np.bincount(bins, minlength=n_bins)
+
+    def color_lut(self, cycles):
+        """
+        returns a lookup table mapping each bin of the histogram to its color. The colormap is repeated cycles times,
+        each repetition covering the same number of points.
+        :param cycles: number of repetitions of the colormap
+        :return: array of n_bins np.uint32 values encoding RGBA values (see apply_color_lut)
+        """
+        total = self.counts.sum()
+        if total == 0:  # no points outside of the mandelbrot set, use a linear mapping
+            position = np.linspace(0, 1, self.counts.shape[0], endpoint=False)
+        else:
+            # fraction of the points with a smaller iteration count than the center of the bin
+            position = (np.cumsum(self.counts) - .5 * self.counts) / total
+        palette = get_color_lut()
+        index = ((position * cycles) % 1 * palette.shape[0]).astype(np.int64)
+        return palette[np.minimum(index, palette.shape[0] - 1)]
+
+
+def iteration_count_to_bokeh_rgba_equalized(data, histogram, cycles):
+    """
+    calculates a RGBA color encoded in a np.uint32 for each given scalar value in data using histogram equalization.
+    Recoloring with a different number of cycles only needs a new lookup table.
+    :param data: MxN array of scalar values in the range [0,histogram.max_iterations]
+    :param histogram: EscapeHistogram of the data
+    :param cycles: number of repetitions of the colormap. Values smaller than one are replaced by one.
+    :return: MxN array of np.uint32 values that encode RGBA values. Data values that are equal to max_iterations are
+    colored black.
+    """
+    img = np.empty(data.shape, dtype=np.uint32)
+    max_value = float(histogram.max_iterations)
+    # data / max_value * n_bins is the bin of each value, which is mapped to its color
+    apply_color_lut(np.ascontiguousarray(data, dtype=np.float64).ravel(), max_value, max_value,
+                    histogram.color_lut(max(cycles, 1)), img.ravel())
+    return img
@@ -0,0 +1,227 @@
+from __future__ import division
+
+import collections
+import time
+
+import mpmath
+import numpy as np
+from numba import jit
+
+import mandel
+
+# relative accuracy required from the series approximation. The approximation is used for skipping iterations as long
+# as the highest order term is smaller than series_tolerance times the leading term.
+series_tolerance = 1e-6
+# number of probe points per direction, which are computed without approximation for limiting the skipped iterations.
+# The probes form a lattice covering the edges and the interior of the region.
+series_probe_points = 9
+
+# number of reference orbits that are kept in memory
+reference_cache_size = 8
+_reference_cache = collections.OrderedDict()
+
+
+def precision_bits(pixel_width):
+    """
+    computes the number of bits needed for the reference orbit such that a pixel of the given width can be resolved.
+    :param pixel_width: width of a pixel in the complex plane
+    :return: number of bits of the mantissa
+    """
+    return max(53, int(-np.log2(pixel_width)) + 32)
+
+
+def reference_orbit(center_re, center_im, iterate_max, iteration_bound, prec):
+    """
+    computes the orbit Z_n of the reference point C = [center_re,center_im] in arbitrary precision. The orbit is
+    stored in double precision: the values Z_n are of order 1, only the small differences to the orbits of the
+    neighbouring points need high precision, and these are computed in double precision by the perturbation kernel.
+    Reference orbits are cached.
+    :param center_re: real part of reference point (mpmath.mpf, string or float)
+    :param center_im: imaginary part of reference point (mpmath.mpf, string or float)
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param prec: number of bits used for the computation
+    :return: arrays with real and imaginary part of Z_0, Z_1, ..., Z_N, where either N = iterate_max + 1 or Z_N is the
+    first value exceeding the iteration bound.
+    """
+    with mpmath.workprec(prec):
+        c = mpmath.mpc(mpmath.mpf(center_re), mpmath.mpf(center_im))
+
+    # the key holds the exact mantissas and exponents of the reference point. str() only prints about 15 digits, which
+    # would map reference points closer than 1e-15 to the same orbit.
+    key = (c.real._mpf_, c.imag._mpf_, iterate_max, iteration_bound, prec)
+    if key in _reference_cache:
+        return _reference_cache[key]
+
+    with mpmath.workprec(prec):
+        z = mpmath.mpc(0)
+        z_re = np.zeros(iterate_max + 2, dtype=np.float64)
+        z_im = np.zeros(iterate_max + 2, dtype=np.float64)
+        n = 0
+        while True:
+            z_re[n] = float(z.real)
+            z_im[n] = float(z.imag)
+            if n == iterate_max + 1 or z_re[n] ** 2 + z_im[n] ** 2 > iteration_bound:
+                break
+            z = z * z + c
+            n += 1
+
+    orbit = (z_re[:n + 1], z_im[:n + 1])
+    _reference_cache[key] = orbit
+    while len(_reference_cache) > reference_cache_size:
+        _reference_cache.popitem(last=False)
+    return orbit
+
+
+@jit(nopython=True, nogil=True, cache=True)
+def series_approximation(z_re, z_im, radius, tolerance, n_max):
+    """
+    computes the coefficients of the series approximation
+        delta_n = A_n * dc + B_n * dc**2 + C_n * dc**3
+    of the difference delta_n between the orbit of the point C + dc and the reference orbit Z_n. The coefficients are
+    computed by the recursion
+        A_n+1 = 2 * Z_n * A_n + 1,  B_n+1 = 2 * Z_n * B_n + A_n**2,  C_n+1 = 2 * Z_n * C_n + 2 * A_n * B_n
+    as long as the approximation is accurate for all |dc| <= radius.
+    :param z_re: real part of the reference orbit
+    :param z_im: imaginary part of the reference orbit
+    :param radius: maximum distance of the points from the reference point
+    :param tolerance: relative accuracy required from the approximation
+    :param n_max: maximum number of iterations that may be skipped
+    :return: number of iterations that can be skipped and the coefficients A, B, C for this iteration
+    """
+    a = 0j
+    b = 0j
+    c = 0j
+    n = 0
+    while n < n_max and n < z_re.shape[0] - 1:
+        z = z_re[n] + 1j * z_im[n]
+        a_next = 2 * z * a + 1
+        b_next = 2 * z * b + a * a
+        c_next = 2 * z * c + 2 * a * b
+        # the approximation is valid, if the highest order term is much smaller than the leading term
+        if abs(c_next) * radius ** 2 > tolerance * abs(a_next):
+            break
+        a = a_next
+        b = b_next
+        c = c_next
+        n += 1
+    return n, a, b, c
+
+
+@jit('void(float64[:], float64[:], float64[:], float64[:], int64, complex128, complex128, complex128, int64, float64, '
+     'float64[:,:])', nopython=True, nogil=True, cache=True)
+def iterate_perturbation(dc_re, dc_im, z_re, z_im, n_skip, a, b, c, iterate_max, iteration_bound, it_count):
+    """
+    Calculate the mandelbrot sequence for all points C + dc, where C is the reference point and dc = [dc_re,dc_im] is
+    given on a grid (see iterate_mandelbrot). Instead of the sequence z_n itself, only the difference
+    delta_n = z_n - Z_n to the reference orbit Z_n is iterated in double precision:
+        delta_n+1 = 2 * Z_n * delta_n + delta_n**2 + dc
+    The first n_skip iterations are skipped using the series approximation (see series_approximation). Points, which
+    already exceed the iteration bound after the skipped iterations, have escaped during these iterations, where the
+    approximation is not valid anymore. They are computed again starting at delta_0 = 0. If the
+    difference becomes bigger than the value itself (|Z_m + delta| < |delta|), the difference loses its precision
+    (glitch). This is detected and fixed by rebasing: the difference is set to the full value delta = Z_m + delta and
+    the reference orbit is restarted at Z_0 = 0. The same rebasing is done, if the end of the reference orbit is
+    reached.
+    :param dc_re: array of length N with real part of the offsets to the reference point
+    :param dc_im: array of length M with imaginary part of the offsets to the reference point
+    :param z_re: real part of the reference orbit
+    :param z_im: imaginary part of the reference orbit
+    :param n_skip: number of iterations skipped by the series approximation
+    :param a: coefficient A of the series approximation
+    :param b: coefficient B of the series approximation
+    :param c: coefficient C of the series approximation
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param it_count: a MxN array where the iteration count until divergence is saved to.
+    """
+    m, n = it_count.shape
+    n_ref = z_re.shape[0]
+
+    for i in range(m):
+        for j in range(n):
+            dc = dc_re[j] + 1j * dc_im[i]
+            delta = ((c * dc + b) * dc + a) * dc
+            d_re = delta.real
+            d_im = delta.imag
+            k = n_skip  # index in the sequence of the point
+            r = n_skip  # index in the reference orbit
+            x = z_re[r] + d_re
+            y = z_im[r] + d_im
+            if n_skip > 0 and x * x + y * y > iteration_bound:  # escaped during the skipped iterations
+                d_re = 0.0
+                d_im = 0.0
+                k = 0
+                r = 0
+            count = iterate_max
+            zz = 0.0
+            while k <= iterate_max:
+                x = z_re[r] + d_re
+                y = z_im[r] + d_im
+                zz = x * x + y * y
+                if zz > iteration_bound:
+                    count = k
+                    break
+                if zz < d_re * d_re + d_im * d_im or r == n_ref - 1:  # rebase
+                    d_re = x
+                    d_im = y
+                    r = 0
+                t_re = 2 * z_re[r] + d_re
+                t_im = 2 * z_im[r] + d_im
+                d_re, d_im = t_re * d_re - t_im * d_im + dc_re[j], t_re * d_im + t_im * d_re + dc_im[i]
+                r += 1
+                k += 1
+            it_count[i, j] = mandel.smooth_count(count, zz, iterate_max, True)
+
+
+def mandel_perturbation(center_re, center_im, dx0, dy0, xw, yw, x_res, y_res, iterate_max, iteration_bound,
+                        n_threads=None, cancel=None):
+    """
+    computes the mandelbrot set for a part of the complex plane using perturbation theory. This allows zooming far
+    beyond the precision of double precision numbers: only the orbit of the reference point C = [center_re,center_im]
+    is computed in arbitrary precision, all other points are computed in double precision relative to C. The region is
+    given relative to the reference point.
+    :param center_re: real part of reference point (mpmath.mpf, string or float)
+    :param center_im: imaginary part of reference point (mpmath.mpf, string or float)
+    :param dx0: origin x of computation region relative to the reference point
+    :param dy0: origin y of computation region relative to the reference point
+    :param xw: width of computation region
+    :param yw: height of computation region
+    :param x_res: resolution in x direction
+    :param y_res: resolution in y direction
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param n_threads: number of threads used for the computation. If None, mandel.default_n_threads is used.
+    :param cancel: threading.Event cancelling the computation (see mandel.run_threaded) or None
+    :return: array containing number of iterations for each gridpoint
+    """
+    t0 = time.time()
+    iterate_max = int(iterate_max)
+    iteration_bound = float(iteration_bound)
+
+    prec = precision_bits(min(xw / x_res, yw / y_res))
+    z_re, z_im = reference_orbit(center_re, center_im, iterate_max, iteration_bound, prec)
+
+    # offsets of the grid points to the reference point
+    dc_re, dc_im = mandel.mandel_grid(dx0, dy0, xw, yw, x_res, y_res)
+
+    # skip iterations using the series approximation. The approximation should not skip beyond the escape of any
+    # point; this is checked at a lattice of probe points, which are computed without approximation. Points escaping
+    # between the probes are detected and computed without approximation by the kernel.
+    radius = np.sqrt(max(abs(dc_re[0]), abs(dc_re[-1])) ** 2 + max(abs(dc_im[0]), abs(dc_im[-1])) ** 2)
+    n_skip, a, b, c = series_approximation(z_re, z_im, radius, series_tolerance, iterate_max)
+    probe_cols = mandel.sample_indices(x_res, series_probe_points)
+    probe_rows = mandel.sample_indices(y_res, series_probe_points)
+    probes = np.zeros((probe_rows.shape[0], probe_cols.shape[0]), dtype=np.float64)
+    iterate_perturbation(dc_re[probe_cols], dc_im[probe_rows], z_re, z_im, 0, 0j, 0j, 0j, iterate_max,
+                         iteration_bound, probes)
+    while n_skip > 0 and np.floor(probes.min()) <= n_skip:
+        n_skip, a, b, c = series_approximation(z_re, z_im, radius, series_tolerance, n_skip - 1)
+
+    it_count = np.zeros((y_res, x_res), dtype=np.float64)
+    print "calling iterate_perturbation (" + str(prec) + " bits, " + str(n_skip) + " iterations skipped)."
+    mandel.run_threaded(iterate_perturbation, dc_re, dc_im,
+                        (z_re, z_im, n_skip, a, b, c, iterate_max, iteration_bound), (it_count,), n_threads, cancel)
+    print "elapsed time:" + str(time.time() - t0) + " sec"
+
+    return it_count
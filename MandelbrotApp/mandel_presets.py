@@ -0,0 +1,52 @@
+import collections
+
+# sample setups for nice looking pictures of the mandelbrot set. Each preset defines
+#   file:                   file name of the picture
+#   cx, cy:                 center of the region in the complex plane
+#   d:                      width and height of the region
+#   frequency:              frequency of the colormap
+#   max_iterations:         maximum number of iterations
+#   iteration_bound:        upper bound for continuing iterating the mandelbrot set
+#   median_filtering_size:  size of the median filter relative to the resolution, 0 for no filtering
+#   gauss_filtering_sigma:  standard deviation of the gaussian filter, 0 for no filtering
+presets = collections.OrderedDict()
+
+presets['spiral'] = dict(file='mandel_spiral.png',
+                         cx=-0.74364085,
+                         cy=0.13182733,
+                         d=0.000120168,
+                         frequency=32,
+                         max_iterations=10000,
+                         iteration_bound=10,
+                         median_filtering_size=0,
+                         gauss_filtering_sigma=0)
+
+presets['lightning'] = dict(file='mandel_lightning.png',
+                            cx=0.37144264,
+                            cy=0.64935303,
+                            d=0.00005,
+                            frequency=256,
+                            max_iterations=10000,
+                            iteration_bound=10,
+                            median_filtering_size=0,
+                            gauss_filtering_sigma=0)
+
+presets['tail'] = dict(file='mandel_tail.png',
+                       cx=-0.7435669,
+                       cy=0.1314023,
+                       d=0.0022878,
+                       frequency=64,
+                       max_iterations=10 * 64,
+                       iteration_bound=10,
+                       median_filtering_size=.01,
+                       gauss_filtering_sigma=1)
+
+presets['ganz'] = dict(file='mandel_ganz.png',
+                       cx=-0.5,
+                       cy=0,
+                       d=3,
+                       frequency=16,
+                       max_iterations=10000,
+                       iteration_bound=100,
+                       median_filtering_size=0,
+                       gauss_filtering_sigma=0.1)
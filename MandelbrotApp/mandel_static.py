@@ -1,82 +1,267 @@
 from __future__ import division
 
+import argparse
+import multiprocessing
+import os
+import struct
+import time
+import zlib
+
+import numpy as np
+from scipy.ndimage.filters import gaussian_filter, median_filter
+
 import mandel
 import mandel_colormap
-from scipy.ndimage.filters import gaussian_filter, median_filter
-import scipy.misc as smp
+import mandel_presets
 
-# this script generates a nice looking static picture of the mandelbrot set.
-# target resolution
+# this script generates nice looking static pictures of the mandelbrot set from the presets in mandel_presets.py. Run it
+# with
+#   $ python mandel_static.py [preset ...] [--resolution N] [--tile-size T] [--processes P] [--supersampling S]
+# The picture is split into tiles, which are rendered by a pool of processes. The tiles are written to a memory mapped
+# buffer on disk, which is finally streamed into a PNG file. Therefore the memory needed does not depend on the size of
+# the picture, which allows poster-sized pictures.
+# default target resolution
 x_res = 200
 y_res = 200
 
-# in the following you find some sample setups.
-# Spiral
-name = 'mandel_spiral.png'
-cx = -0.74364085
-cy = 0.13182733
-d = 0.000120168
-frequency = 32
-max_iterations = 10000
-iteration_bound = 10
-median_filtering_size = 0
-gauss_filtering_sigma = 0
-
-#Lightning
-name = 'mandel_lightning.png'
-cx = 0.37144264
-cy = 0.64935303
-d = 0.00005
-frequency = 256
-max_iterations = 10000
-iteration_bound = 10
-median_filtering_size = 0
-gauss_filtering_sigma = 0
-
-#Tail
-name = 'mandel_tail.png'
-cx = -0.7435669
-cy = 0.1314023
-d = 0.0022878
-frequency = 64
-max_iterations = 10 * frequency
-iteration_bound = 10
-median_filtering_size = x_res / 100
-gauss_filtering_sigma = 1
-
-#ganz
-name = 'mandel_ganz.png'
-cx = -0.5
-cy = 0
-d = 3
-frequency = 16
-max_iterations = 10000
-iteration_bound = 100
-median_filtering_size = 0
-gauss_filtering_sigma = 0.1
-
-x0 = cx-d*.5
-y0 = cy-d*.5
-xw = d
-yw = d
-
-### main process starts here. ###
-
-# calculate mandelbrot set
-it_count = mandel.mandel(x0, y0, xw, yw, x_res, y_res, max_iterations, iteration_bound)
-
-# apply some filters
-if median_filtering_size is not 0:
-    it_count = median_filter(it_count, size=median_filtering_size)
-if gauss_filtering_sigma is not 0:
-    it_count = gaussian_filter(it_count, sigma=gauss_filtering_sigma)
-
-color = mandel_colormap.iteration_count_to_rgb_color(it_count, frequency, max_iterations)
-print color.shape
-
-# plot and save picture
-img = smp.toimage(color) # Create a PIL image
-img.save(name)
-img.show()
+# default preset
+preset_name = 'ganz'
+
+# number of pixels of a tile in each direction
+tile_size = 512
+
+# number of rows that are compressed at once when writing the PNG file
+png_rows_per_chunk = 256
+
+# anti-aliasing by supersampling. If supersampling is bigger than 0, the filters of the presets are not applied.
+# Instead only the pixels at edges are computed again with supersampling x supersampling jittered samples and their
+# colors are averaged. A pixel is at an edge, if the iteration count of one of its neighbours differs by more than
+# edge_threshold times the frequency of the colormap or if only one of them is inside of the mandelbrot set.
+supersampling = 0
+edge_threshold = 1 / 16
+
+
+def get_filter_sizes(preset, x_res):
+    """
+    returns the sizes of the filters applied to the iteration counts of a preset.
+    :param preset: dict from mandel_presets.presets
+    :param x_res: resolution in x direction
+    :return: size of the median filter and standard deviation of the gaussian filter. 0 means no filtering.
+    """
+    median_filtering_size = int(round(preset['median_filtering_size'] * x_res))
+    gauss_filtering_sigma = preset['gauss_filtering_sigma']
+    return median_filtering_size, gauss_filtering_sigma
+
+
+def get_halo(preset, x_res, supersampling=0):
+    """
+    returns the number of pixels a tile has to be extended in each direction such that filtering the extended tile (or
+    finding its edges) gives the same result as for the whole picture.
+    :param preset: dict from mandel_presets.presets
+    :param x_res: resolution in x direction
+    :param supersampling: number of samples per pixel in each direction for anti-aliasing, 0 for filtering
+    :return: width of the halo in pixels
+    """
+    if supersampling > 0:  # only the direct neighbours are needed for finding edges
+        return 1
+
+    median_filtering_size, gauss_filtering_sigma = get_filter_sizes(preset, x_res)
+    halo = 0
+    if median_filtering_size != 0:
+        halo += median_filtering_size // 2 + 1
+    if gauss_filtering_sigma != 0:
+        halo += int(np.ceil(4.0 * gauss_filtering_sigma)) + 1  # gaussian_filter truncates at 4 sigma
+    return halo
+
+
+def find_edges(it_count, frequency, max_iterations):
+    """
+    finds the pixels at edges, i.e. pixels where the color changes a lot between neighbouring pixels.
+    :param it_count: array containing the number of iterations for each pixel
+    :param frequency: frequency of the colormap
+    :param max_iterations: maximum number of iterations
+    :return: boolean array, True for pixels at edges
+    """
+    inside = it_count == max_iterations
+    edges = np.zeros(it_count.shape, dtype=np.bool_)
+    for axis in [0, 1]:
+        jump = (np.abs(np.diff(it_count, axis=axis)) > edge_threshold * frequency) | \
+               (np.diff(inside.astype(np.int8), axis=axis) != 0)
+        if axis == 0:
+            edges[1:, :] |= jump
+            edges[:-1, :] |= jump
+        else:
+            edges[:, 1:] |= jump
+            edges[:, :-1] |= jump
+    return edges
+
+
+def supersample(c_re, c_im, dx, dy, preset, supersampling):
+    """
+    computes the color of the given pixels by averaging the colors of supersampling x supersampling jittered samples
+    inside of each pixel. All pixels use the same jitter, therefore the result does not depend on the tiling.
+    :param c_re: array of length K with real part of the pixel centers
+    :param c_im: array of length K with imaginary part of the pixel centers
+    :param dx: width of a pixel
+    :param dy: height of a pixel
+    :param preset: dict from mandel_presets.presets
+    :param supersampling: number of samples per pixel in each direction
+    :return: array of shape (K, 3) with the RGB values of the pixels
+    """
+    jitter = np.random.RandomState(0).uniform(size=(2, supersampling ** 2))
+    sample_index = np.arange(supersampling ** 2)
+    offsets_re = ((sample_index % supersampling + jitter[0]) / supersampling - .5) * dx
+    offsets_im = ((sample_index // supersampling + jitter[1]) / supersampling - .5) * dy
+
+    samples = np.zeros((c_re.shape[0], supersampling ** 2), dtype=np.float64)
+    mandel.iterate_mandelbrot_samples(c_re, c_im, offsets_re, offsets_im, preset['max_iterations'],
+                                      preset['iteration_bound'], mandel.check_interior, samples)
+
+    rgba = mandel_colormap.iteration_count_to_bokeh_rgba(samples, preset['frequency'], preset['max_iterations'])
+    rgb = rgba.view(np.uint8).reshape(samples.shape + (4,))[:, :, :3]
+    return np.round(rgb.mean(axis=1)).astype(np.uint8)
+
+
+def render_tile(task):
+    """
+    renders a single tile of a picture: the mandelbrot set is computed on the tile and its halo, the filters of the
+    preset are applied and the colormap is applied to the tile without its halo. If supersampling is used instead of
+    the filters, the pixels at edges are supersampled.
+    :param task: tuple (preset name, x_res, y_res, i0, i1, j0, j1, supersampling), where [i0:i1, j0:j1] are the rows
+    and columns of the tile in the picture and supersampling is the number of samples per pixel in each direction (0
+    for filtering).
+    :return: tuple (i0, j0, array of shape (i1-i0, j1-j0, 3) with the RGB values of the tile)
+    """
+    name, x_res, y_res, i0, i1, j0, j1, supersampling = task
+    preset = mandel_presets.presets[name]
+    d = preset['d']
+    max_iterations = preset['max_iterations']
+
+    # tile extended by its halo, clipped to the picture
+    halo = get_halo(preset, x_res, supersampling)
+    ia, ib = max(0, i0 - halo), min(y_res, i1 + halo)
+    ja, jb = max(0, j0 - halo), min(x_res, j1 + halo)
+
+    # use the grid of the whole picture, such that the tiles fit together seamlessly
+    re, im = mandel.mandel_grid(preset['cx'] - d * .5, preset['cy'] - d * .5, d, d, x_res, y_res)
+    it_count = np.zeros((ib - ia, jb - ja), dtype=np.float64)
+    mandel.iterate_mandelbrot_threaded(re[ja:jb], im[ia:ib], max_iterations, preset['iteration_bound'], it_count,
+                                       n_threads=1)
+
+    if supersampling > 0:
+        edges = find_edges(it_count, preset['frequency'], max_iterations)[i0 - ia:i1 - ia, j0 - ja:j1 - ja]
+    else:
+        # apply some filters
+        median_filtering_size, gauss_filtering_sigma = get_filter_sizes(preset, x_res)
+        if median_filtering_size != 0:
+            it_count = median_filter(it_count, size=median_filtering_size)
+        if gauss_filtering_sigma != 0:
+            it_count = gaussian_filter(it_count, sigma=gauss_filtering_sigma)
+    it_count = it_count[i0 - ia:i1 - ia, j0 - ja:j1 - ja]
+
+    # the bytes of the RGBA values are ordered R, G, B, A
+    rgba = mandel_colormap.iteration_count_to_bokeh_rgba(it_count, preset['frequency'], max_iterations)
+    rgb = rgba.view(np.uint8).reshape(it_count.shape + (4,))[:, :, :3].copy()
+
+    if supersampling > 0:
+        i, j = np.nonzero(edges)
+        rgb[i, j] = supersample(re[j0 + j], im[i0 + i], re[1] - re[0], im[1] - im[0], preset, supersampling)
+    return i0, j0, rgb
+
+
+def write_png(file_name, rgb):
+    """
+    writes an RGB picture to a PNG file. The picture is compressed and written in chunks of png_rows_per_chunk rows,
+    therefore the picture may be a memory mapped array, which is larger than the available memory.
+    :param file_name: name of the PNG file
+    :param rgb: array of shape (M, N, 3) and type np.uint8 with the RGB values of the picture
+    """
+    height, width, _ = rgb.shape
+
+    def write_chunk(f, chunk_type, data):
+        f.write(struct.pack('>I', len(data)))
+        f.write(chunk_type + data)
+        f.write(struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    with open(file_name, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        write_chunk(f, b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))  # 8 bit RGB
+        compressor = zlib.compressobj()
+        for i in range(0, height, png_rows_per_chunk):
+            rows = rgb[i:i + png_rows_per_chunk]
+            # every row starts with its filter type (0: no filter)
+            scanlines = np.zeros((rows.shape[0], 1 + 3 * width), dtype=np.uint8)
+            scanlines[:, 1:] = rows.reshape(rows.shape[0], 3 * width)
+            data = compressor.compress(scanlines.tobytes())
+            if data:
+                write_chunk(f, b'IDAT', data)
+        write_chunk(f, b'IDAT', compressor.flush())
+        write_chunk(f, b'IEND', b'')
+
+
+def render(name, x_res, y_res, tile_size=tile_size, n_processes=None, file_name=None, supersampling=supersampling):
+    """
+    renders a preset to a PNG file. The tiles are rendered by a pool of processes and written to a memory mapped buffer
+    (file_name + '.npy'), which is removed after the PNG file has been written.
+    :param name: name of the preset in mandel_presets.presets
+    :param x_res: resolution in x direction
+    :param y_res: resolution in y direction
+    :param tile_size: number of pixels of a tile in each direction
+    :param n_processes: number of processes used for rendering. If None, one process per available core is used.
+    :param file_name: name of the PNG file. If None, the file name of the preset is used.
+    :param supersampling: number of samples per pixel in each direction for anti-aliasing at edges. If 0, the filters
+    of the preset are applied instead.
+    """
+    t0 = time.time()
+    if file_name is None:
+        file_name = mandel_presets.presets[name]['file']
+    if n_processes is None:
+        n_processes = multiprocessing.cpu_count()
+
+    tasks = [(name, x_res, y_res, i0, min(i0 + tile_size, y_res), j0, min(j0 + tile_size, x_res), supersampling)
+             for i0 in range(0, y_res, tile_size)
+             for j0 in range(0, x_res, tile_size)]
+    buffer_name = file_name + '.npy'
+    rgb = np.lib.format.open_memmap(buffer_name, mode='w+', dtype=np.uint8, shape=(y_res, x_res, 3))
+
+    print "rendering " + name + " (" + str(x_res) + " x " + str(y_res) + " pixels, " + str(len(tasks)) + " tiles)."
+    pool = multiprocessing.Pool(n_processes)
+    try:
+        for n_done, (i0, j0, tile) in enumerate(pool.imap_unordered(render_tile, tasks)):
+            rgb[i0:i0 + tile.shape[0], j0:j0 + tile.shape[1]] = tile
+            print "tile " + str(n_done + 1) + " of " + str(len(tasks)) + " done."
+    finally:
+        pool.close()
+        pool.join()
+
+    print "writing " + file_name + "."
+    rgb.flush()
+    write_png(file_name, rgb)
+    del rgb
+    os.remove(buffer_name)
+    print "elapsed time:" + str(time.time() - t0) + " sec"
+
 
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='renders static pictures of the mandelbrot set.')
+    parser.add_argument('presets', nargs='*', default=[preset_name],
+                        help='names of the presets to render or "all" (available: ' +
+                             ', '.join(mandel_presets.presets.keys()) + ')')
+    parser.add_argument('--resolution', type=int, nargs=2, default=[x_res, y_res], metavar=('X_RES', 'Y_RES'),
+                        help='resolution of the pictures in pixels')
+    parser.add_argument('--tile-size', type=int, default=tile_size,
+                        help='number of pixels of a tile in each direction')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of processes used for rendering (default: one per core)')
+    parser.add_argument('--supersampling', type=int, default=supersampling,
+                        help='anti-aliasing: number of samples per pixel in each direction at edges. 0 applies the '
+                             'filters of the preset instead (default: %(default)s)')
+    args = parser.parse_args()
 
+    names = mandel_presets.presets.keys() if args.presets == ['all'] else args.presets
+    for name in names:
+        if name not in mandel_presets.presets:
+            parser.error("unknown preset " + name + "!")
+    for name in names:
+        render(name, args.resolution[0], args.resolution[1], args.tile_size, args.processes,
+               supersampling=args.supersampling)
@@ -0,0 +1,620 @@
+from __future__ import division
+
+import collections
+import functools
+import os
+import Queue
+import threading
+import time
+
+import numpy as np
+
+import mandel
+
+# The complex plane is split into a quadtree of square tiles. On zoom level 0 a single tile has the width base_width,
+# on zoom level L a tile has the width base_width / 2**L. Tile (L, tx, ty) covers the region
+#   [origin_x + tx * w_L, origin_x + (tx + 1) * w_L) x [origin_y + ty * w_L, origin_y + (ty + 1) * w_L)
+# and is discretized by tile_size x tile_size pixels, which are sampled at the lower left corner of each pixel.
+# Therefore neighbouring tiles never share a pixel and any view can be assembled from the tiles of one zoom level.
+# Additionally every second pixel of a tile on level L + 1 coincides with a pixel of its parent tile on level L. If the
+# parent tile is cached, only the remaining three quarters of the pixels have to be computed.
+origin_x = -2.0
+origin_y = -2.0
+base_width = 4.0
+
+# caches shared by all sessions of the server process. See get_shared_cache.
+_shared_caches = dict()
+_shared_cache_lock = threading.Lock()
+
+# prefetchers shared by all sessions of the server process. See get_shared_prefetcher.
+_shared_prefetchers = dict()
+
+# tiles currently being computed by any thread of the server process, mapped to a threading.Event, which is set when
+# the computation is finished. See compute_cached_tile.
+_in_flight = dict()
+_in_flight_lock = threading.Lock()
+
+
+class TileCache:
+    """
+    memory bounded least recently used (LRU) cache for mandelbrot tiles. Tiles are identified by the key
+    (zoom level, tile x, tile y, max_iter, iteration_bound). The cache can also hold the states of tiles
+    (mandel.MandelState, identified by the key (zoom level, tile x, tile y, iteration_bound)), but these cannot be
+    stored on disk. If a cache directory is given, every computed tile is also
+    written to disk and tiles that were evicted from memory (or computed by an earlier server run) are read from there.
+    The cache is thread safe; one instance of this class is shared between all sessions of the server process.
+    """
+
+    def __init__(self, max_bytes, cache_dir=None):
+        """
+        :param max_bytes: maximum number of bytes that the tiles in memory may occupy
+        :param cache_dir: directory for the on disk tier. If None, tiles are only held in memory.
+        """
+        self._max_bytes = max_bytes
+        self._cache_dir = cache_dir
+        self._tiles = collections.OrderedDict()
+        self._n_bytes = 0
+        self._lock = threading.Lock()
+        if self._cache_dir is not None and not os.path.isdir(self._cache_dir):
+            os.makedirs(self._cache_dir)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._tiles
+
+    def __len__(self):
+        with self._lock:
+            return len(self._tiles)
+
+    def n_bytes(self):
+        """
+        :return: number of bytes occupied by the tiles in memory
+        """
+        with self._lock:
+            return self._n_bytes
+
+    def get(self, key):
+        """
+        returns the tile for the given key and marks it as most recently used.
+        :param key: tuple (zoom level, tile x, tile y, max_iter, iteration_bound)
+        :return: the tile or None, if the tile is neither in memory nor on disk
+        """
+        with self._lock:
+            tile = self._tiles.pop(key, None)
+            if tile is not None:
+                self._tiles[key] = tile  # reinsert as most recently used
+                return tile
+
+        if self._cache_dir is not None:
+            path = self._tile_path(key)
+            if os.path.isfile(path):
+                tile = np.load(path)
+                self._insert(key, tile)
+                return tile
+
+        return None
+
+    def put(self, key, tile):
+        """
+        inserts a tile into the cache. If the cache exceeds its memory bound, the least recently used tiles are evicted.
+        :param key: tuple (zoom level, tile x, tile y, max_iter, iteration_bound)
+        :param tile: array holding the iteration counts of the tile
+        """
+        self._insert(key, tile)
+        if self._cache_dir is not None:
+            np.save(self._tile_path(key), tile)
+
+    def clear(self):
+        """
+        removes all tiles from memory. Tiles on disk are kept.
+        """
+        with self._lock:
+            self._tiles.clear()
+            self._n_bytes = 0
+
+    def _insert(self, key, tile):
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self._n_bytes -= old.nbytes
+            self._tiles[key] = tile
+            self._n_bytes += tile.nbytes
+            while self._n_bytes > self._max_bytes and len(self._tiles) > 1:
+                _, evicted = self._tiles.popitem(last=False)  # least recently used tile
+                self._n_bytes -= evicted.nbytes
+
+    def _tile_path(self, key):
+        return os.path.join(self._cache_dir, 'tile_%d_%d_%d_%d_%r.npy' % key)
+
+
+def get_shared_cache(max_bytes, cache_dir=None, name='tiles'):
+    """
+    returns the cache with the given name shared by all sessions of the server process. The cache is created on the
+    first call, later calls return the same cache and ignore the arguments.
+    :param max_bytes: maximum number of bytes that the tiles in memory may occupy
+    :param cache_dir: directory for the on disk tier. If None, tiles are only held in memory.
+    :param name: name of the cache
+    :return: TileCache
+    """
+    with _shared_cache_lock:
+        if name not in _shared_caches:
+            _shared_caches[name] = TileCache(max_bytes, cache_dir)
+        return _shared_caches[name]
+
+
+def tile_width(level):
+    """
+    :param level: zoom level
+    :return: width of a tile on the given zoom level in the complex plane
+    """
+    return base_width / 2 ** level
+
+
+def zoom_level(xw, yw, x_res, y_res, tile_size):
+    """
+    computes the coarsest zoom level, whose pixels are at least as fine as the pixels of the given view. Therefore the
+    view is never upsampled. The pixels of the chosen level are between 1/2 and 1 times as wide as the pixels of the
+    view, therefore up to four times as many pixels are computed as the view shows (about 2.2 times on average).
+    :param xw: width of the view
+    :param yw: height of the view
+    :param x_res: resolution of the view in x direction
+    :param y_res: resolution of the view in y direction
+    :param tile_size: number of pixels of a tile in each direction
+    :return: zoom level
+    """
+    pixel_width = min(xw / x_res, yw / y_res)
+    return max(0, int(np.ceil(np.log2(base_width / (tile_size * pixel_width)))))
+
+
+def view_pixels(x0, y0, xw, yw, x_res, y_res, level, tile_size):
+    """
+    computes the global pixel indices on the given zoom level, which are nearest to the points of the grid of the view.
+    The grid is the same as for the computation without tiles (see mandel.mandel_grid), therefore both computations
+    show the same region.
+    :param x0: origin x of the view
+    :param y0: origin y of the view
+    :param xw: width of the view
+    :param yw: height of the view
+    :param x_res: resolution of the view in x direction
+    :param y_res: resolution of the view in y direction
+    :param level: zoom level
+    :param tile_size: number of pixels of a tile in each direction
+    :return: pixel indices of the rows (i) and columns (j) of the view
+    """
+    pixel_width = tile_width(level) / tile_size
+    x, y = mandel.mandel_grid(x0, y0, xw, yw, x_res, y_res)
+    j = np.round((x - origin_x) / pixel_width).astype(np.int64)
+    i = np.round((y - origin_y) / pixel_width).astype(np.int64)
+    return i, j
+
+
+def view_keys(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound, tile_size, margin=0):
+    """
+    returns the keys of the tiles needed for the given view (see mandel_tiled).
+    :param x0: origin x of the view
+    :param y0: origin y of the view
+    :param xw: width of the view
+    :param yw: height of the view
+    :param x_res: resolution of the view in x direction
+    :param y_res: resolution of the view in y direction
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param tile_size: number of pixels of a tile in each direction
+    :param margin: number of additional rings of tiles around the view
+    :return: list of tile keys
+    """
+    level = zoom_level(xw, yw, x_res, y_res, tile_size)
+    i, j = view_pixels(x0, y0, xw, yw, x_res, y_res, level, tile_size)
+    return [(level, tx, ty, int(iterate_max), float(iteration_bound))
+            for ty in range(i[0] // tile_size - margin, i[-1] // tile_size + margin + 1)
+            for tx in range(j[0] // tile_size - margin, j[-1] // tile_size + margin + 1)]
+
+
+def prefetch_keys(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound, tile_size, cursor_x=None,
+                  cursor_y=None, margin=1):
+    """
+    returns the keys of the tiles, which are likely needed for the next view: the tiles of the next zoom level under the
+    cursor (zooming in by a factor of two keeps the point under the cursor fixed) and the rings of tiles around the
+    current view, which are needed for panning. The tiles are ordered by their likelihood to be needed: tiles of the
+    zoomed view come first, the rings around the view follow, starting with the tiles closest to the center of the view.
+    Tiles of the current view are not included.
+    :param x0: origin x of the current view
+    :param y0: origin y of the current view
+    :param xw: width of the current view
+    :param yw: height of the current view
+    :param x_res: resolution of the view in x direction
+    :param y_res: resolution of the view in y direction
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param tile_size: number of pixels of a tile in each direction
+    :param cursor_x: x coordinate of the cursor. If None or outside of the view, the center of the view is used.
+    :param cursor_y: y coordinate of the cursor. If None or outside of the view, the center of the view is used.
+    :param margin: number of rings of tiles around the view
+    :return: list of tile keys
+    """
+    if cursor_x is None or cursor_y is None or not (x0 <= cursor_x <= x0 + xw and y0 <= cursor_y <= y0 + yw):
+        cursor_x = x0 + .5 * xw
+        cursor_y = y0 + .5 * yw
+
+    current = view_keys(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound, tile_size)
+    zoomed = view_keys(cursor_x - .5 * (cursor_x - x0), cursor_y - .5 * (cursor_y - y0), .5 * xw, .5 * yw,
+                       x_res, y_res, iterate_max, iteration_bound, tile_size)
+    ring = view_keys(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound, tile_size, margin)
+    center_x = (x0 + .5 * xw - origin_x) / tile_width(current[0][0]) - .5
+    center_y = (y0 + .5 * yw - origin_y) / tile_width(current[0][0]) - .5
+    ring.sort(key=lambda key: (key[1] - center_x) ** 2 + (key[2] - center_y) ** 2)
+
+    keys = []
+    known = set(current)
+    for key in zoomed + ring:
+        if key not in known:
+            known.add(key)
+            keys.append(key)
+    return keys
+
+
+def parent_key(key):
+    """
+    :param key: tuple (zoom level, tile x, tile y, max_iter, iteration_bound)
+    :return: key of the tile on the next coarser zoom level, which covers the given tile. None on zoom level 0.
+    """
+    level, tx, ty, max_iter, iteration_bound = key
+    if level == 0:
+        return None
+    return level - 1, tx // 2, ty // 2, max_iter, iteration_bound
+
+
+def state_key(key):
+    """
+    :param key: tuple (zoom level, tile x, tile y, max_iter, iteration_bound)
+    :return: key of the state of the tile, which does not depend on max_iter
+    """
+    level, tx, ty, _, iteration_bound = key
+    return level, tx, ty, iteration_bound
+
+
+def compute_tile(key, tile_size, cache=None, state_cache=None, cancel=None):
+    """
+    computes the iteration counts of a single tile. If the parent tile is found in the cache, its iteration counts are
+    reused. If a cache for the states of the tiles is given, the computation continues from the state of the tile (or
+    its parent), if available, and the state is stored in the cache. Therefore raising max_iter only computes the
+    additional iterations of the points that have not escaped yet.
+    :param key: tuple (zoom level, tile x, tile y, max_iter, iteration_bound)
+    :param tile_size: number of pixels of a tile in each direction
+    :param cache: TileCache that is searched for the parent tile. If None, all pixels are computed.
+    :param state_cache: TileCache holding the states of the tiles. If None, no states are used.
+    :param cancel: threading.Event cancelling the computation of the tile (see mandel.run_threaded) or None
+    :return: tile_size x tile_size array of iteration counts
+    """
+    level, tx, ty, max_iter, iteration_bound = key
+    w = tile_width(level)
+    pixel_corners = np.arange(tile_size, dtype=np.float64) / tile_size
+    c_re = origin_x + (tx + pixel_corners) * w
+    c_im = origin_y + (ty + pixel_corners) * w
+    half = tile_size // 2
+    i = (ty % 2) * half
+    j = (tx % 2) * half
+
+    if state_cache is not None:
+        state = state_cache.get(state_key(key))
+        if state is None:
+            state = mandel.MandelState(c_re, c_im, iteration_bound)
+            parent_state = None
+            if parent_key(key) is not None:
+                parent_state = state_cache.get(state_key(parent_key(key)))
+            if parent_state is not None:  # every second point has already been iterated by the parent
+                state.inherit(parent_state, i, j)
+        state.iterate(max_iter, n_threads=1, cancel=cancel)
+        state_cache.put(state_key(key), state)
+        return state.iteration_count(max_iter)
+
+    tile = np.zeros((tile_size, tile_size), dtype=np.float64)
+
+    parent = None
+    if cache is not None and parent_key(key) is not None:
+        parent = cache.get(parent_key(key))
+
+    if parent is None:
+        mandel.iterate_mandelbrot_threaded(c_re, c_im, max_iter, iteration_bound, tile, n_threads=1, cancel=cancel)
+    else:
+        tile[::2, ::2] = parent[i:i + half, j:j + half]
+        mandel.iterate_mandelbrot_refine(c_re, c_im, max_iter, iteration_bound, tile, n_threads=1, cancel=cancel)
+    return tile
+
+
+def compute_cached_tile(key, tile_size, cache, state_cache=None, cancel=None):
+    """
+    returns the tile from the cache. A missing tile is computed and stored in the cache. If the tile is already being
+    computed by another thread, e.g. for another session, that computation is awaited instead of computing the tile
+    twice. If it fails or is cancelled, the tile is computed by this thread.
+    :param key: tuple (zoom level, tile x, tile y, max_iter, iteration_bound)
+    :param tile_size: number of pixels of a tile in each direction
+    :param cache: TileCache holding already computed tiles
+    :param state_cache: TileCache holding the states of the tiles. If None, no states are used.
+    :param cancel: threading.Event cancelling the computation of the tile or waiting for it (see mandel.run_threaded)
+    or None
+    :return: tile_size x tile_size array of iteration counts
+    """
+    in_flight_key = (id(cache), key)
+    while True:
+        tile = cache.get(key)
+        if tile is not None:
+            return tile
+        with _in_flight_lock:
+            done = _in_flight.get(in_flight_key)
+            if done is None:
+                # the tile may have been finished after the first look into the cache. Since a tile is put into the
+                # cache before it is removed from _in_flight, this look is reliable.
+                tile = cache.get(key)
+                if tile is not None:
+                    return tile
+                # nobody computes the tile, therefore this thread does
+                done = _in_flight[in_flight_key] = threading.Event()
+                break
+        while not done.wait(.05):
+            mandel.check_cancelled(cancel)
+
+    try:
+        tile = compute_tile(key, tile_size, cache, state_cache, cancel)
+        cache.put(key, tile)
+    finally:
+        with _in_flight_lock:
+            del _in_flight[in_flight_key]
+        done.set()
+    return tile
+
+
+def compute_tiles(keys, tile_size, cache, n_threads=None, state_cache=None, cancel=None, on_computed=None):
+    """
+    computes the given tiles using several threads and stores them in the cache.
+    :param keys: list of tile keys
+    :param tile_size: number of pixels of a tile in each direction
+    :param cache: TileCache where the computed tiles are stored
+    :param n_threads: number of threads used for the computation. If None, mandel.default_n_threads is used.
+    :param state_cache: TileCache holding the states of the tiles. If None, no states are used.
+    :param cancel: threading.Event. If it is set, the threads abort their current tile (or stop waiting for a tile
+    computed by another thread) and mandel.ComputationCancelled is raised. The tiles computed so far stay in the cache.
+    If None, the computation cannot be cancelled.
+    :param on_computed: function called as on_computed(key, tile) by the worker threads after each tile or None
+    """
+    if n_threads is None:
+        n_threads = mandel.default_n_threads
+    n_threads = max(1, min(int(n_threads), len(keys)))
+
+    queue = Queue.Queue()
+    for key in keys:
+        queue.put(key)
+
+    def worker():
+        while cancel is None or not cancel.is_set():
+            try:
+                key = queue.get_nowait()
+            except Queue.Empty:
+                return
+            try:
+                tile = compute_cached_tile(key, tile_size, cache, state_cache, cancel)
+            except mandel.ComputationCancelled:
+                return
+            if on_computed is not None:
+                on_computed(key, tile)
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    mandel.check_cancelled(cancel)
+
+
+def mandel_tiled(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound, tile_size, cache, n_threads=None,
+                 state_cache=None, cancel=None, on_tile=None):
+    """
+    computes the mandelbrot set for a part of the complex plane by assembling it from tiles. Only tiles that are not in
+    the cache are computed. The tiles are resampled to the requested resolution by taking the nearest tile pixel for
+    every point of the grid of the view (see view_pixels).
+    :param x0: origin x of computation region
+    :param y0: origin y of computation region
+    :param xw: width of computation region
+    :param yw: height of computation region
+    :param x_res: resolution in x direction
+    :param y_res: resolution in y direction
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param tile_size: number of pixels of a tile in each direction
+    :param cache: TileCache holding already computed tiles
+    :param n_threads: number of threads used for the computation. If None, mandel.default_n_threads is used.
+    :param state_cache: TileCache holding the states of the tiles. If None, no states are used.
+    :param cancel: threading.Event cancelling the computation (see compute_tiles) or None
+    :param on_tile: function called as on_tile(counts) with the iteration counts of the points of the view covered by a
+    tile, as soon as the tile is available: first for the cached tiles, then for every computed tile from the worker
+    threads. Together the calls cover every point of the view once. None, if not needed.
+    :return: array containing number of iterations for each gridpoint
+    """
+    t0 = time.time()
+
+    iterate_max = int(iterate_max)
+    iteration_bound = float(iteration_bound)
+    level = zoom_level(xw, yw, x_res, y_res, tile_size)
+
+    i, j = view_pixels(x0, y0, xw, yw, x_res, y_res, level, tile_size)
+    tx_min, tx_max = j[0] // tile_size, j[-1] // tile_size
+    ty_min, ty_max = i[0] // tile_size, i[-1] // tile_size
+
+    keys = [(level, tx, ty, iterate_max, iteration_bound)
+            for ty in range(ty_min, ty_max + 1)
+            for tx in range(tx_min, tx_max + 1)]
+    cached = dict((key, cache.get(key)) for key in keys)
+    missing = [key for key in keys if cached[key] is None]
+
+    on_computed = None
+    if on_tile is not None:
+        # points of the view covered by each row and column of tiles
+        view_rows = dict((ty, np.nonzero(i // tile_size == ty)[0]) for ty in range(ty_min, ty_max + 1))
+        view_cols = dict((tx, np.nonzero(j // tile_size == tx)[0]) for tx in range(tx_min, tx_max + 1))
+
+        def on_computed(key, tile):
+            _, tx, ty, _, _ = key
+            on_tile(tile[np.ix_(i[view_rows[ty]] - ty * tile_size, j[view_cols[tx]] - tx * tile_size)])
+
+        for key in keys:
+            if cached[key] is not None:
+                on_computed(key, cached[key])
+
+    print "computing " + str(len(missing)) + " of " + str(len(keys)) + " tiles on zoom level " + str(level) + "."
+    compute_tiles(missing, tile_size, cache, n_threads, state_cache, cancel, on_computed)
+
+    # assemble all tiles of the view into one mosaic
+    mosaic = np.empty(((ty_max - ty_min + 1) * tile_size, (tx_max - tx_min + 1) * tile_size), dtype=np.float64)
+    for key in keys:
+        _, tx, ty, _, _ = key
+        # computed again, if evicted in the meantime, because the cache is too small for the whole view
+        tile = compute_cached_tile(key, tile_size, cache, state_cache, cancel)
+        mosaic[(ty - ty_min) * tile_size:(ty - ty_min + 1) * tile_size,
+               (tx - tx_min) * tile_size:(tx - tx_min + 1) * tile_size] = tile
+
+    # resample mosaic at the points of the grid of the view
+    it_count = mosaic[np.ix_(i - ty_min * tile_size, j - tx_min * tile_size)]
+
+    print "elapsed time:" + str(time.time() - t0) + " sec"
+
+    return it_count
+
+
+def mandel_tiled_progressive(x0, y0, xw, yw, x_res, y_res, iterate_max, iteration_bound, tile_size, cache, n_passes=4,
+                             n_threads=None, state_cache=None, cancel=None, on_tile=None):
+    """
+    computes the mandelbrot set for a part of the complex plane in several passes from coarse to fine by assembling it
+    from the tiles of successively finer zoom levels. In the last pass the full resolution x_res x y_res is reached,
+    every pass before has half of the resolution of the following pass. The tiles of each pass are the parents of the
+    tiles of the following pass, therefore their iteration counts are reused (see compute_tile).
+    :param x0: origin x of computation region
+    :param y0: origin y of computation region
+    :param xw: width of computation region
+    :param yw: height of computation region
+    :param x_res: resolution in x direction
+    :param y_res: resolution in y direction
+    :param iterate_max: maximum number of iterations that are computed
+    :param iteration_bound: upper bound for continuing iterating the mandelbrot set
+    :param tile_size: number of pixels of a tile in each direction
+    :param cache: TileCache holding already computed tiles
+    :param n_passes: number of passes
+    :param n_threads: number of threads used for the computation. If None, mandel.default_n_threads is used.
+    :param state_cache: TileCache holding the states of the tiles. If None, no states are used.
+    :param cancel: threading.Event cancelling the computation (see compute_tiles) or None
+    :param on_tile: function called as on_tile(i_pass, counts) for every tile of every pass (see mandel_tiled) or None
+    :return: generator yielding the array containing the number of iterations for each gridpoint after each pass
+    """
+    for i_pass in range(n_passes):
+        reduction = 2 ** (n_passes - 1 - i_pass)
+        yield mandel_tiled(x0, y0, xw, yw, max(1, x_res // reduction), max(1, y_res // reduction),
+                           iterate_max, iteration_bound, tile_size, cache, n_threads, state_cache, cancel,
+                           None if on_tile is None else functools.partial(on_tile, i_pass))
+
+
+class TilePrefetcher:
+    """
+    computes tiles, which are likely needed by the next user interaction (see prefetch_keys), while the server is idle.
+    The tiles are computed by a single background thread and stored in the cache, such that the next pan or zoom is
+    usually a cache hit. Prefetching has low priority: it only runs while no computation requested by a user is running
+    (see pause and resume) and a requested computation preempts the tile currently being prefetched after a few rows.
+    One instance of this class is shared between all sessions of the server process.
+    """
+
+    def __init__(self, cache, tile_size):
+        """
+        :param cache: TileCache where the prefetched tiles are stored
+        :param tile_size: number of pixels of a tile in each direction
+        """
+        self.cache = cache
+        self.tile_size = tile_size
+        self.n_prefetched = 0  # number of tiles computed by the prefetcher
+        self._keys = []  # tiles waiting to be prefetched, most likely first
+        self._owner = None  # owner of the tiles waiting to be prefetched, e.g. the document of a session
+        self._generation = 0  # incremented, whenever the tiles waiting to be prefetched are replaced
+        self._n_active = 0  # number of running computations requested by users
+        self._cancel = threading.Event()  # preempts the tile currently being prefetched
+        self._condition = threading.Condition()
+        self._thread = None
+
+    def prefetch(self, keys, owner=None):
+        """
+        replaces the tiles waiting to be prefetched.
+        :param keys: list of tile keys, most likely first
+        :param owner: object identifying the requester of the tiles (see withdraw)
+        """
+        with self._condition:
+            self._keys = list(keys)
+            self._owner = owner
+            self._generation += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run)
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def withdraw(self, owner):
+        """
+        drops the tiles waiting to be prefetched and cancels the tile currently being prefetched, if they have been
+        requested by the given owner. Tiles requested by other owners are not affected.
+        :param owner: object passed to prefetch
+        """
+        with self._condition:
+            if self._owner is not owner:
+                return
+            self._keys = []
+            self._owner = None
+            self._generation += 1  # the cancelled tile is not queued again
+            self._cancel.set()
+
+    def pause(self):
+        """
+        pauses prefetching during a computation requested by a user. The tile currently being prefetched is cancelled.
+        Every call has to be followed by a call of resume.
+        """
+        with self._condition:
+            self._n_active += 1
+            self._cancel.set()
+
+    def resume(self):
+        """
+        resumes prefetching, when no other computation requested by a user is running.
+        """
+        with self._condition:
+            self._n_active -= 1
+            if self._n_active == 0:
+                self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._n_active > 0 or len(self._keys) == 0:
+                    self._condition.wait()
+                key = self._keys.pop(0)
+                generation = self._generation
+                self._cancel.clear()
+
+            if self.cache.get(key) is not None:
+                continue
+            try:
+                compute_cached_tile(key, self.tile_size, self.cache, cancel=self._cancel)
+            except mandel.ComputationCancelled:
+                with self._condition:
+                    if generation == self._generation:  # try again, when prefetching is resumed
+                        self._keys.insert(0, key)
+                continue
+            self.n_prefetched += 1
+
+
+def get_shared_prefetcher(cache, tile_size):
+    """
+    returns the prefetcher for the given cache shared by all sessions of the server process. The prefetcher is created
+    on the first call.
+    :param cache: TileCache where the prefetched tiles are stored
+    :param tile_size: number of pixels of a tile in each direction
+    :return: TilePrefetcher
+    """
+    with _shared_cache_lock:
+        key = (id(cache), tile_size)
+        if key not in _shared_prefetchers:
+            _shared_prefetchers[key] = TilePrefetcher(cache, tile_size)
+        return _shared_prefetchers[key]
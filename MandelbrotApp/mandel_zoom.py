@@ -0,0 +1,164 @@
+from __future__ import division
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+from scipy.ndimage import map_coordinates
+
+import mandel
+import mandel_colormap
+import mandel_presets
+import mandel_static
+
+# this script renders the frames of a zoom video into the center of a preset from mandel_presets.py. Run it with
+#   $ python mandel_zoom.py [preset] [--frames N] [--resolution R] [--start-width W] [--output-dir D] [--processes P]
+# Instead of computing every frame on its own, the mandelbrot set is computed once on a log-polar grid around the center
+# of the zoom (exponential map): the columns of this strip are circles with exponentially decreasing radii. Every frame
+# is a resampling of the strip, therefore the cost of the whole video is the cost of the strip, which corresponds to
+# a few frames for each zoom factor of e. The frames are saved as PNG files, which can be combined into a video, e.g.
+#   $ ffmpeg -i zoom_%05d.png zoom.mp4
+# default number of frames
+n_frames = 100
+
+# default resolution of the frames in pixels (the frames are square)
+resolution = 200
+
+# default width of the first frame
+start_width = 3.0
+
+# number of columns of the strip computed by one task of the process pool
+strip_columns_per_task = 64
+
+
+def get_strip_grid(res, width_start, width_end):
+    """
+    creates the log-polar grid of the strip. The grid is conformal: the spacing in log(r) equals the spacing in the
+    angle, therefore the samples are square. The angular resolution is chosen such that the corners of the frames are
+    resolved with one sample per pixel; closer to the center the frames are oversampled.
+    :param res: resolution of the frames
+    :param width_start: width of the first (biggest) frame
+    :param width_end: width of the last (smallest) frame
+    :return: logarithm of the radii and angles of the grid
+    """
+    rho_max = np.sqrt(.5)  # distance of the corners to the center of a frame of width 1
+    n_theta = int(np.ceil(2 * np.pi * rho_max * res))
+    step = 2 * np.pi / n_theta
+    log_r_min = np.log(.5 * width_end / res)
+    log_r_max = np.log(rho_max * width_start)
+    n_r = int(np.ceil((log_r_max - log_r_min) / step)) + 1
+    log_r = log_r_min + step * np.arange(n_r)
+    theta = step * np.arange(n_theta)
+    return log_r, theta
+
+
+def render_strip_columns(task):
+    """
+    computes some columns of the strip.
+    :param task: tuple (preset name, log_r, theta), where log_r are the logarithms of the radii of the columns
+    :return: array containing the number of iterations for each point of the columns
+    """
+    name, log_r, theta = task
+    preset = mandel_presets.presets[name]
+    it_count = np.zeros((theta.shape[0], log_r.shape[0]), dtype=np.float64)
+    mandel.iterate_mandelbrot_log_polar(preset['cx'], preset['cy'], log_r, theta, preset['max_iterations'],
+                                        preset['iteration_bound'], mandel.check_interior, it_count)
+    return it_count
+
+
+def render_strip(name, log_r, theta, n_processes=None):
+    """
+    computes the strip using a pool of processes. The strip is split into blocks of columns.
+    :param name: name of the preset in mandel_presets.presets
+    :param log_r: logarithm of the radii of the columns of the strip
+    :param theta: angles of the rows of the strip
+    :param n_processes: number of processes used. If None, one process per available core is used.
+    :return: array containing the number of iterations for each point of the strip
+    """
+    if n_processes is None:
+        n_processes = multiprocessing.cpu_count()
+
+    tasks = [(name, log_r[j:j + strip_columns_per_task], theta)
+             for j in range(0, log_r.shape[0], strip_columns_per_task)]
+    pool = multiprocessing.Pool(n_processes)
+    try:
+        blocks = pool.map(render_strip_columns, tasks)
+    finally:
+        pool.close()
+        pool.join()
+    return np.hstack(blocks)
+
+
+def resample_frame(strip, log_r, theta, res, width):
+    """
+    computes a frame from the strip by bilinear interpolation of the iteration counts. The frame has the same grid as
+    mandel.mandel with the zoom center in its center (row 0 has the smallest imaginary part).
+    :param strip: array containing the number of iterations for each point of the strip
+    :param log_r: logarithm of the radii of the columns of the strip
+    :param theta: angles of the rows of the strip
+    :param res: resolution of the frame
+    :param width: width of the frame
+    :return: res x res array containing the number of iterations for each pixel of the frame
+    """
+    step = theta[1] - theta[0]
+    x = np.linspace(-.5 * width, .5 * width, res)
+    r = np.hypot(x[np.newaxis, :], x[:, np.newaxis])
+    angle = np.arctan2(x[:, np.newaxis], x[np.newaxis, :]) % (2 * np.pi)
+    log_radius = np.log(np.maximum(r, np.exp(log_r[0])))
+    # the first row is appended to the strip, such that the interpolation wraps around in the angle
+    periodic_strip = np.vstack([strip, strip[:1, :]])
+    coordinates = [angle / step, (log_radius - log_r[0]) / step]
+    return map_coordinates(periodic_strip, coordinates, order=1, mode='nearest')
+
+
+def render(name, frames=n_frames, res=resolution, width_start=start_width, output_dir='.', n_processes=None):
+    """
+    renders the frames of a zoom video from width_start to the width of the preset into the center of the preset.
+    The width of the frames decreases exponentially, i.e. the zoom has a constant speed.
+    :param name: name of the preset in mandel_presets.presets
+    :param frames: number of frames
+    :param res: resolution of the frames
+    :param width_start: width of the first frame
+    :param output_dir: directory where the frames zoom_00000.png, zoom_00001.png, ... are saved to
+    :param n_processes: number of processes used for computing the strip. If None, one process per core is used.
+    """
+    t0 = time.time()
+    preset = mandel_presets.presets[name]
+    width_end = preset['d']
+    log_r, theta = get_strip_grid(res, width_start, width_end)
+
+    print "computing strip (" + str(theta.shape[0]) + " x " + str(log_r.shape[0]) + " points, " + \
+          str(theta.shape[0] * log_r.shape[0] / res ** 2) + " frames)."
+    strip = render_strip(name, log_r, theta, n_processes)
+    print "elapsed time:" + str(time.time() - t0) + " sec"
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+    widths = width_start * (width_end / width_start) ** (np.arange(frames) / max(1, frames - 1))
+    for k, width in enumerate(widths):
+        it_count = resample_frame(strip, log_r, theta, res, width)
+        rgba = mandel_colormap.iteration_count_to_bokeh_rgba(it_count, preset['frequency'], preset['max_iterations'])
+        rgb = rgba.view(np.uint8).reshape(it_count.shape + (4,))[:, :, :3]
+        mandel_static.write_png(os.path.join(output_dir, 'zoom_%05d.png' % k), rgb)
+    print str(frames) + " frames written to " + output_dir + "."
+    print "elapsed time:" + str(time.time() - t0) + " sec"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='renders the frames of a zoom video into the mandelbrot set.')
+    parser.add_argument('preset', nargs='?', default=mandel_static.preset_name,
+                        help='name of the preset the zoom ends at (available: ' +
+                             ', '.join(mandel_presets.presets.keys()) + ')')
+    parser.add_argument('--frames', type=int, default=n_frames, help='number of frames')
+    parser.add_argument('--resolution', type=int, default=resolution, help='resolution of the frames in pixels')
+    parser.add_argument('--start-width', type=float, default=start_width, help='width of the first frame')
+    parser.add_argument('--output-dir', default='.', help='directory the frames are saved to')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of processes used for rendering (default: one per core)')
+    args = parser.parse_args()
+
+    if args.preset not in mandel_presets.presets:
+        parser.error("unknown preset " + args.preset + "!")
+    render(args.preset, args.frames, args.resolution, args.start_width, args.output_dir, args.processes)
@@ -1,16 +1,22 @@
 from __future__ import division
 
 import logging
+import threading
+import time
+from functools import partial
+import mpmath
 import numpy as np
 
 from bokeh.models.widgets import Slider
-from bokeh.models import ColumnDataSource, PrintfTickFormatter
+from bokeh.models import ColumnDataSource, PrintfTickFormatter, HoverTool, CustomJS
 from bokeh.plotting import Figure
 from bokeh.io import curdoc
-from bokeh.layouts import column
+from bokeh.layouts import column, row
 
 import mandel
 import mandel_colormap
+import mandel_perturbation
+import mandel_tiles
 import mandelbrot_settings
 import sys
 import os.path
@@ -20,12 +26,69 @@ import my_bokeh_utils
 
 logging.basicConfig(level=logging.DEBUG)
 
+# make sure the mandelbrot kernel is compiled and ready, before the first image is requested
+mandel.check_interior = mandelbrot_settings.check_interior
+mandel.warm_up()
+
+# tiles of the mandelbrot set are shared between all sessions
+tile_cache = mandel_tiles.get_shared_cache(mandelbrot_settings.tile_cache_megabytes * 2 ** 20,
+                                           mandelbrot_settings.tile_cache_dir)
+# states of the tiles for resuming the computation, if the maximum number of iterations is raised
+state_cache = mandel_tiles.get_shared_cache(mandelbrot_settings.state_cache_megabytes * 2 ** 20, name='states')
+# tiles that are likely needed next are computed in the background, while no view is computed
+prefetcher = mandel_tiles.get_shared_prefetcher(tile_cache, mandelbrot_settings.tile_size)
+
 # data source saving raw data (number of iterations) of mandelbrot set
 source_mandel_raw = ColumnDataSource(
     data=dict(iterations=[],  # number of iterations for each point in the mandelbrot set
               max_iter=[mandelbrot_settings.iter_init]  # maximum iterations for computing the mandelbrot set
               ))
 
+# state of the progressive computation of the mandelbrot set. The passes are computed by a worker thread. Every change
+# of the user input starts a new generation of passes and cancels the worker of the old generation; results of older
+# generations are dropped.
+progressive_state = dict(generation=0,  # current generation
+                         cancel=None,  # threading.Event cancelling the worker of the current generation
+                         max_iter=None,  # maximum number of iterations requested by the current generation
+                         image_view=None,  # user view the raw data of the mandelbrot set belongs to
+                         histogram=None,  # mandel_colormap.EscapeHistogram of the raw data
+                         histogram_generation=None,  # generation of the passes added to the histogram
+                         histogram_pass=0,  # index of the last pass of this generation added to the histogram
+                         tile_histograms=None)  # histograms of the tiled passes, filled tile by tile, or None
+tile_histogram_lock = threading.Lock()  # guards tile_histograms, which are filled by the worker threads
+
+# state of the julia set panel. Every movement of the mouse pointer starts a new generation; results of older
+# generations are dropped. The julia sets are computed by a single worker thread, which always takes the latest request
+# (see compute_julia); requests, which are superseded before the worker takes them, are never computed.
+julia_state = dict(generation=0,  # current generation
+                   c=None,  # parameter of the julia set (c_re, c_im)
+                   moved=0.0,  # time of the last movement of the mouse pointer
+                   refined=True,  # True, if the julia set of the current parameter has been computed in full resolution
+                   pinned=False,  # True, if the parameter has been fixed by a click
+                   cancel=None,  # threading.Event cancelling the computation of the current generation
+                   request=None,  # (generation, c, resolution, cancel) of the julia set the worker computes next
+                   busy=False,  # True, if the worker thread is running
+                   preview_res=mandelbrot_settings.julia_preview_res,  # resolution of the preview
+                   fps=None)  # measured preview frames per second
+julia_lock = threading.Lock()  # guards request, busy, fps and preview_res, which are shared with the worker thread
+
+# document of this session. Worker threads cannot use curdoc() and have to pass their results to this document.
+document = curdoc()
+
+# throughput of the computation of the mandelbrot set measured in pixels times iterations per second. Used for adapting
+# the resolution of the first pass to the cost of the current view.
+throughput_state = dict(rate=None)  # running average of the throughput, None if nothing has been measured yet
+
+# state of the mandelbrot sequence for the current view, if tiles are not used. Allows to resume the computation, if
+# only the maximum number of iterations changes.
+resume_state = dict(view=None,  # view the state belongs to
+                    state=None)  # mandel.MandelState
+
+# reference point for deep zooms in arbitrary precision. If the reference point is set, the coordinates of the plot are
+# given relative to the reference point and the mandelbrot set is computed by perturbation theory.
+deep_zoom_state = dict(center_re=None,  # real part of reference point (mpmath.mpf)
+                       center_im=None)  # imaginary part of reference point (mpmath.mpf)
+
 # initialize controls
 # slider for maximum number of iterations for the computation of the mandelbrot set
 slider_max_iterations = Slider(title="iterations",
@@ -44,7 +107,7 @@ slider_frequency = Slider(title="coloring",
                           step=mandelbrot_settings.freq_step)
 
 # Generate a figure container
-toolset = "pan,reset,wheel_zoom,save"
+toolset = "pan,reset,wheel_zoom,save,tap"
 plot = Figure(plot_height=mandelbrot_settings.x_res,
               plot_width=mandelbrot_settings.y_res,
               x_range=[mandelbrot_settings.x0, mandelbrot_settings.x1],
@@ -81,6 +144,140 @@ plot.axis.formatter = PrintfTickFormatter(format=" ")  # create formatter
 plot.axis.major_tick_line_color = None  # turn off major ticks
 plot.axis.minor_tick_line_color = None  # turn off minor ticks
 
+# Julia set panel
+# data source holding the point under the mouse pointer in the mandelbrot plot (plot coordinates)
+source_julia_c = ColumnDataSource(data=dict(x=[], y=[]))
+# send the position of the mouse pointer to the server, whenever it moves over the mandelbrot plot
+plot.add_tools(HoverTool(tooltips=None,
+                         callback=CustomJS(args=dict(source=source_julia_c),
+                                           code="""
+                                                var geometry = cb_data['geometry'];
+                                                source.data = {x: [geometry.x], y: [geometry.y]};
+                                                """)))
+
+plot_julia = Figure(plot_height=mandelbrot_settings.julia_res,
+                    plot_width=mandelbrot_settings.julia_res,
+                    x_range=[mandelbrot_settings.julia_x0, mandelbrot_settings.julia_x0 + mandelbrot_settings.julia_xw],
+                    y_range=[mandelbrot_settings.julia_y0, mandelbrot_settings.julia_y0 + mandelbrot_settings.julia_yw],
+                    tools="",
+                    title="Julia Set"
+                    )
+
+# data source for image data of the julia set
+source_julia = ColumnDataSource(data=dict(image=[],  # image data
+                                          x0=[mandelbrot_settings.julia_x0],  # image origin x
+                                          y0=[mandelbrot_settings.julia_y0],  # image origin y
+                                          xw=[mandelbrot_settings.julia_xw],  # image width
+                                          yw=[mandelbrot_settings.julia_yw]  # image height
+                                          ))
+
+plot_julia.image_rgba(image='image', x='x0', y='y0', dw='xw', dh='yw', source=source_julia)
+
+plot_julia.axis.formatter = PrintfTickFormatter(format=" ")
+plot_julia.axis.major_tick_line_color = None
+plot_julia.axis.minor_tick_line_color = None
+
+
+def get_colormap_frequency(iterations, max_iterations, frequency):
+    """
+    computes the period of the colormap in iterations from the user input. The period is adapted to the mean number of
+    iterations of the points outside of the set.
+    :param iterations: array containing the number of iterations for each gridpoint
+    :param max_iterations: maximum number of iterations
+    :param frequency: frequency of the colormap (user input)
+    :return: period of the colormap
+    """
+    return int(np.mean(iterations[iterations != max_iterations]) / frequency * 10)  # todo magic number?
+
+
+def color_iterations(iterations, max_iterations, frequency, histogram=None):
+    """
+    colors the number of iterations according to mandelbrot_settings.coloring.
+    :param iterations: array containing the number of iterations for each gridpoint
+    :param max_iterations: maximum number of iterations
+    :param frequency: frequency of the colormap (user input)
+    :param histogram: mandel_colormap.EscapeHistogram of the iterations. If None, it is computed from the iterations.
+    :return: array of np.uint32 values that encode RGBA values
+    """
+    if mandelbrot_settings.coloring == 'histogram':
+        if histogram is None:
+            histogram = mandel_colormap.EscapeHistogram(max_iterations)
+            histogram.add(iterations)
+        return mandel_colormap.iteration_count_to_bokeh_rgba_equalized(iterations, histogram, frequency)
+    else:
+        return mandel_colormap.iteration_count_to_bokeh_rgba(
+            iterations, get_colormap_frequency(iterations, max_iterations, frequency), max_iterations)
+
+
+def previous_pass_points(old_shape, new_shape):
+    """
+    locates the points of the previous pass of a progressive computation in the current pass (see
+    mandel.pass_indices).
+    :param old_shape: shape of the previous pass
+    :param new_shape: shape of the current pass
+    :return: boolean array of shape new_shape, which is True at the points of the previous pass, or None if the
+    previous pass is not a subset of the current pass
+    """
+    positions = []
+    for res, n_old, n_new in zip([mandelbrot_settings.y_res, mandelbrot_settings.x_res], old_shape, new_shape):
+        old_idx = mandel.sample_indices(res, n_old)
+        new_idx = mandel.sample_indices(res, n_new)
+        if n_old >= n_new or old_idx.shape[0] != n_old or new_idx.shape[0] != n_new:
+            return None
+        pos = np.searchsorted(new_idx, old_idx)  # both grids end at the last point, therefore pos < n_new
+        if np.any(new_idx[pos] != old_idx):
+            return None
+        positions.append(pos)
+    mask = np.zeros(new_shape, dtype=bool)
+    mask[np.ix_(*positions)] = True
+    return mask
+
+
+def update_histogram(generation, mandel_iterations, max_iterations):
+    """
+    adds the result of a pass to the histogram of the iteration counts. Without tiles every pass of a progressive
+    computation refines the pass before, whose points are a subset of the points of the new pass (see
+    mandel.mandel_progressive). Only the new points are added, therefore the histogram of the current view is updated
+    incrementally. With tiles every pass is resampled from the tiles of a different zoom level, whose points do not
+    coincide with the points of the previous pass. Instead, the histogram of each tiled pass is updated incrementally
+    while the pass is computed: the counts of every tile are added as soon as the tile is available (see
+    add_tile_counts), therefore the histogram is already complete, when the pass is shown.
+    :param generation: generation of passes this pass belongs to
+    :param mandel_iterations: array containing the number of iterations for each gridpoint
+    :param max_iterations: maximum number of iterations of the computation
+    """
+    same_generation = progressive_state['histogram_generation'] == generation
+    i_pass = progressive_state['histogram_pass'] + 1 if same_generation else 0
+    histogram = progressive_state['histogram']
+    old_its = source_mandel_raw.data.get('its')
+    old_points = None
+    if progressive_state['tile_histograms'] is not None:
+        with tile_histogram_lock:
+            histogram = progressive_state['tile_histograms'][i_pass]
+    else:
+        if same_generation and old_its is not None:
+            old_points = previous_pass_points(old_its[0].shape, mandel_iterations.shape)
+        if old_points is not None:
+            histogram.add(mandel_iterations[~old_points])
+        else:  # first pass of a new view
+            histogram = mandel_colormap.EscapeHistogram(max_iterations)
+            histogram.add(mandel_iterations)
+    progressive_state['histogram'] = histogram
+    progressive_state['histogram_generation'] = generation
+    progressive_state['histogram_pass'] = i_pass
+
+
+def add_tile_counts(histograms, i_pass, counts):
+    """
+    adds the iteration counts of the points covered by a tile to the histogram of its pass. Called by the worker threads
+    of the tiled computation, as soon as a tile is available (see mandel_tiles.mandel_tiled).
+    :param histograms: list holding the mandel_colormap.EscapeHistogram of each pass
+    :param i_pass: index of the pass
+    :param counts: iteration counts of the points covered by the tile
+    """
+    with tile_histogram_lock:
+        histograms[i_pass].add(counts)
+
 
 def update_colormap(attrname, old, new_frequency):
     """
@@ -89,20 +286,17 @@ def update_colormap(attrname, old, new_frequency):
     :param old: unused, but needed for bokeh callback functions
     :param new_frequency: new value for the frequency
     """
+    if 'its' not in source_mandel_raw.data:  # no data computed yet
+        return
     mandel_iterations = source_mandel_raw.data['its'][0]
-
-    frequency = int(
-        np.mean(mandel_iterations[
-                    mandel_iterations != int(slider_max_iterations.value)]) / new_frequency * 10)  # todo magic number?
+    max_iterations = source_mandel_raw.data['max_iter'][0]
 
     print "calculating colors."
-    col = mandel_colormap.iteration_count_to_rgb_color(mandel_iterations, frequency, int(slider_max_iterations.value))
-    img = mandel_colormap.rgb_color_to_bokeh_rgba(color=col)
+    img = color_iterations(mandel_iterations, max_iterations, new_frequency, progressive_state['histogram'])
     print "done."
 
     print "updating image data."
-    view_data = my_bokeh_utils.get_user_view(plot)
-    source_view.data = view_data
+    view_data = progressive_state['image_view']
     source_image.data = dict(image=[img],
                              x0=view_data['x_start'],
                              y0=view_data['y_start'],
@@ -112,11 +306,293 @@ def update_colormap(attrname, old, new_frequency):
     print "data was updated."
 
 
+def single_pass(function, *args, **kwargs):
+    """
+    generator computing the whole mandelbrot set in a single pass. The computation is started with the first call of
+    next, like the computation of the progressive passes.
+    :param function: function computing the mandelbrot set
+    :param args: arguments passed to function
+    :param kwargs: keyword arguments passed to function
+    :return: generator yielding the result of function
+    """
+    yield function(*args, **kwargs)
+
+
+def get_mandelbrot_passes(x0, y0, xw, yw, cancel):
+    """
+    returns the passes for computing the mandelbrot set in the given region with the current user input. No computation
+    is done, before the first pass is requested.
+    :param x0: origin x of computation region
+    :param y0: origin y of computation region
+    :param xw: width of computation region
+    :param yw: height of computation region
+    :param cancel: threading.Event cancelling the computation
+    :return: iterator yielding the number of iterations for each gridpoint after each pass. If progressive
+    computation is turned off or an alternative engine is used, only a single pass with full resolution is done.
+    """
+    n_passes = get_n_passes() if mandelbrot_settings.progressive else 1
+    progressive_state['tile_histograms'] = None
+
+    if deep_zoom_state['center_re'] is not None:
+        # deep zoom: the region is given relative to the reference point
+        return single_pass(mandel_perturbation.mandel_perturbation,
+                           deep_zoom_state['center_re'], deep_zoom_state['center_im'],
+                           x0, y0, xw, yw,  # user view
+                           mandelbrot_settings.x_res, mandelbrot_settings.y_res,  # resolution
+                           slider_max_iterations.value,  # maximum number of iterations
+                           mandelbrot_settings.iteration_bound,
+                           n_threads=mandelbrot_settings.n_threads,
+                           cancel=cancel)
+    elif mandelbrot_settings.engine != 'brute_force':
+        # alternative engines compute the whole view in a single pass
+        return single_pass(mandel.mandel,
+                           x0, y0, xw, yw,  # user view
+                           mandelbrot_settings.x_res, mandelbrot_settings.y_res,  # resolution
+                           slider_max_iterations.value,  # maximum number of iterations
+                           mandelbrot_settings.iteration_bound,
+                           n_threads=mandelbrot_settings.n_threads,
+                           engine=mandelbrot_settings.engine,
+                           cancel=cancel)
+    elif mandelbrot_settings.use_tiles:
+        tile_state_cache = state_cache if mandelbrot_settings.resume_iterations else None
+        # the histogram of each pass is filled tile by tile (see update_histogram)
+        tile_histograms = [mandel_colormap.EscapeHistogram(int(slider_max_iterations.value)) for _ in range(n_passes)]
+        progressive_state['tile_histograms'] = tile_histograms
+        # only tiles that are not yet in the cache are computed
+        return mandel_tiles.mandel_tiled_progressive(x0, y0, xw, yw,  # user view
+                                                     mandelbrot_settings.x_res, mandelbrot_settings.y_res,  # resolution
+                                                     slider_max_iterations.value,  # maximum number of iterations
+                                                     mandelbrot_settings.iteration_bound,
+                                                     mandelbrot_settings.tile_size,
+                                                     tile_cache,
+                                                     n_passes=n_passes,
+                                                     n_threads=mandelbrot_settings.n_threads,
+                                                     state_cache=tile_state_cache,
+                                                     cancel=cancel,
+                                                     on_tile=partial(add_tile_counts, tile_histograms))
+    else:
+        state = get_resume_state(x0, y0, xw, yw) if mandelbrot_settings.resume_iterations else None
+        return mandel.mandel_progressive(x0, y0, xw, yw,  # user view
+                                         mandelbrot_settings.x_res, mandelbrot_settings.y_res,  # resolution
+                                         slider_max_iterations.value,  # maximum number of iterations
+                                         mandelbrot_settings.iteration_bound,
+                                         n_passes=n_passes,
+                                         n_threads=mandelbrot_settings.n_threads,
+                                         state=state,
+                                         cancel=cancel)
+
+
+def get_n_passes():
+    """
+    returns the number of passes of the progressive computation. If adaptive_resolution is turned on, the number of
+    passes is chosen such that the estimated time for the first pass fits into the latency budget.
+    :return: number of passes
+    """
+    rate = throughput_state['rate']
+    if not mandelbrot_settings.adaptive_resolution or rate is None:
+        return mandelbrot_settings.n_passes
+
+    work = mandelbrot_settings.x_res * mandelbrot_settings.y_res * max(1, slider_max_iterations.value)
+    n_passes = 1
+    # every additional pass halves the resolution of the first pass in each direction
+    while work / rate > mandelbrot_settings.latency_budget and n_passes < mandelbrot_settings.max_passes:
+        work /= 4
+        n_passes += 1
+    return n_passes
+
+
+def compute_pass(passes, max_iterations):
+    """
+    computes the next pass and updates the measured throughput.
+    :param passes: iterator yielding the number of iterations for each gridpoint after each pass
+    :param max_iterations: maximum number of iterations of the computation
+    :return: array containing the number of iterations for each gridpoint
+    """
+    t0 = time.time()
+    mandel_iterations = next(passes)
+    elapsed = time.time() - t0
+    if elapsed > .01:  # very fast passes (e.g. cached tiles) do not give a meaningful throughput
+        rate = mandel_iterations.size * max(1, max_iterations) / elapsed
+        old_rate = throughput_state['rate']
+        throughput_state['rate'] = rate if old_rate is None else .5 * (old_rate + rate)
+    return mandel_iterations
+
+
+def get_resume_state(x0, y0, xw, yw):
+    """
+    returns the state of the mandelbrot sequence for the given region. If the region has not changed since the last
+    call, the old state is returned and the computation continues from there. Otherwise a new state is created.
+    :param x0: origin x of computation region
+    :param y0: origin y of computation region
+    :param xw: width of computation region
+    :param yw: height of computation region
+    :return: mandel.MandelState
+    """
+    view = (x0, y0, xw, yw, mandelbrot_settings.x_res, mandelbrot_settings.y_res, mandelbrot_settings.iteration_bound)
+    if resume_state['view'] != view:
+        re, im = mandel.mandel_grid(x0, y0, xw, yw, mandelbrot_settings.x_res, mandelbrot_settings.y_res)
+        resume_state['state'] = mandel.MandelState(re, im, mandelbrot_settings.iteration_bound)
+        resume_state['view'] = view
+    return resume_state['state']
+
+
+def update_deep_zoom_reference(x0, y0, xw, yw):
+    """
+    sets, moves or removes the reference point for deep zooms depending on the current view. If the reference point
+    changes, the ranges of the plot are shifted such that the user view stays the same.
+    :param x0: origin x of the user view in plot coordinates
+    :param y0: origin y of the user view in plot coordinates
+    :param xw: width of the user view
+    :param yw: height of the user view
+    :return: origin x and y of the user view in the (possibly) new plot coordinates
+    """
+    if not mandelbrot_settings.deep_zoom:
+        return x0, y0
+
+    center_re = deep_zoom_state['center_re']
+    center_im = deep_zoom_state['center_im']
+    # center of the view in plot coordinates
+    cx = x0 + .5 * xw
+    cy = y0 + .5 * yw
+
+    if center_re is None:
+        if xw >= mandelbrot_settings.deep_zoom_width:
+            return x0, y0
+        # start deep zoom at the center of the view
+        shift_x, shift_y = cx, cy
+        deep_zoom_state['center_re'] = mpmath.mpf(cx)
+        deep_zoom_state['center_im'] = mpmath.mpf(cy)
+    elif xw >= mandelbrot_settings.deep_zoom_width:
+        # stop deep zoom and return to absolute coordinates. After a reset of the view the plot already has absolute
+        # coordinates.
+        view_is_reset = (x0, y0, xw, yw) == (mandelbrot_settings.x0, mandelbrot_settings.y0,
+                                             mandelbrot_settings.xw, mandelbrot_settings.yw)
+        shift_x, shift_y = (0, 0) if view_is_reset else (-float(center_re), -float(center_im))
+        deep_zoom_state['center_re'] = None
+        deep_zoom_state['center_im'] = None
+    elif abs(cx) > xw or abs(cy) > yw:
+        # the view has been panned away from the reference point: move reference point to the center of the view
+        shift_x, shift_y = cx, cy
+        pixel_width = min(xw / mandelbrot_settings.x_res, yw / mandelbrot_settings.y_res)
+        with mpmath.workprec(mandel_perturbation.precision_bits(pixel_width)):
+            deep_zoom_state['center_re'] = center_re + mpmath.mpf(cx)
+            deep_zoom_state['center_im'] = center_im + mpmath.mpf(cy)
+    else:
+        return x0, y0
+
+    print "moving reference point for deep zoom."
+    plot.x_range.start = x0 - shift_x
+    plot.x_range.end = x0 + xw - shift_x
+    plot.y_range.start = y0 - shift_y
+    plot.y_range.end = y0 + yw - shift_y
+    return x0 - shift_x, y0 - shift_y
+
+
+def compute_passes(generation, passes, max_iterations, cancel, prefetch_keys=None):
+    """
+    computes all passes of one generation in a worker thread. After each pass the result is handed over to the
+    document in its next tick (see show_pass), since the document must not be changed by other threads. If the
+    generation is cancelled, the computation stops after the current chunk of rows or tiles. Prefetching of tiles is
+    paused during the computation.
+    :param generation: generation of passes
+    :param passes: iterator yielding the number of iterations for each gridpoint after each pass
+    :param max_iterations: maximum number of iterations of the computation
+    :param cancel: threading.Event cancelling the computation
+    :param prefetch_keys: keys of the tiles that are prefetched after all passes are finished or None
+    """
+    prefetcher.pause()
+    try:
+        while not cancel.is_set():
+            if session_destroyed():
+                cleanup_session()
+                return
+            try:
+                mandel_iterations = compute_pass(passes, max_iterations)
+            except StopIteration:  # all passes are finished
+                if prefetch_keys is not None:
+                    prefetcher.prefetch(prefetch_keys, owner=document)
+                return
+            document.add_next_tick_callback(partial(show_pass, generation, mandel_iterations, max_iterations))
+    except mandel.ComputationCancelled:
+        print "computation of generation " + str(generation) + " was cancelled."
+    finally:
+        prefetcher.resume()
+
+
+def session_destroyed():
+    """
+    :return: True, if the session of this document has been destroyed
+    """
+    session_context = document.session_context
+    return session_context is not None and session_context.destroyed
+
+
+def cleanup_session(session_context=None):
+    """
+    stops all background work of this session: the computations of the mandelbrot set and of the julia set are
+    cancelled, pending julia sets are dropped and the tiles this session asked the shared prefetcher for are withdrawn.
+    Called, when the session is destroyed. If bokeh does not support a callback for destroyed sessions, the worker
+    threads call it, as soon as they notice that the session is destroyed.
+    :param session_context: unused, but passed by bokeh
+    """
+    if progressive_state['cancel'] is not None:
+        progressive_state['cancel'].set()
+    if julia_state['cancel'] is not None:
+        julia_state['cancel'].set()
+    with julia_lock:
+        julia_state['request'] = None
+    prefetcher.withdraw(document)
+
+
+def get_prefetch_keys(x0, y0, xw, yw):
+    """
+    returns the keys of the tiles, which are likely needed after the given view (see mandel_tiles.prefetch_keys). The
+    zoom is predicted at the last position of the mouse pointer.
+    :param x0: origin x of the view
+    :param y0: origin y of the view
+    :param xw: width of the view
+    :param yw: height of the view
+    :return: list of tile keys or None, if the view is not computed from tiles
+    """
+    if not (mandelbrot_settings.prefetch and mandelbrot_settings.use_tiles and
+            mandelbrot_settings.engine == 'brute_force' and deep_zoom_state['center_re'] is None):
+        return None
+    cursor_x = source_julia_c.data['x'][0] if len(source_julia_c.data['x']) > 0 else None
+    cursor_y = source_julia_c.data['y'][0] if len(source_julia_c.data['y']) > 0 else None
+    return mandel_tiles.prefetch_keys(x0, y0, xw, yw,
+                                      mandelbrot_settings.x_res, mandelbrot_settings.y_res,
+                                      int(slider_max_iterations.value),
+                                      mandelbrot_settings.iteration_bound,
+                                      mandelbrot_settings.tile_size,
+                                      cursor_x, cursor_y,
+                                      mandelbrot_settings.prefetch_margin)
+
+
+def show_pass(generation, mandel_iterations, max_iterations):
+    """
+    updates raw data and image with the result of a pass. Results of outdated generations are dropped, therefore only
+    the current user view reaches the image.
+    :param generation: generation of passes this pass belongs to
+    :param mandel_iterations: array containing the number of iterations for each gridpoint
+    :param max_iterations: maximum number of iterations of the computation
+    """
+    if generation != progressive_state['generation']:  # outdated pass
+        return
+
+    print "updating raw data."
+    update_histogram(generation, mandel_iterations, max_iterations)
+    source_mandel_raw.data = dict(its=[mandel_iterations], max_iter=[max_iterations])
+    progressive_state['image_view'] = source_view.data
+    print "data was updated."
+    update_colormap(None, None, slider_frequency.value)
+
+
 def update_mandelbrot_set():
     """
-    updates the raw data of the mandelbrot set corresponding to the current user input. Therefore the currently observed
-    part of the mandelbrot set is computed using the given maximum iteration number. The output data is written to the
-    corresponding bokeh.models.ColumnDataSource
+    starts the computation of the mandelbrot set corresponding to the current user input. Therefore the currently
+    observed part of the mandelbrot set is computed using the given maximum iteration number. The computation runs in a
+    worker thread (see compute_passes), the output data is written to the corresponding bokeh.models.ColumnDataSource
+    after each pass (see show_pass). A computation of an older user input, which is still running, is cancelled.
     """
     view_data = my_bokeh_utils.get_user_view(plot)
 
@@ -124,17 +600,180 @@ def update_mandelbrot_set():
     xw = view_data['x_end'][0] - x0
     y0 = view_data['y_start'][0]
     yw = view_data['y_end'][0] - y0
+    x0, y0 = update_deep_zoom_reference(x0, y0, xw, yw)
+    source_view.data = my_bokeh_utils.get_user_view(plot)
+
+    if progressive_state['cancel'] is not None:
+        progressive_state['cancel'].set()  # the old view is not needed anymore
+    cancel = threading.Event()
+    max_iterations = int(slider_max_iterations.value)
+    progressive_state['generation'] += 1
+    progressive_state['cancel'] = cancel
+    progressive_state['max_iter'] = max_iterations
 
     print "calculating mandelbrot set."
-    mandel_iterations = mandel.mandel(x0, y0, xw, yw,  # user view
-                                      mandelbrot_settings.x_res, mandelbrot_settings.y_res,  # resolution
-                                      slider_max_iterations.value,  # maximum number of iterations
-                                      mandelbrot_settings.iteration_bound)
-    print "done."
+    passes = get_mandelbrot_passes(x0, y0, xw, yw, cancel)
+    worker = threading.Thread(target=compute_passes,
+                              args=(progressive_state['generation'], passes, max_iterations, cancel,
+                                    get_prefetch_keys(x0, y0, xw, yw)))
+    worker.daemon = True
+    worker.start()
+
+
+def compute_julia():
+    """
+    computes the requested julia sets in a worker thread and hands them over to the document, until no request is left.
+    The computation time of the previews is measured: the resolution of the next preview is chosen such that
+    julia_preview_fps previews per second can be computed.
+    """
+    while True:
+        if session_destroyed():
+            cleanup_session()
+        with julia_lock:
+            request = julia_state['request']
+            julia_state['request'] = None
+            if request is None:
+                julia_state['busy'] = False
+                return
+        generation, (c_re, c_im), res, cancel = request
+        t0 = time.time()
+        try:
+            julia_iterations = mandel.julia(mandelbrot_settings.julia_x0, mandelbrot_settings.julia_y0,
+                                            mandelbrot_settings.julia_xw, mandelbrot_settings.julia_yw,
+                                            res, res, c_re, c_im,
+                                            mandelbrot_settings.julia_iterations,
+                                            mandelbrot_settings.iteration_bound,
+                                            n_threads=mandelbrot_settings.n_threads,
+                                            cancel=cancel)
+        except mandel.ComputationCancelled:
+            continue
+        if res != mandelbrot_settings.julia_res:  # preview
+            update_julia_preview_res(res, time.time() - t0)
+        document.add_next_tick_callback(partial(show_julia, generation, julia_iterations))
+
+
+def update_julia_preview_res(res, elapsed):
+    """
+    measures the frame rate of the previews and adapts their resolution to mandelbrot_settings.julia_preview_fps. The
+    resolution never exceeds julia_preview_res and never falls below julia_preview_min_res.
+    :param res: resolution of the last preview
+    :param elapsed: computation time of the last preview in seconds
+    """
+    fps = 1 / max(elapsed, 1e-6)
+    # the cost is proportional to the number of pixels
+    target_res = int(res * np.sqrt(fps / mandelbrot_settings.julia_preview_fps))
+    preview_res = max(mandelbrot_settings.julia_preview_min_res, min(mandelbrot_settings.julia_preview_res, target_res))
+    with julia_lock:
+        old_fps = julia_state['fps']
+        julia_state['fps'] = fps if old_fps is None else .5 * (old_fps + fps)
+        julia_state['preview_res'] = preview_res
+
+
+def request_julia(res):
+    """
+    starts a new generation of the julia set panel and requests the julia set of the current parameter. The
+    computation of the previous generation is cancelled. If the worker thread is not running, it is started.
+    :param res: resolution in each direction
+    """
+    if julia_state['cancel'] is not None:
+        julia_state['cancel'].set()
+    julia_state['generation'] += 1
+    julia_state['cancel'] = threading.Event()
+    with julia_lock:
+        julia_state['request'] = (julia_state['generation'], julia_state['c'], res, julia_state['cancel'])
+        if julia_state['busy']:  # the worker takes the request after its current computation
+            return
+        julia_state['busy'] = True
+    worker = threading.Thread(target=compute_julia)
+    worker.daemon = True
+    worker.start()
+
+
+def show_julia(generation, julia_iterations):
+    """
+    colors the julia set with the colormap of the mandelbrot set and updates the image of the julia set panel. Results
+    of outdated generations are dropped.
+    :param generation: generation of the julia set
+    :param julia_iterations: array containing the number of iterations for each gridpoint
+    """
+    if generation != julia_state['generation']:  # outdated julia set
+        return
+    max_iterations = mandelbrot_settings.julia_iterations
+    img = color_iterations(julia_iterations, max_iterations, slider_frequency.value)
+    source_julia.data = dict(image=[img],
+                             x0=[mandelbrot_settings.julia_x0],
+                             y0=[mandelbrot_settings.julia_y0],
+                             xw=[mandelbrot_settings.julia_xw],
+                             yw=[mandelbrot_settings.julia_yw])
+    title = "Julia Set c = %.6f%+.6fi" % julia_state['c']
+    if julia_state['pinned']:
+        title += " (pinned)"
+    else:
+        with julia_lock:
+            fps = julia_state['fps']
+        if fps is not None:
+            title += " (preview: %d fps)" % fps
+    plot_julia.title.text = title
 
-    print "updating raw data."
-    source_mandel_raw.data = dict(its=[mandel_iterations], max_iter=[int(slider_max_iterations.value)])
-    print "data was updated."
+
+def get_julia_parameter(x, y):
+    """
+    converts a point of the mandelbrot plot to the parameter of the julia set.
+    :param x: x coordinate in the plot
+    :param y: y coordinate in the plot
+    :return: parameter (c_re, c_im)
+    """
+    if deep_zoom_state['center_re'] is not None:  # plot coordinates are relative to the reference point
+        return x + float(deep_zoom_state['center_re']), y + float(deep_zoom_state['center_im'])
+    return x, y
+
+
+def update_julia_preview(attrname, old, new):
+    """
+    requests a preview of the julia set of the point under the mouse pointer. The preview has a low resolution (see
+    update_julia_preview_res), such that the panel follows the mouse pointer. The julia set in full resolution is
+    computed by refine_julia, when the mouse pointer rests. If the parameter is pinned, the mouse pointer is ignored.
+    :param attrname: unused, but needed for bokeh callback functions
+    :param old: unused, but needed for bokeh callback functions
+    :param new: unused, but needed for bokeh callback functions
+    """
+    if len(source_julia_c.data['x']) == 0 or julia_state['pinned']:
+        return
+    julia_state['c'] = get_julia_parameter(source_julia_c.data['x'][0], source_julia_c.data['y'][0])
+    julia_state['moved'] = time.time()
+    julia_state['refined'] = False
+    with julia_lock:
+        preview_res = julia_state['preview_res']
+    request_julia(preview_res)
+
+
+def pin_julia(attrname, old, new):
+    """
+    called, if the mandelbrot plot is clicked. A click pins the julia set of the clicked point, which is computed in
+    full resolution at once; the next click releases it and the panel follows the mouse pointer again.
+    :param attrname: unused, but needed for bokeh callback functions
+    :param old: unused, but needed for bokeh callback functions
+    :param new: list of selection geometries, the last one holds the clicked point
+    """
+    if len(new) == 0 or new[-1].get('type') != 'point':
+        return
+    if julia_state['pinned']:
+        julia_state['pinned'] = False
+        return
+    julia_state['pinned'] = True
+    julia_state['c'] = get_julia_parameter(new[-1]['x'], new[-1]['y'])
+    julia_state['refined'] = True
+    request_julia(mandelbrot_settings.julia_res)
+
+
+def refine_julia():
+    """
+    requests the julia set in full resolution, if the mouse pointer rests for julia_refine_time seconds.
+    """
+    if julia_state['refined'] or time.time() - julia_state['moved'] < mandelbrot_settings.julia_refine_time:
+        return
+    julia_state['refined'] = True
+    request_julia(mandelbrot_settings.julia_res)
 
 
 def check_parameters(max_iterations):
@@ -146,7 +785,7 @@ def check_parameters(max_iterations):
 
     user_view_has_changed = my_bokeh_utils.check_user_view(source_view.data, plot)
     parameters_have_changed = user_view_has_changed or \
-                              (source_mandel_raw.data['max_iter'][0] != max_iterations)
+                              (progressive_state['max_iter'] != max_iterations)
     return parameters_have_changed
 
 
@@ -170,12 +809,14 @@ def update_data():
             raw mandelbrot set data and save the changed colors to the corresponding data source
     """
 
+    if mandelbrot_settings.show_julia:
+        refine_julia()
+
     parameters_have_changed = check_parameters(slider_max_iterations.value)
     frequency_has_changed = check_frequency(slider_frequency.value)
 
     if parameters_have_changed:
-        update_mandelbrot_set()
-        update_colormap(None, None, slider_frequency.value)
+        update_mandelbrot_set()  # the image is updated, as soon as the first pass is finished
         return
     elif frequency_has_changed:
         update_colormap(None, None, slider_frequency.value)
@@ -186,12 +827,21 @@ def update_data():
 
 # initialize data
 update_mandelbrot_set()
-update_colormap(None, None, slider_frequency.value)
 
 # setup callback for colormap frequency change
 slider_frequency.on_change('value', update_colormap)
+# setup callback for the julia set of the point under the mouse pointer
+source_julia_c.on_change('data', update_julia_preview)
+# setup callback for pinning the julia set of a clicked point
+plot.tool_events.on_change('geometries', pin_julia)
 
 # update picture all 100 ms w.r.t current view
 curdoc().add_periodic_callback(update_data, mandelbrot_settings.update_time)
+# abandoned sessions must not keep the worker threads busy
+if hasattr(document, 'on_session_destroyed'):  # not available in older versions of bokeh, see cleanup_session
+    document.on_session_destroyed(cleanup_session)
 # make layout
-curdoc().add_root(column(plot, slider_max_iterations, slider_frequency))
+if mandelbrot_settings.show_julia:
+    curdoc().add_root(row(column(plot, slider_max_iterations, slider_frequency), plot_julia))
+else:
+    curdoc().add_root(column(plot, slider_max_iterations, slider_frequency))
@@ -12,6 +12,85 @@ freq_min = 1
 freq_max = 10
 freq_step = 1
 
+# coloring of the mandelbrot set. 'histogram' uses histogram equalization: the colors are distributed according to the
+# cumulative histogram of the iteration counts of the current view and the frequency slider sets the number of
+# repetitions of the colormap. The coloring therefore looks similar at every zoom level. 'frequency' repeats the
+# colormap with a period proportional to the mean iteration count of the view divided by the frequency slider.
+coloring = 'histogram'
+
+# number of threads used for computing the mandelbrot set. None uses one thread per available core.
+n_threads = None
+
+# settings for the tiled computation of the mandelbrot set. The complex plane is split into tiles of tile_size x
+# tile_size pixels, which are held in a cache shared by all sessions. The cache holds at most tile_cache_megabytes of
+# tiles in memory. If tile_cache_dir is not None, tiles are additionally stored on disk in that directory.
+use_tiles = True
+tile_size = 64
+tile_cache_megabytes = 256
+tile_cache_dir = None
+
+# settings for prefetching tiles. If prefetch is True, the tiles of the next zoom level under the mouse pointer and
+# prefetch_margin rings of tiles around the current view are computed in the background, while no view is computed.
+# Therefore the next zoom or pan is usually a cache hit. Requires use_tiles = True.
+prefetch = True
+prefetch_margin = 1
+
+# algorithm used for computing the mandelbrot set. 'brute_force' computes every point and supports tiles, progressive
+# computation and resuming (see below). 'mariani_silver' only computes the borders of rectangles and fills rectangles
+# with a homogeneous border; it computes the whole view at once and ignores the tile, progressive and resume settings.
+engine = 'brute_force'
+
+# trigger for detecting points inside of the mandelbrot set early (main cardioid, period-2 bulb and periodic orbits).
+# This does not change the result, but speeds up the computation a lot. Turn off for verification.
+check_interior = True
+
+# if resume_iterations is True, the state of the computation of the mandelbrot set is kept. If the maximum number of
+# iterations is raised, only the points that have not escaped yet are iterated further. The states of the tiles are
+# kept in a cache shared by all sessions, which holds at most state_cache_megabytes of states.
+resume_iterations = True
+state_cache_megabytes = 256
+
+# settings for progressive computation of the mandelbrot set. If progressive is True, the mandelbrot set is computed
+# in n_passes passes from coarse to fine. Each pass about doubles the resolution, the last pass has the full resolution.
+# The image is updated after each pass.
+progressive = True
+n_passes = 4
+
+# settings for adapting the resolution to the cost of the current view. If adaptive_resolution is True, the throughput
+# of the computation (pixels times iterations per second) is measured and the number of passes is chosen such that the
+# first pass can be computed within latency_budget seconds, but at most max_passes passes are used. The following passes
+# refine up to the full resolution, as soon as the user stops interacting. Requires progressive = True.
+adaptive_resolution = True
+latency_budget = 0.15
+max_passes = 6
+
+# settings for zooming deeper than double precision allows. If deep_zoom is True and the width of the view falls below
+# deep_zoom_width, the mandelbrot set is computed by perturbation theory (see mandel_perturbation.py) relative to a
+# reference point stored in arbitrary precision. The coordinates of the plot are then given relative to the reference
+# point; the reference point is moved, if the view is panned away from it.
+deep_zoom = True
+deep_zoom_width = 1e-10
+
+# settings for the julia set panel. Hovering over the mandelbrot set shows the julia set of the point under the mouse
+# pointer. While the pointer moves, a preview with at most julia_preview_res x julia_preview_res pixels is computed. The
+# frame rate of the previews is measured and their resolution is lowered (down to julia_preview_min_res), such that at
+# least julia_preview_fps previews per second are computed. As soon as the pointer rests for julia_refine_time seconds,
+# the julia set is computed with julia_res x julia_res pixels. A click pins the julia set of the clicked point, the next
+# click releases it.
+show_julia = True
+julia_res = 300
+julia_preview_res = 100
+julia_preview_min_res = 25
+julia_preview_fps = 15
+julia_refine_time = .2
+julia_iterations = 200
+
+# region of the complex plane shown in the julia set panel
+julia_x0 = -2.0
+julia_y0 = -2.0
+julia_xw = 4.0
+julia_yw = 4.0
+
 # resolution in pixels
 x_res = 400
 y_res = 400
@@ -0,0 +1,195 @@
+"""
+2D heat and wave equation, solved by ADI schemes. The timesteps are computed on the server while the simulation is
+running and every new frame is streamed to an image plot.
+"""
+
+from __future__ import division
+
+import logging
+
+logging.basicConfig(level=logging.DEBUG)
+
+import numpy as np
+
+from bokeh.models import ColumnDataSource, Slider, RadioButtonGroup, TextInput, Toggle
+from bokeh.models.mappers import LinearColorMapper
+from bokeh.layouts import widgetbox, row
+from bokeh.plotting import Figure
+from bokeh.io import curdoc
+
+import pde_settings
+import pde_functions
+import pde_solvers
+
+
+def reset_simulation():
+    """
+    parses the initial condition, discretizes the domain w.r.t the current meshwidths and resets the simulation to
+    t = 0. The dirichlet boundary values are taken from the initial condition.
+    """
+    h = h_slider.value
+    k = k_slider.value
+    n = int(round((pde_settings.x_max - pde_settings.x_min) / h)) + 1
+    x = np.linspace(pde_settings.x_min, pde_settings.x_max, n)
+    x_grid, y_grid = np.meshgrid(x, x)
+    u_init = pde_functions.parse_2d(initial_condition.value)(x_grid, y_grid).astype(float)
+
+    stepper_class = pde_settings.solvers_2d[pde_type.active]
+    simulation_state.update(stepper=pde_solvers.get_stepper(stepper_class, n, k, x[1] - x[0]),
+                            u0=u_init,  # u(t=-k) = u(t=0) enforces u_t(t=0) = 0 for the wave equation
+                            u1=u_init,
+                            t=0.0)
+
+    # the colormap covers the values of the initial condition
+    low = float(u_init.min())
+    high = float(u_init.max())
+    if high <= low:
+        high = low + 1
+    if pde_type.active == 1:  # the wave equation oscillates around zero
+        high = max(abs(low), abs(high))
+        low = -high
+    color_mapper.low = low
+    color_mapper.high = high
+    update_plot()
+
+
+def update_plot():
+    """
+    sends the current frame to the browser by updating the corresponding bokeh.models.ColumnDataSource.
+    """
+    source.data = dict(z=[simulation_state['u1'].astype(np.float32)])
+    plot.title.text = "%s equation, t = %.3f" % (pde_type.labels[pde_type.active], simulation_state['t'])
+
+
+def advance_simulation():
+    """
+    periodically called function that computes pde_settings.steps_per_frame timesteps and sends the new frame. It is
+    only registered while the simulation is running (see run_change). The simulation stops at pde_settings.t_max_2d.
+    """
+    if session_destroyed():
+        cleanup_session()
+        return
+    stepper = simulation_state['stepper']
+    n_steps = min(pde_settings.steps_per_frame,
+                  int(round((pde_settings.t_max_2d - simulation_state['t']) / stepper.k)))
+    if n_steps <= 0:
+        run_toggle.active = False
+        return
+    u = stepper.advance(simulation_state['u0'], simulation_state['u1'], n_steps)
+    if n_steps > 1:
+        simulation_state['u0'] = u[-2]
+    else:
+        simulation_state['u0'] = simulation_state['u1']
+    simulation_state['u1'] = u[-1]
+    simulation_state['t'] += n_steps * stepper.k
+    update_plot()
+
+
+def input_change(attrname, old, new):
+    """
+    called if initial condition, pde type or meshwidths change
+    :param attrname: not used
+    :param old: not used
+    :param new: not used
+    """
+    reset_simulation()
+
+
+def run_change(attrname, old, new):
+    """
+    called if the simulation is started or stopped. Starting a simulation, which has reached the end, restarts it.
+    :param attrname: not used
+    :param old: not used
+    :param new: True, if the simulation is started
+    """
+    if new and simulation_state['t'] + .5 * simulation_state['stepper'].k >= pde_settings.t_max_2d:
+        reset_simulation()
+    if new and not simulation_state['running']:
+        document.add_periodic_callback(advance_simulation, pde_settings.frame_time)
+        simulation_state['running'] = True
+    elif not new and simulation_state['running']:
+        document.remove_periodic_callback(advance_simulation)
+        simulation_state['running'] = False
+
+
+def session_destroyed():
+    """
+    :return: True, if the session of this document has been destroyed
+    """
+    session_context = document.session_context
+    return session_context is not None and session_context.destroyed
+
+
+def cleanup_session(session_context=None):
+    """
+    stops the simulation, such that an abandoned session does not compute timesteps. Called, when the session is
+    destroyed. If bokeh does not support a callback for destroyed sessions, advance_simulation calls it, as soon as it
+    notices that the session is destroyed.
+    :param session_context: unused, but passed by bokeh
+    """
+    run_toggle.active = False
+
+
+# state of the simulation. Only the last two timesteps are kept, which are needed by the schemes.
+simulation_state = dict(stepper=None,  # time stepping scheme
+                        u0=None,  # solution at t - k
+                        u1=None,  # solution at t
+                        t=0.0,  # current time
+                        running=False)  # True, while advance_simulation is registered as periodic callback
+
+document = curdoc()
+
+# initialize data source
+source = ColumnDataSource(data=dict(z=[]))
+
+# initialize controls
+# text input for initial condition
+initial_condition = TextInput(value=pde_settings.IC2d_init, title="initial condition u(x,y,t=0)")
+initial_condition.on_change('value', input_change)
+# slider controlling spatial stepsize of the solver
+h_slider = Slider(title="spatial meshwidth", name='spatial meshwidth', value=pde_settings.h_init_2d,
+                  start=pde_settings.h_min_2d, end=pde_settings.h_max_2d, step=pde_settings.h_step_2d)
+h_slider.on_change('value', input_change)
+# slider controlling temporal stepsize of the solver
+k_slider = Slider(title="temporal meshwidth", name='temporal meshwidth', value=pde_settings.k_init_2d,
+                  start=pde_settings.k_min_2d, end=pde_settings.k_max_2d, step=pde_settings.k_step_2d)
+k_slider.on_change('value', input_change)
+# radiobuttons controlling pde type
+pde_type = RadioButtonGroup(labels=['Heat', 'Wave'], active=0)
+pde_type.on_change('active', input_change)
+# toggle for starting and stopping the simulation
+run_toggle = Toggle(label="Run", active=False)
+run_toggle.on_change('active', run_change)
+
+# initialize plot
+toolset = "crosshair,pan,reset,resize,wheel_zoom,box_zoom"
+# Generate a figure container
+plot = Figure(plot_height=400,
+              plot_width=400,
+              tools=toolset,
+              title="2D heat and wave equation",
+              x_range=[pde_settings.x_min, pde_settings.x_max],
+              y_range=[pde_settings.x_min, pde_settings.x_max]
+              )
+
+# Plot the solution as image
+color_mapper = LinearColorMapper(palette=pde_settings.svg_palette_jet, low=-1, high=1)
+plot.image(image='z',
+           x=pde_settings.x_min,
+           y=pde_settings.x_min,
+           dw=pde_settings.x_max - pde_settings.x_min,
+           dh=pde_settings.x_max - pde_settings.x_min,
+           color_mapper=color_mapper,
+           source=source)
+
+# calculate data
+reset_simulation()
+
+# lists all the controls in our app
+controls = widgetbox(initial_condition, h_slider, k_slider, pde_type, run_toggle, width=400)
+
+# abandoned sessions must not keep computing timesteps
+if hasattr(document, 'on_session_destroyed'):  # not available in older versions of bokeh, see cleanup_session
+    document.on_session_destroyed(cleanup_session)
+# make layout
+document.add_root(row(plot, controls, width=800))
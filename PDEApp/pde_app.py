@@ -7,6 +7,7 @@ Created on Sat Jul 11 22:04:14 2015
 from __future__ import division
 
 import logging
+import os
 
 logging.basicConfig(level=logging.DEBUG)
 
@@ -18,7 +19,35 @@ from bokeh.plotting import Figure
 from bokeh.io import curdoc
 
 import pde_settings
+import pde_convergence
 import pde_functions
+import pde_solutions
+import pde_solvers
+
+
+def compute_timesteps(idx):
+    """
+    makes sure that the numerical solution is computed up to the given timestep. Additionally the following
+    pde_settings.prefetch_steps timesteps are computed, such that moving the time slider forward does not need a
+    computation for every tick.
+    :param idx: index of the timestep
+    """
+    n_computed = mesh_state['n_computed']
+    if idx < n_computed:
+        return
+    u = mesh_state['u']
+    n_steps = min(idx + 1 + pde_settings.prefetch_steps, u.shape[0]) - n_computed
+    u1 = u[n_computed - 1]
+    if n_computed > 1:
+        u0 = u[n_computed - 2]
+    else:
+        u0 = u1  # this enforces neumann BC: u'(t=0)=0
+    if mesh_state['integrator'] is not None:  # adaptive time stepping, the timesteps are interpolated
+        t = mesh_state['stepper'].k * np.arange(n_computed, n_computed + n_steps)
+        u[n_computed:n_computed + n_steps] = mesh_state['integrator'].dense_output(t)
+    else:
+        u[n_computed:n_computed + n_steps] = mesh_state['stepper'].advance(u0, u1, n_steps)  # propagate in time
+    mesh_state['n_computed'] = n_computed + n_steps
 
 
 def get_numerical_solution_data(k, t):
@@ -28,36 +57,41 @@ def get_numerical_solution_data(k, t):
     :param t: time
     :return: x values and corresponding solution values u
     """
-    idx = int(round(t / k, 0))
-    u_key = 'u' + str(idx)
-    x = mesh_data.data['x']
-    u = mesh_data.data[u_key]
+    x = mesh_state['x']
+    if mesh_state['spectrum'] is not None:  # the spectral solver evaluates arbitrary times directly
+        u = mesh_state['stepper'].evaluate(mesh_state['spectrum'], t)
+    else:
+        idx = min(int(round(t / k, 0)), mesh_state['u'].shape[0] - 1)
+        compute_timesteps(idx)
+        u = mesh_state['u'][idx]
     return x, u
 
 
 def updata_analytical_solution():
     """
-    updates the analytical solution
+    updates the analytical solution. The solution is evaluated for all times of the time slider at once.
     """
     x = np.linspace(pde_settings.x_min, pde_settings.x_max, 200)
     u_ana_id = get_solver_id()
     f0 = pde_functions.parse(initial_condition.value)
     u_x = pde_settings.analytical_solutions[u_ana_id](f0, x)
-    ana_sol.data = dict({'u_x':u_x})
+    n_frames = int(round((pde_settings.t_max - pde_settings.t_min) / pde_settings.t_step, 0)) + 1
+    t = pde_settings.t_min + pde_settings.t_step * np.arange(n_frames)
+    if pde_type.active == 0:  # heat equation
+        t += .001
+    ana_state.update(x=x, u=pde_solutions.get_frames(u_x, t))
 
 
 def get_analytical_solution_data(t):
     """
-    computes the analytical solution for a given time.
+    looks up the analytical solution for a given time.
     :param t: time
     :return: x values and corresponding solution values u
     """
-    x = np.linspace(pde_settings.x_min, pde_settings.x_max, 200)
-    u_x = ana_sol.data['u_x']
-    u_ana_id = get_solver_id()
-    if u_ana_id == 0 or u_ana_id == 1:
-        t += .001
-    u = u_x(t)
+    idx = int(round((t - pde_settings.t_min) / pde_settings.t_step, 0))
+    idx = min(max(idx, 0), ana_state['u'].shape[0] - 1)
+    x = ana_state['x']
+    u = ana_state['u'][idx]
     return x, u
 
 
@@ -74,11 +108,39 @@ def update_plot(k, t):
     plot_data_ana.data = dict(x=x_ana, u=u_ana)
 
 
+def update_convergence_plot(h, k):
+    """
+    plots the errors of the active solver and initial condition from the results of the convergence study (see
+    pde_convergence.py): the maximum error against h for the studied k closest to the given temporal meshwidth and the
+    maximum error against k for the studied h closest to the given spatial meshwidth.
+    :param h: spatial meshwidth
+    :param k: temporal meshwidth
+    """
+    r = convergence_results
+    if r is None:
+        return
+    case = (r['solver_id'] == get_solver_id()) & (r['ic'] == initial_condition.value)
+    if not np.any(case):
+        convergence_data_h.data = dict(w=[], e=[])
+        convergence_data_k.data = dict(w=[], e=[])
+        convergence_plot.title.text = "no convergence results for this solver and initial condition"
+        return
+    k_study = r['k'][case][np.argmin(np.abs(r['k'][case] - k))]
+    h_study = r['h'][case][np.argmin(np.abs(r['h'][case] - h))]
+    # unstable runs are not plotted
+    valid = np.isfinite(r['err_max']) & (r['err_max'] > 0)
+    rows_h = case & valid & (r['k'] == k_study)
+    rows_k = case & valid & (r['h'] == h_study)
+    convergence_data_h.data = dict(w=r['h'][rows_h], e=r['err_max'][rows_h])
+    convergence_data_k.data = dict(w=r['k'][rows_k], e=r['err_max'][rows_k])
+    convergence_plot.title.text = "max. error vs h (k = %g) and vs k (h = %g)" % (k_study, h_study)
+
+
 def get_solver_id():
     """
     maps the tuple of active pde and active solver to the corresponding id
     """
-    return pde_type.active * 2 + solver_type.active
+    return pde_type.active * len(solver_type.labels) + solver_type.active
 
 
 def mesh_change(attrname, old, new):
@@ -122,44 +184,44 @@ def time_change(attrname, old, new):
 
 def update_mesh(h, k):
     """
-    called if the numerical discretization mesh changed. i.e. if temporal or spatial meshwidth changes. The whole
-    problem is recomputed and each timestep is saved to the mesh_data. Finally the currently active timestep is plotted.
+    called if the numerical discretization mesh changed. i.e. if temporal or spatial meshwidth changes. The problem is
+    reset to the initial condition, the timesteps are computed on demand, when they are plotted (see
+    compute_timesteps). Finally the currently active timestep is plotted.
     :param h: spatial meshwidth
     :param k: temporal meshwidth
     """
     solver_id = get_solver_id()
     pde_specs.data = dict(h=[h], k=[k], solver_id=[solver_id])
 
-    solver = pde_settings.solvers[solver_id]
-
     # spatial discretization
     x0 = pde_settings.x_min
     x1 = pde_settings.x_max
     x = np.arange(x0, x1+h, h)
 
-    # get initial condition
-    f0 = pde_functions.parse(initial_condition.value)
-    u = f0(x)
-
-    # this enforces neumann BC: u'(t=0)=0
-    u_old = np.array(u)
+    # operators of the solver are only assembled once per discretization
+    stepper = pde_solvers.get_stepper(pde_settings.solvers[solver_id], x.shape[0], k, h)
 
     # number of timesteps
     n_temporal = int(round(pde_settings.t_max / k, 0)) + 1
 
-    # setup datastructure for saving each timestep
-    mesh_dict = dict(x=x)
+    # setup datastructure for saving each timestep, only the initial condition is computed so far
+    u = np.empty((n_temporal, x.shape[0]))
+    f0 = pde_functions.parse(initial_condition.value)
+    u[0] = f0(x)
+
+    spectrum = None
+    if isinstance(stepper, pde_solvers.SpectralStepper):
+        spectrum = stepper.transform(u[0])  # the initial condition is only transformed once
 
-    for i in range(n_temporal): # iterate over all timesteps
-        key = 'u' + str(i)
-        mesh_dict[key] = u.tolist() # save result to dict
-        u_new = solver(u_old, u, k, h) # propagate in time
-        u_old = u
-        u = u_new
+    integrator = None
+    if pde_settings.adaptive_time_stepping and isinstance(stepper, pde_solvers.HeatCrankNicolsonStepper):
+        integrator = pde_solvers.AdaptiveHeatIntegrator(u[0], k, h, pde_settings.adaptive_tolerance,
+                                                        pde_settings.adaptive_dt_max)
 
-    mesh_data.data = mesh_dict
+    mesh_state.update(x=x, u=u, n_computed=1, stepper=stepper, spectrum=spectrum, integrator=integrator)
     t = time_slider.value
     update_plot(k, t)
+    update_convergence_plot(h, k)
 
 
 def initial_condition_change(attrname, old, new):
@@ -186,9 +248,25 @@ def init_pde():
 # initialize data source
 plot_data_num = ColumnDataSource(data=dict(x=[], u=[]))
 plot_data_ana = ColumnDataSource(data=dict(x=[],u=[]))
-mesh_data = ColumnDataSource(data=dict())
+# numerical solution on the whole space-time mesh. The solution is kept on the server, only the plotted timestep is sent
+# to the browser.
+mesh_state = dict(x=None,  # spatial mesh
+                  u=None,  # array holding the solution for each timestep (row) and gridpoint (column)
+                  n_computed=0,  # number of timesteps computed so far
+                  stepper=None,  # pde_solvers.Stepper for computing further timesteps
+                  spectrum=None,  # spectrum of the initial condition, if a pde_solvers.SpectralStepper is used
+                  integrator=None)  # pde_solvers.AdaptiveHeatIntegrator, if adaptive time stepping is used
 pde_specs = ColumnDataSource(data=dict(h=[], k=[]))
-ana_sol = ColumnDataSource(data=dict())
+# analytical solution for each time of the time slider
+ana_state = dict(x=None,  # spatial mesh
+                 u=None)  # array holding the solution for each time of the time slider (row) and gridpoint (column)
+
+# results of the convergence study, if pde_convergence.py has been run
+convergence_results = None
+if os.path.exists(pde_settings.convergence_file + '.npz'):
+    convergence_results = pde_convergence.load_study(pde_settings.convergence_file)
+convergence_data_h = ColumnDataSource(data=dict(w=[], e=[]))
+convergence_data_k = ColumnDataSource(data=dict(w=[], e=[]))
 
 # initialize controls
 # slider for going though time
@@ -207,7 +285,7 @@ k_slider.on_change('value', mesh_change)
 pde_type = RadioButtonGroup(labels=['Heat', 'Wave'], active=0)
 pde_type.on_change('active', pde_type_change)
 # radiobuttons controlling solver type
-solver_type = RadioButtonGroup(labels=['Explicit', 'Implicit'], active=0)
+solver_type = RadioButtonGroup(labels=['Explicit', 'Implicit', 'Spectral', 'Crank-Nicolson'], active=0)
 solver_type.on_change('active', mesh_change)
 # text input for IC
 initial_condition = TextInput(value=pde_settings.IC_init, title="initial condition")
@@ -239,6 +317,21 @@ plot.circle('x', 'u', source=plot_data_num,
             color='red',
             legend='numerical solution')
 
+# plot of the errors measured by the convergence study
+convergence_plot = Figure(plot_height=400,
+                          plot_width=400,
+                          tools=toolset,
+                          title="run pde_convergence.py for a convergence study",
+                          x_axis_type='log',
+                          y_axis_type='log',
+                          x_axis_label='meshwidth'
+                          )
+convergence_plot.line('w', 'e', source=convergence_data_h, color='red')
+convergence_plot.circle('w', 'e', source=convergence_data_h, color='red', legend='error vs h')
+convergence_plot.line('w', 'e', source=convergence_data_k, color='blue')
+convergence_plot.circle('w', 'e', source=convergence_data_k, color='blue', legend='error vs k')
+convergence_plot.legend.location = 'bottom_right'
+
 # calculate data
 init_pde()
 
@@ -246,4 +339,4 @@ init_pde()
 controls = widgetbox(initial_condition,time_slider,h_slider,k_slider,pde_type, solver_type,width=400)
 
 # make layout
-curdoc().add_root(row(plot,controls,width=800))
+curdoc().add_root(row(plot,convergence_plot,controls,width=1200))
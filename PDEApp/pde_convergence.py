@@ -0,0 +1,213 @@
+from __future__ import division
+
+import argparse
+import csv
+import multiprocessing
+import time
+
+import numpy as np
+
+import pde_functions
+import pde_settings
+import pde_solvers
+
+# this script runs a convergence study of the solvers in pde_settings.solvers. Run it with
+#   $ python pde_convergence.py [--h H ...] [--k K ...] [--solvers ID ...] [--ics IC ...] [--processes P]
+# Every combination of spatial meshwidth h, temporal meshwidth k, solver and initial condition is solved up to the time
+# t_end by a pool of processes. The numerical solution is compared to the analytical solution on the gridpoints in the
+# discrete L2 norm and the maximum norm. The results and the observed orders of convergence are written to
+# output_name + '.npz' (loaded by pde_app.py) and output_name + '.csv'.
+# The adaptive time stepping of the app is not used, since it does not depend on k.
+
+# columns of the result tables
+columns = ['solver_id', 'pde', 'scheme', 'ic', 'h', 'k', 'n_steps', 'err_l2', 'err_max',
+           'order_h_l2', 'order_h_max', 'order_k_l2', 'order_k_max', 'time']
+
+
+def run_case(task):
+    """
+    solves a single case of the study and measures its error.
+    :param task: tuple (solver_id, initial condition, h, k, t_end, n_series), where solver_id is the index of the solver
+    in pde_settings.solvers and n_series is the number of points used for the fourier series of the analytical solution
+    of the heat equation (see pde_solutions.heat_fourier).
+    :return: dict holding the values of the columns of the case. The orders are computed later (see compute_orders).
+    """
+    solver_id, ic, h, k, t_end, n_series = task
+    stepper_class = pde_settings.solvers[solver_id]
+
+    # the number of gridpoints is rounded, such that the grid always ends at x_max
+    n = int(round((pde_settings.x_max - pde_settings.x_min) / h)) + 1
+    x = np.linspace(pde_settings.x_min, pde_settings.x_max, n)
+    h = x[1] - x[0]
+    n_steps = int(round(t_end / k))
+    t = n_steps * k
+
+    f0 = pde_functions.parse(ic)
+    u_init = f0(x) + np.zeros_like(x)
+
+    t0 = time.time()
+    stepper = stepper_class(n, k, h)
+    with np.errstate(all='ignore'):  # unstable explicit schemes overflow
+        if isinstance(stepper, pde_solvers.SpectralStepper):
+            u = stepper.evaluate(stepper.transform(u_init), t)
+        elif n_steps > 0:
+            u = stepper.advance(u_init, u_init, n_steps)[-1]  # u0 = u1 enforces u_t(t=0) = 0
+        else:
+            u = u_init
+        elapsed = time.time() - t0
+
+        u_ana = pde_settings.analytical_solutions[solver_id](f0, x, n_series)(t)
+        e = u - u_ana
+        err_l2 = np.sqrt(h * np.sum(e ** 2))
+        err_max = np.max(np.abs(e))
+
+    n_schemes = len(pde_settings.solvers) // 2
+    return dict(solver_id=solver_id,
+                pde=['heat', 'wave'][solver_id // n_schemes],
+                scheme=stepper_class.__name__,
+                ic=ic,
+                h=h,
+                k=k,
+                n_steps=n_steps,
+                err_l2=err_l2,
+                err_max=err_max,
+                time=elapsed)
+
+
+def observed_orders(meshwidths, errors):
+    """
+    computes the observed orders of convergence p = log(e_coarse / e_fine) / log(w_coarse / w_fine) of a sequence of
+    refinements.
+    :param meshwidths: array of meshwidths w, sorted descending
+    :param errors: array of corresponding errors e
+    :return: array holding the order of each refinement w.r.t the previous (coarser) meshwidth, nan for the first one
+    """
+    orders = np.empty_like(errors)
+    orders[0] = np.nan
+    with np.errstate(all='ignore'):
+        orders[1:] = np.log(errors[:-1] / errors[1:]) / np.log(meshwidths[:-1] / meshwidths[1:])
+    return orders
+
+
+def compute_orders(results):
+    """
+    computes the observed orders w.r.t h for every fixed k and the observed orders w.r.t k for every fixed h. The
+    orders are computed for each solver and initial condition separately.
+    :param results: dict of arrays, one per column. The order columns are written.
+    """
+    for name in ['order_h_l2', 'order_h_max', 'order_k_l2', 'order_k_max']:
+        results[name] = np.full(results['h'].shape, np.nan)
+
+    for solver_id, ic in set(zip(results['solver_id'], results['ic'])):
+        case = (results['solver_id'] == solver_id) & (results['ic'] == ic)
+        for refined, fixed in [('h', 'k'), ('k', 'h')]:
+            for value in np.unique(results[fixed][case]):
+                rows = np.nonzero(case & (results[fixed] == value))[0]
+                rows = rows[np.argsort(-results[refined][rows])]
+                for norm in ['l2', 'max']:
+                    results['order_' + refined + '_' + norm][rows] = observed_orders(results[refined][rows],
+                                                                                     results['err_' + norm][rows])
+
+
+def run_study(h_values, k_values, solver_ids, ics, t_end=pde_settings.convergence_t_end,
+              n_series=pde_settings.convergence_series_points, n_processes=None):
+    """
+    runs all combinations of meshwidths, solvers and initial conditions in a pool of processes.
+    :param h_values: list of spatial meshwidths
+    :param k_values: list of temporal meshwidths
+    :param solver_ids: list of indices of solvers in pde_settings.solvers
+    :param ics: list of initial conditions (sympy expressions of x)
+    :param t_end: time, at which the error is measured
+    :param n_series: number of points used for the fourier series of the analytical solution of the heat equation
+    :param n_processes: number of processes. If None, one process per available core is used.
+    :return: dict of arrays, one per column (see columns)
+    """
+    tasks = [(solver_id, ic, h, k, t_end, n_series)
+             for solver_id in solver_ids for ic in ics for h in h_values for k in k_values]
+
+    print "running " + str(len(tasks)) + " cases."
+    pool = multiprocessing.Pool(n_processes)
+    try:
+        records = []
+        for n_done, record in enumerate(pool.imap_unordered(run_case, tasks)):
+            records.append(record)
+            print "case " + str(n_done + 1) + " of " + str(len(tasks)) + " done."
+    finally:
+        pool.close()
+        pool.join()
+
+    # same order as the tasks, independent of the order of completion
+    records.sort(key=lambda r: (r['solver_id'], ics.index(r['ic']), -r['h'], -r['k']))
+    results = dict((name, np.array([r[name] for r in records])) for name in columns if name in records[0])
+    compute_orders(results)
+    return results
+
+
+def save_study(results, output_name):
+    """
+    writes the results to output_name + '.npz' and output_name + '.csv'.
+    :param results: dict of arrays, one per column
+    :param output_name: file name without extension
+    """
+    np.savez(output_name + '.npz', **results)
+    with open(output_name + '.csv', 'wb') as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for i in range(results['h'].shape[0]):
+            writer.writerow([results[name][i] for name in columns])
+
+
+def load_study(output_name):
+    """
+    reads results written by save_study.
+    :param output_name: file name without extension
+    :return: dict of arrays, one per column
+    """
+    with np.load(output_name + '.npz') as f:
+        return dict((name, f[name]) for name in f.files)
+
+
+def print_study(results):
+    """
+    prints the convergence table of every solver and initial condition.
+    :param results: dict of arrays, one per column
+    """
+    for i in range(results['h'].shape[0]):
+        if i == 0 or results['solver_id'][i] != results['solver_id'][i - 1] or results['ic'][i] != results['ic'][i - 1]:
+            print ""
+            print results['pde'][i] + " equation, " + results['scheme'][i] + ", u(x,0) = " + results['ic'][i]
+            print "       h |        k |     L2 error | order h | order k |    max error | order h | order k"
+        print "%8.5f | %8.5f | %12.4e | %7.2f | %7.2f | %12.4e | %7.2f | %7.2f" % (
+            results['h'][i], results['k'][i], results['err_l2'][i], results['order_h_l2'][i],
+            results['order_k_l2'][i], results['err_max'][i], results['order_h_max'][i], results['order_k_max'][i])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='runs a convergence study of the PDE solvers.')
+    parser.add_argument('--h', type=float, nargs='+', default=pde_settings.convergence_h,
+                        help='spatial meshwidths (default: %(default)s)')
+    parser.add_argument('--k', type=float, nargs='+', default=pde_settings.convergence_k,
+                        help='temporal meshwidths (default: %(default)s)')
+    parser.add_argument('--solvers', type=int, nargs='+', default=range(len(pde_settings.solvers)),
+                        help='indices of the solvers in pde_settings.solvers (default: all)')
+    parser.add_argument('--ics', nargs='+', default=pde_settings.convergence_ics,
+                        help='initial conditions (default: %(default)s)')
+    parser.add_argument('--t-end', type=float, default=pde_settings.convergence_t_end,
+                        help='time, at which the error is measured (default: %(default)s)')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='number of processes (default: one per core)')
+    parser.add_argument('--output', default=pde_settings.convergence_file,
+                        help='name of the output files without extension (default: %(default)s)')
+    args = parser.parse_args()
+
+    for solver_id in args.solvers:
+        if not 0 <= solver_id < len(pde_settings.solvers):
+            parser.error("unknown solver " + str(solver_id) + "!")
+
+    t0 = time.time()
+    results = run_study(args.h, args.k, args.solvers, args.ics, args.t_end, n_processes=args.processes)
+    print_study(results)
+    save_study(results, args.output)
+    print ""
+    print "results written to " + args.output + ".npz and " + args.output + ".csv."
+    print "elapsed time:" + str(time.time() - t0) + " sec"
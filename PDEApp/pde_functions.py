@@ -1,6 +1,6 @@
 import numpy as np
 from sympy import sympify, lambdify
-from sympy.abc import x
+from sympy.abc import x, y
 
 
 def npHeaviside(x):
@@ -16,4 +16,17 @@ def parse(fun_str):
     fun_sym = sympify(fun_str)
     fun_lam = lambdify(x, fun_sym,['numpy',{"Heaviside": npHeaviside,
                                             "heaviside": npHeaviside}])
-    return fun_lam
\ No newline at end of file
+    return fun_lam
+
+
+def parse_2d(fun_str):
+    """
+    parses a function of x and y.
+    :param fun_str: string holding a sympy expression of x and y
+    :return: function evaluating the expression for arrays x and y. Constant expressions are broadcasted to the shape
+    of x.
+    """
+    fun_sym = sympify(fun_str)
+    fun_lam = lambdify((x, y), fun_sym, ['numpy', {"Heaviside": npHeaviside,
+                                                   "heaviside": npHeaviside}])
+    return lambda x_val, y_val: fun_lam(x_val, y_val) + np.zeros_like(x_val)
@@ -1,18 +1,36 @@
 from __future__ import division
 
 import pde_solvers
+import pde_solvers_2d
 import pde_solutions
 
-solvers = [pde_solvers.heat_do_explicit_step,
-           pde_solvers.heat_do_implicit_step,
-           pde_solvers.wave_do_explicit_step,
-           pde_solvers.wave_do_implicit_step]
+solvers = [pde_solvers.HeatExplicitStepper,
+           pde_solvers.HeatImplicitStepper,
+           pde_solvers.HeatSpectralStepper,
+           pde_solvers.HeatCrankNicolsonStepper,
+           pde_solvers.WaveExplicitStepper,
+           pde_solvers.WaveImplicitStepper,
+           pde_solvers.WaveSpectralStepper,
+           pde_solvers.WaveCrankNicolsonStepper]
 
 analytical_solutions = [pde_solutions.heat_analytical,
                         pde_solutions.heat_analytical,
+                        pde_solutions.heat_analytical,
+                        pde_solutions.heat_analytical,
+                        pde_solutions.wave_analytical,
+                        pde_solutions.wave_analytical,
                         pde_solutions.wave_analytical,
                         pde_solutions.wave_analytical]
 
+# settings for adaptive time stepping of the heat equation with the Crank-Nicolson scheme. If adaptive_time_stepping is
+# True, the temporal meshwidth only defines the timesteps that are plotted. The stepsize is chosen by step doubling,
+# such that the error of each step is below adaptive_tolerance, and the plotted timesteps are interpolated. The stepsize
+# never exceeds adaptive_dt_max, which bounds the error of the interpolation: for the initial conditions of the
+# convergence study the interpolated solution stays within 3e-5 of the exact solution (3e-6 for sin(x * 2 * pi)).
+adaptive_time_stepping = True
+adaptive_tolerance = 1e-5
+adaptive_dt_max = .05
+
 t_init = 0.0
 t_min = 0.0
 t_max = 2.0
@@ -31,8 +49,45 @@ k_step = .005
 x_min = 0.0
 x_max = 1.0
 
+# number of timesteps, which are computed in advance, when the time slider reaches a timestep that is not computed yet
+prefetch_steps = 10
+
 IC_init = 'sin(x * 2 * pi)'
 
+# settings for the convergence study (pde_convergence.py). Every combination of the meshwidths convergence_h and
+# convergence_k, solver and initial condition is solved up to convergence_t_end and compared to the analytical solution.
+# The fourier series of the analytical solution of the heat equation is computed from convergence_series_points samples
+# of the initial condition, such that its aliasing error is far below the discretization errors. The results are written
+# to convergence_file + '.npz' and '.csv'; if the file exists, the app plots the errors of the active solver.
+convergence_h = [.1, .05, .025, .0125, .00625]
+convergence_k = [.1, .05, .025, .0125, .00625]
+convergence_ics = [IC_init, 'exp(-100 * (x - .5)**2)']
+convergence_t_end = .5
+convergence_series_points = 2**14 + 1
+convergence_file = 'convergence'
+
+# settings for the 2D app (pde2d_app.py). The 2D heat and wave equation are solved on [x_min,x_max]^2 by ADI schemes.
+# While the simulation is running, steps_per_frame timesteps are computed every frame_time milliseconds and only the
+# new frame is sent to the browser. The simulation stops at t_max_2d.
+solvers_2d = [pde_solvers_2d.ADIHeatStepper,
+              pde_solvers_2d.ADIWaveStepper]
+
+h_init_2d = .01
+h_min_2d = .005
+h_max_2d = .05
+h_step_2d = .005
+
+k_init_2d = .005
+k_min_2d = .001
+k_max_2d = .05
+k_step_2d = .001
+
+t_max_2d = 2.0
+steps_per_frame = 2
+frame_time = 50
+
+IC2d_init = 'exp(-100*((x-.5)**2+(y-.5)**2))'
+
 svg_palette_jet = ['#00008f', '#00009f', '#0000af', '#0000bf', '#0000cf', '#0000df', '#0000ef', '#0000ff', '#000fff',
                    '#001fff', '#002fff', '#003fff', '#004fff', '#005fff', '#006fff', '#007fff', '#008fff', '#009fff',
                    '#00afff', '#00bfff', '#00cfff', '#00dfff', '#00efff', '#00ffff', '#0fffef', '#1fffdf', '#2fffcf',
@@ -1,34 +1,59 @@
 from __future__ import division
+import collections
+
 import numpy as np
 
 import pde_constants
 
+# number of fourier bases, which are kept in memory. See get_fourier_basis.
+basis_cache_size = 8
+_basis_cache = collections.OrderedDict()
+
 
-def heat_analytical(f0, x):
+def heat_analytical(f0, x, n_series=None):
     """
     wrapper function for calling the appropriate analytical solution scheme.
     :param f0: analytical, functional expression for the initial condition, that can be evaluated for arbitrary x
     :param x: spatial x values for evaluation
+    :param n_series: number of equally spaced points used for computing the fourier series (see heat_fourier)
     :return u_x: functional expression of the solution of the heat transport equation at positions x for arbitrary times t
     """
     c_heat = pde_constants.heat_conductivity
-    u_x = heat_fourier(f0, c_heat, x)
+    u_x = heat_fourier(f0, c_heat, x, n_series)
     return u_x
 
 
-def heat_analytical(f0, c_heat, x):
+def get_fourier_basis(x, K):
     """
-    computes the analytical solution for the heat transport equation in 1D using fourier series ansatz. The fourier
-    series approximation of the initial condition is computed using fast fourier transform.
-    ASSUMPTION: left and right boundary are dirichlet boundary conditions!
-    :param f0: analytical, functional expression for the initial condition, that can be evaluated for arbitrary x
-    :param c_heat: heat transport coefficient
+    evaluates the fourier basis functions sin(kk * x) and cos(kk * x) with kk = k * pi / w for k = 0, ..., K-1 on the
+    grid x, where w is the length of the domain. The bases are cached, such that they are only computed once per grid.
     :param x: spatial x values for evaluation (equally spaced!)
-    :return u_x: functional expression of the solution of the heat transport equation at positions x for arbitrary times t
+    :param K: number of basis functions
+    :return: two N x K arrays holding the sine and the cosine basis functions
     """
+    key = (np.min(x), np.max(x), x.shape[0], K)
+    if key in _basis_cache:
+        return _basis_cache[key]
 
-    #todo also support Neumann boundary conditions!
+    w = np.max(x) - np.min(x)
+    kk = np.arange(K) * np.pi / w
+    basis = (np.sin(np.outer(x, kk)), np.cos(np.outer(x, kk)))
 
+    _basis_cache[key] = basis
+    while len(_basis_cache) > basis_cache_size:
+        _basis_cache.popitem(last=False)
+    return basis
+
+
+def fourier_series(f0, x):
+    """
+    computes the fourier series of the initial condition using fast fourier transform. The linear function u_lin
+    matching the (dirichlet) boundary values is subtracted and the remaining homogeneous part is extended periodically
+    as an odd function.
+    :param f0: analytical, functional expression for the initial condition, that can be evaluated for arbitrary x
+    :param x: spatial x values for evaluation (equally spaced!)
+    :return: u_lin on the grid x, cosine coefficients a, sine coefficients b and wave numbers kk of the series
+    """
     u0 = f0(x)
 
     u_lin = u0[0] * (np.max(x) - x) / (np.max(x) - np.min(x)) + u0[-1] * (x - np.min(x)) / (np.max(x) - np.min(x))
@@ -46,6 +71,69 @@ def heat_analytical(f0, c_heat, x):
     a = a[:K]
 
     w = np.max(x) - np.min(x)
+    kk = np.arange(K) * np.pi / w
+    return u_lin, a, b, kk
+
+
+class FourierSolution:
+    """
+    solution of a PDE given as fourier series
+        u(x,t) = u_lin(x) + a_0 / 2 * T_0(t) + sum_k T_k(t) * (b_k * sin(kk_k * x) + a_k * cos(kk_k * x)),
+    where the T_k(t) are the time dependent factors of the modes. The modes are evaluated once on the grid x, therefore
+    evaluating the solution for T times is a single (T x K) * (K x N) matrix product. An instance can be called like a
+    function of t, which returns the solution u(x,t) for a single time t.
+    """
+
+    def __init__(self, x, u_lin, a, b, kk, time_factors):
+        """
+        :param x: spatial x values for evaluation (equally spaced!)
+        :param u_lin: linear part of the solution on the grid x
+        :param a: cosine coefficients of the series
+        :param b: sine coefficients of the series
+        :param kk: wave numbers of the series
+        :param time_factors: function returning the T x K array of the factors T_k(t) for an array of T times
+        """
+        sin_basis, cos_basis = get_fourier_basis(x, kk.shape[0])
+        a_0 = np.zeros_like(a)
+        a_0[0] = a[0] / 2
+        self.modes = (b * sin_basis + (a - a_0) * cos_basis).T  # K x N, a_0 / 2 instead of a_0
+        self.u_lin = u_lin
+        self.time_factors = time_factors
+
+    def __call__(self, t):
+        return self.frames([t])[0]
+
+    def frames(self, t):
+        """
+        evaluates the solution for several times at once.
+        :param t: array of T times
+        :return: T x N array holding the solution u(x,t) for each time (row)
+        """
+        return self.u_lin + self.time_factors(np.asarray(t, dtype=np.float64)).dot(self.modes)
+
+
+def heat_fourier(f0, c_heat, x, n_series=None):
+    """
+    computes the analytical solution for the heat transport equation in 1D using fourier series ansatz. The fourier
+    series approximation of the initial condition is computed using fast fourier transform.
+    ASSUMPTION: left and right boundary are dirichlet boundary conditions!
+    :param f0: analytical, functional expression for the initial condition, that can be evaluated for arbitrary x
+    :param c_heat: heat transport coefficient
+    :param x: spatial x values for evaluation (equally spaced!)
+    :param n_series: number of equally spaced points used for computing the fourier series. If None, the series is
+    computed from the values on the grid x. Sampling the initial condition finer than x reduces the aliasing error of
+    the series, which is needed if the solution serves as reference for measuring discretization errors.
+    :return u_x: FourierSolution of the heat transport equation at positions x for arbitrary times t
+    """
+
+    #todo also support Neumann boundary conditions!
+
+    if n_series is None:
+        u_lin, a, b, kk = fourier_series(f0, x)
+    else:
+        x_series = np.linspace(np.min(x), np.max(x), n_series)
+        u_lin, a, b, kk = fourier_series(f0, x_series)
+        u_lin = np.interp(x, x_series, u_lin)  # u_lin is linear, therefore the interpolation is exact
 
     # numpy matrix version of code below
     """
@@ -53,20 +141,16 @@ def heat_analytical(f0, c_heat, x):
         kk = k * np.pi / w
         u += np.exp(-(kk**2)*(c_heat ** 2)*t) * (b[k] * np.sin(kk*x) + a[k] * np.cos(kk*x))
     """
-    k = np.arange(K)
-    kk = k * np.pi / w
-
-    u_x = lambda t: u_lin - a[0] / 2 + \
-                      np.sum(np.exp(-(kk ** 2) * (c_heat ** 2) * t) *
-                             (b * np.sin(np.outer(x, kk)) + a * np.cos(np.outer(x, kk))),axis=1)
+    u_x = FourierSolution(x, u_lin, a, b, kk, lambda t: np.exp(-np.outer(t, kk ** 2) * (c_heat ** 2)))
     return u_x
 
 
-def wave_analytical(f0, x):
+def wave_analytical(f0, x, n_series=None):
     """
     wrapper function for calling the appropriate analytical solution scheme.
     :param f0: analytical, functional expression for the initial condition, that can be evaluated for arbitrary x
     :param x: spatial x values for evaluation
+    :param n_series: not used, d'Alemberts solution is exact for arbitrary x
     :return u_x: functional expression of the solution of the wave equation at positions x for arbitrary times t
     """
     c_wave = pde_constants.wave_number
@@ -83,28 +167,12 @@ def wave_fourier(f0, c_wave, x):
     :param f0: analytical, functional expression for the initial condition, that can be evaluated for arbitrary x
     :param c_wave: wave travelling speed
     :param x: spatial x values for evaluation (equally spaced!)
-    :return u_x: functional expression of the solution of the wave equation at positions x for arbitrary times t
+    :return u_x: FourierSolution of the wave equation at positions x for arbitrary times t
     """
 	
     #todo also support Neumann boundary conditions!	
 
-    u0 = f0(x)
-
-    u_lin = u0[0] * (np.max(x) - x) / (np.max(x) - np.min(x)) + u0[-1] * (x - np.min(x)) / (np.max(x) - np.min(x))
-    u_hom = u0 - u_lin
-    u_hom = np.concatenate([u_hom, -u_hom[-2:0:-1]])  # periodically extend function
-
-    K = u_hom.__len__()
-
-    c = np.fft.fft(u0)
-
-    b = -2 * np.imag(c) / K
-    a = 2 * np.real(c) / K
-    K = int(K / 2) + 1
-    b = b[:K]
-    a = a[:K]
-
-    w = np.max(x) - np.min(x)
+    u_lin, a, b, kk = fourier_series(f0, x)
 
     # numpy matrix version of code below
     """
@@ -112,9 +180,7 @@ def wave_fourier(f0, c_wave, x):
         kk = k * np.pi / w
         u += np.cos(kk * t  * c_wave) * (b[k] * np.sin(kk*x) + a[k] * np.cos(kk*x))
     """
-    k = np.arange(K)
-    kk = k * np.pi / w
-    u_x = lambda t: u_lin + np.sum(np.cos(kk * t * c_wave) * (b * np.sin(np.outer(x, kk)) + a * np.cos(np.outer(x, kk))), axis=1)
+    u_x = FourierSolution(x, u_lin, a, b, kk, lambda t: np.cos(np.outer(t, kk) * c_wave))
     return u_x
 
 
@@ -148,3 +214,13 @@ def wave_dAlembert(f0, c_wave, x):
     return u_x
 
 
+def get_frames(u_x, t):
+    """
+    evaluates an analytical solution for several times at once.
+    :param u_x: functional expression of the solution at positions x for arbitrary times t
+    :param t: array of T times
+    :return: T x N array holding the solution u(x,t) for each time (row)
+    """
+    if isinstance(u_x, FourierSolution):
+        return u_x.frames(t)
+    return np.array([u_x(t_i) for t_i in t])
@@ -1,4 +1,10 @@
 from __future__ import division
+import abc
+import collections
+import threading
+
+import numpy as np
+import scipy.fftpack as fft
 import scipy.sparse as sp
 import scipy.sparse.linalg as lin
 
@@ -7,6 +13,349 @@ import pde_constants
 c_heat = pde_constants.heat_conductivity
 c_wave = pde_constants.wave_number
 
+# number of steppers, whose assembled operators and factorizations are kept in memory. The steppers are shared by all
+# sessions of the server process, see get_stepper.
+stepper_cache_size = 32
+_stepper_cache = collections.OrderedDict()
+_stepper_cache_lock = threading.Lock()
+
+
+def laplace_matrix(n, r):
+    """
+    assembles the spatial discretization matrix r * [1 -2 1] for n gridpoints. The first and the last row are zero,
+    therefore the dirichlet boundary values are not changed by the matrix.
+    :param n: number of gridpoints
+    :param r: factor of the stencil
+    :return: n x n sparse matrix in CSR format
+    """
+    lower = r * np.ones(n - 1)
+    main = -2 * r * np.ones(n)
+    upper = r * np.ones(n - 1)
+    main[[0, -1]] = 0  # enforcing dirichlet BC -> no change!
+    upper[0] = 0
+    lower[-1] = 0
+    return sp.diags([lower, main, upper], [-1, 0, 1], format='csr')
+
+
+class Stepper(object):
+    """
+    abstract time stepping scheme for a PDE on a 1D or 2D grid with fixed spatial meshwidth h and temporal meshwidth k.
+    The operators of the scheme are assembled (and factorized) once on construction, every step only needs sparse matrix
+    vector products and triangular solves. All schemes are written as two step schemes computing u^(j+1) from u^(j-1)
+    and u^(j); one step schemes ignore u^(j-1). Subclasses implement step.
+    """
+    __metaclass__ = abc.ABCMeta
+
+    def __init__(self, n, k, h):
+        """
+        :param n: number of gridpoints (per dimension)
+        :param k: temporal meshwidth
+        :param h: spatial meshwidth
+        """
+        self.n = n
+        self.k = k
+        self.h = h
+
+    @abc.abstractmethod
+    def step(self, u0, u1):
+        """
+        does one timestep.
+        :param u0: solution u(x,t=t-k)
+        :param u1: solution u(x,t=t)
+        :return: u2: solution u(x,t=t+k)
+        """
+
+    def advance(self, u0, u1, n_steps):
+        """
+        does several timesteps.
+        :param u0: solution u(x,t=t-k)
+        :param u1: solution u(x,t=t)
+        :param n_steps: number of timesteps
+        :return: array holding the solutions u(x,t=t+k), ..., u(x,t=t+n_steps*k) (one timestep per row)
+        """
+        u = np.empty((n_steps,) + np.shape(u1))
+        for i in range(n_steps):
+            u[i] = self.step(u0, u1)
+            u0 = u1
+            u1 = u[i]
+        return u
+
+
+class HeatExplicitStepper(Stepper):
+    """
+    explicit euler scheme for the 1D heat equation (see heat_do_explicit_step).
+    """
+
+    def __init__(self, n, k, h):
+        Stepper.__init__(self, n, k, h)
+        r = (c_heat ** 2) * k / (h ** 2)
+        self.iteration_matrix = (sp.eye(n, n) + laplace_matrix(n, r)).tocsr()
+
+    def step(self, u0, u1):
+        return self.iteration_matrix.dot(u1)
+
+
+class HeatImplicitStepper(Stepper):
+    """
+    implicit euler scheme for the 1D heat equation (see heat_do_implicit_step). The LU factorization of the iteration
+    matrix is computed once.
+    """
+
+    def __init__(self, n, k, h):
+        Stepper.__init__(self, n, k, h)
+        r = (c_heat ** 2) * k / (h ** 2)
+        self.lu = lin.splu((sp.eye(n, n) - laplace_matrix(n, r)).tocsc())
+
+    def step(self, u0, u1):
+        return self.lu.solve(u1)
+
+
+class HeatCrankNicolsonStepper(Stepper):
+    """
+    Crank-Nicolson scheme for the 1D heat equation (see heat_do_crank_nicolson_step). The LU factorization of the
+    iteration matrix is computed once.
+    """
+
+    def __init__(self, n, k, h):
+        Stepper.__init__(self, n, k, h)
+        r = (c_heat ** 2) * k / (h ** 2)
+        a_h = laplace_matrix(n, r)
+        self.iteration_matrix = (sp.eye(n, n) + .5 * a_h).tocsr()
+        self.lu = lin.splu((sp.eye(n, n) - .5 * a_h).tocsc())
+
+    def step(self, u0, u1):
+        return self.lu.solve(self.iteration_matrix.dot(u1))
+
+
+class AdaptiveHeatIntegrator:
+    """
+    adaptive time stepping for the 1D heat equation using step doubling. Every step of size dt is compared to two
+    steps of size dt/2. For a scheme of order p the difference of both results divided by 2**p - 1 estimates the error
+    of the two half steps. If the error exceeds the tolerance, the step is rejected and dt is halved; if it is small
+    enough, the next step uses 2*dt. Since the stepsizes are powers of two times the initial stepsize, the steppers (and
+    their factorizations) are reused (see get_stepper). The solution can be evaluated for arbitrary times by cubic
+    hermite interpolation between the accepted steps (dense output). The error estimate only controls the steps, not the
+    interpolation between them, therefore the stepsize never exceeds dt_max.
+    """
+
+    def __init__(self, u_init, dt, h, tolerance, dt_max, stepper_class=HeatCrankNicolsonStepper, order=2):
+        """
+        :param u_init: solution u(x,t=0)
+        :param dt: initial temporal meshwidth
+        :param h: spatial meshwidth
+        :param tolerance: maximum error of a single step (maximum norm)
+        :param dt_max: maximum temporal meshwidth
+        :param stepper_class: subclass of Stepper implementing a one step scheme for the heat equation
+        :param order: order of the scheme
+        """
+        self.n = u_init.shape[0]
+        self.h = h
+        self.dt = dt
+        self.dt_max = dt_max
+        while self.dt > dt_max:
+            self.dt /= 2
+        self.tolerance = tolerance
+        self.stepper_class = stepper_class
+        self.order = order
+        self.n_steps = 0  # number of accepted steps
+        self.n_rejected = 0  # number of rejected steps
+        self.laplace = laplace_matrix(self.n, (c_heat ** 2) / (h ** 2))  # right hand side of u_t = c^2 * u_xx
+        # last accepted step from t0 to t1 with the solutions u and their time derivatives f
+        self.t0 = self.t1 = 0.0
+        self.u0 = self.u1 = np.array(u_init, dtype=np.float64)
+        self.f0 = self.f1 = self.laplace.dot(self.u1)
+
+    def _step(self):
+        """
+        does one accepted step.
+        """
+        while True:
+            full = get_stepper(self.stepper_class, self.n, self.dt, self.h)
+            half = get_stepper(self.stepper_class, self.n, self.dt / 2, self.h)
+            u_full = full.step(self.u1, self.u1)
+            u_half = half.step(self.u1, half.step(self.u1, self.u1))
+            error = np.max(np.abs(u_half - u_full)) / (2 ** self.order - 1)
+            if error <= self.tolerance:
+                break
+            self.dt /= 2
+            self.n_rejected += 1
+
+        self.t0, self.u0, self.f0 = self.t1, self.u1, self.f1
+        self.t1, self.u1, self.f1 = self.t1 + self.dt, u_half, self.laplace.dot(u_half)
+        self.n_steps += 1
+        # the doubled step would also be accepted
+        if error * 2 ** (self.order + 1) <= self.tolerance and 2 * self.dt <= self.dt_max:
+            self.dt *= 2
+
+    def dense_output(self, t):
+        """
+        evaluates the solution for the given times. Steps are only computed up to the largest requested time.
+        :param t: increasing array of times, which are not smaller than the times of the previous call
+        :return: array holding the solution u(x,t) for each time (row)
+        """
+        u = np.empty((len(t), self.n))
+        for i, t_i in enumerate(t):
+            while self.t1 < t_i:
+                self._step()
+            if self.t1 == self.t0:
+                u[i] = self.u1
+                continue
+            dt = self.t1 - self.t0
+            s = (t_i - self.t0) / dt
+            u[i] = (2 * s ** 3 - 3 * s ** 2 + 1) * self.u0 + (s ** 3 - 2 * s ** 2 + s) * dt * self.f0 + \
+                   (-2 * s ** 3 + 3 * s ** 2) * self.u1 + (s ** 3 - s ** 2) * dt * self.f1
+        return u
+
+
+class WaveExplicitStepper(Stepper):
+    """
+    explicit central difference scheme for the 1D wave equation (see wave_do_explicit_step).
+    """
+
+    def __init__(self, n, k, h):
+        Stepper.__init__(self, n, k, h)
+        r = (c_wave * k / h) ** 2
+        boundary = np.ones(n)
+        boundary[[0, -1]] = 0
+        self.iteration_matrix1 = (sp.diags(1 + boundary) + laplace_matrix(n, r)).tocsr()  # boundary values are kept
+        self.iteration_matrix0 = sp.diags(-boundary, format='csr')
+
+    def step(self, u0, u1):
+        return self.iteration_matrix1.dot(u1) + self.iteration_matrix0.dot(u0)
+
+
+class WaveImplicitStepper(Stepper):
+    """
+    implicit central difference scheme for the 1D wave equation (see wave_do_implicit_step). The LU factorization of
+    the iteration matrix is computed once.
+    """
+
+    def __init__(self, n, k, h):
+        Stepper.__init__(self, n, k, h)
+        r = (c_wave * k / h) ** 2
+        a_h = laplace_matrix(n, r)
+        self.iteration_matrix0 = (.5 * a_h - sp.eye(n, n)).tocsr()
+        self.lu = lin.splu((-.5 * a_h + sp.eye(n, n)).tocsc())
+
+    def step(self, u0, u1):
+        return self.lu.solve(2 * u1 + self.iteration_matrix0.dot(u0))
+
+
+class WaveCrankNicolsonStepper(Stepper):
+    """
+    Crank-Nicolson scheme for the 1D wave equation (see wave_do_crank_nicolson_step). The LU factorization of the
+    iteration matrix is computed once.
+    """
+
+    def __init__(self, n, k, h):
+        Stepper.__init__(self, n, k, h)
+        r = (c_wave * k / h) ** 2
+        a_h = laplace_matrix(n, r)
+        self.iteration_matrix1 = (2 * sp.eye(n, n) + .5 * a_h).tocsr()
+        self.iteration_matrix0 = (.25 * a_h - sp.eye(n, n)).tocsr()
+        self.lu = lin.splu((sp.eye(n, n) - .25 * a_h).tocsc())
+
+    def step(self, u0, u1):
+        return self.lu.solve(self.iteration_matrix1.dot(u1) + self.iteration_matrix0.dot(u0))
+
+
+class SpectralStepper(Stepper):
+    """
+    exact time integration of the spatially discretized PDE using the discrete sine transform (DST). With dirichlet
+    BC the linear function u_lin matching the boundary values is a stationary solution of the discretized PDE. The
+    remaining homogeneous part w = u - u_lin vanishes at the boundary and the spatial discretization matrix is
+    diagonalized by the DST of type I: the inner gridpoints of the m-th sine mode
+        sin(m * pi * i / (n-1)), i = 1, ..., n-2
+    form an eigenvector of the stencil 1/h^2 * [1 -2  1] with eigenvalue
+        lambda_m = -4/h^2 * sin(m * pi / (2 * (n-1)))**2.
+    Therefore each mode evolves independently and the solution can be evaluated for arbitrary times t at the cost of one
+    inverse DST, without computing the timesteps in between (see transform and evaluate). The temporal meshwidth k is
+    only used by step. Subclasses implement time_factors and step.
+    """
+
+    def __init__(self, n, k, h):
+        Stepper.__init__(self, n, k, h)
+        m = np.arange(1, n - 1)
+        self.eigenvalues = -4 / h ** 2 * np.sin(m * np.pi / (2 * (n - 1))) ** 2
+
+    @abc.abstractmethod
+    def time_factors(self, t):
+        """
+        :param t: time
+        :return: factor of each sine mode at time t, if the mode has the amplitude 1 at time 0
+        """
+
+    def transform(self, u_init):
+        """
+        transforms the initial condition into the eigenbasis of the discretized PDE.
+        :param u_init: solution u(x,t=0)
+        :return: spectrum of u_init, a tuple holding u_lin and the DST of the homogeneous part at the inner gridpoints
+        """
+        u_lin = np.linspace(u_init[0], u_init[-1], self.n)
+        return u_lin, fft.dst(u_init[1:-1] - u_lin[1:-1], type=1)
+
+    def evaluate(self, spectrum, t):
+        """
+        evaluates the solution for an arbitrary time.
+        :param spectrum: spectrum of the initial condition (see transform)
+        :param t: time
+        :return: solution u(x,t)
+        """
+        u_lin, coefficients = spectrum
+        u = np.array(u_lin)
+        u[1:-1] += fft.idst(self.time_factors(t) * coefficients, type=1) / (2 * (self.n - 1))
+        return u
+
+
+class HeatSpectralStepper(SpectralStepper):
+    """
+    spectral time integration for the 1D heat equation. The modes decay with exp(c^2 * lambda_m * t).
+    """
+
+    def time_factors(self, t):
+        return np.exp((c_heat ** 2) * self.eigenvalues * t)
+
+    def step(self, u0, u1):
+        return self.evaluate(self.transform(u1), self.k)
+
+
+class WaveSpectralStepper(SpectralStepper):
+    """
+    spectral time integration for the 1D wave equation with u_t(t=0)=0. The modes oscillate with
+    cos(c * sqrt(-lambda_m) * t).
+    """
+
+    def time_factors(self, t):
+        return np.cos(c_wave * np.sqrt(-self.eigenvalues) * t)
+
+    def step(self, u0, u1):
+        # every mode fulfills w(t+k) = 2 * cos(omega * k) * w(t) - w(t-k)
+        u_lin, coefficients0 = self.transform(u0)
+        u_lin, coefficients1 = self.transform(u1)
+        return self.evaluate((u_lin, 2 * self.time_factors(self.k) * coefficients1 - coefficients0), 0)
+
+
+def get_stepper(stepper_class, n, k, h):
+    """
+    returns the stepper of the given scheme for the given discretization. Steppers are cached and shared by all
+    sessions, therefore the operators are only assembled once per (scheme, n, k, h).
+    :param stepper_class: subclass of Stepper implementing the scheme
+    :param n: number of gridpoints
+    :param k: temporal meshwidth
+    :param h: spatial meshwidth
+    :return: instance of stepper_class
+    """
+    key = (stepper_class, n, k, h)
+    with _stepper_cache_lock:
+        stepper = _stepper_cache.pop(key, None)
+        if stepper is None:
+            stepper = stepper_class(n, k, h)
+        _stepper_cache[key] = stepper  # reinsert as most recently used
+        while len(_stepper_cache) > stepper_cache_size:
+            _stepper_cache.popitem(last=False)
+    return stepper
+
+
 def heat_do_explicit_step(ux, u0, k, h):
     """
     Does one timestep for given initial conditions at u0 = u^(j) with spatial meshwidth h and temporal meshwidth k for
@@ -19,17 +368,7 @@ def heat_do_explicit_step(ux, u0, k, h):
     :param h: spatial meshwidth
     :return: u1: solution u(x,t=t+k)
     """
-
-    n = u0.shape[0]
-    r = (c_heat ** 2) * k / (h ** 2)
-    iteration_matrix = (r * sp.eye(n, n, -1) - 2 * r * sp.eye(n, n) + r * sp.eye(n, n, 1)).tocsr()
-    iteration_matrix[0, 0] = 0  # enforcing dirichlet BC -> no change!
-    iteration_matrix[0, 1] = 0
-    iteration_matrix[n - 1, n - 1] = 0
-    iteration_matrix[n - 1, n - 2] = 0
-    iteration_matrix += sp.eye(n, n)
-    u1 = iteration_matrix.dot(u0)
-    return u1
+    return get_stepper(HeatExplicitStepper, u0.shape[0], k, h).step(ux, u0)
 
 
 def heat_do_implicit_step(ux, u0, k, h):
@@ -38,8 +377,8 @@ def heat_do_implicit_step(ux, u0, k, h):
     the 1D heat equation. For notation an theory see
         "Karpfinger, Hoehere Mathematik in Rezepten, 2.Auflage, p.894 ff."
     Since we are using an implicit time stepping scheme, there is no stability criterion. We use
-    scipy.linalg.solve_banded for solving the implicit equation. Theferfore we need to convert our implicit equation
-    into ordered diagonal format:
+    the LU factorization of the iteration matrix, which is computed once per discretization (see
+    HeatImplicitStepper), for solving the implicit equation:
         u1 = u0 + A_h * u1
     ->  (Id - A_h) * u1 = u0
     This is a system of linear equations: A * x = b with
@@ -52,18 +391,24 @@ def heat_do_implicit_step(ux, u0, k, h):
     :param h: spatial meshwidth
     :return: u1: solution u(x,t=t+k)
     """
+    return get_stepper(HeatImplicitStepper, u0.shape[0], k, h).step(ux, u0)
+
+
+def heat_do_crank_nicolson_step(ux, u0, k, h):
+    """
+    Does one timestep for given initial conditions at u0 = u^(j) with spatial meshwidth h and temporal meshwidth k for
+    the 1D heat equation using the Crank-Nicolson scheme. The scheme averages the explicit and the implicit euler
+    scheme:
+        u1 = u0 + .5 * A_h * u0 + .5 * A_h * u1
+    ->  (Id - .5 * A_h) * u1 = (Id + .5 * A_h) * u0
+    It is unconditionally stable and of second order in time.
 
-    n = u0.shape[0]
-    r = (c_heat ** 2) * k / (h ** 2)
-    iteration_matrix = (r * sp.eye(n, n, -1) - 2 * r * sp.eye(n, n) + r * sp.eye(n, n, 1)).tocsr()
-    iteration_matrix[0, 0] = 0  # enforcing dirichlet BC -> no change!
-    iteration_matrix[0, 1] = 0
-    iteration_matrix[n - 1, n - 1] = 0
-    iteration_matrix[n - 1, n - 2] = 0
-    iteration_matrix = -iteration_matrix
-    iteration_matrix += sp.eye(n, n)
-    u1 = lin.spsolve(iteration_matrix, u0)
-    return u1
+    :param u0: solution u(x,t=t)
+    :param k: temporal meshwidth
+    :param h: spatial meshwidth
+    :return: u1: solution u(x,t=t+k)
+    """
+    return get_stepper(HeatCrankNicolsonStepper, u0.shape[0], k, h).step(ux, u0)
 
 
 def wave_do_explicit_step(u0, u1, k, h):
@@ -79,23 +424,7 @@ def wave_do_explicit_step(u0, u1, k, h):
     :param h: spatial meshwidth
     :return: u2: solution u(x,t=t+k)
     """
-
-    n = u0.shape[0]
-    r = (c_wave * k / h) ** 2
-    a_h = (-2 * r * sp.eye(n, n) + r * sp.eye(n, n, -1) + r * sp.eye(n, n, 1)).tocsr()
-    iteration_matrix1 = 2 * sp.eye(n, n) + a_h
-    iteration_matrix1[0, 0] = 1
-    iteration_matrix1[0, 1] = 0
-    iteration_matrix1[n - 1, n - 1] = 1
-    iteration_matrix1[n - 1, n - 2] = 0
-
-    iteration_matrix0 = - 1 * sp.eye(n, n).tocsr()
-    iteration_matrix0[0, 0] = 0
-    iteration_matrix0[n - 1, n - 1] = 0
-
-    u2 = iteration_matrix1.dot(u1) + iteration_matrix0.dot(u0)
-
-    return u2
+    return get_stepper(WaveExplicitStepper, u0.shape[0], k, h).step(u0, u1)
 
 
 def wave_do_implicit_step(u0, u1, k, h):
@@ -112,7 +441,8 @@ def wave_do_implicit_step(u0, u1, k, h):
     This results in the implicit update rule:
         (Id - .5 * k^2 * A_h) * u^(k+1) = 2*u^(k) - (Id - .5 * k^2 * A_h) * u^(k-1)
 
-    Where we compute u^(k+1) by solving the band diagonal system using scipy.linalg.solve_banded.
+    Where we compute u^(k+1) by solving the band diagonal system using its LU factorization, which is computed once per
+    discretization (see WaveImplicitStepper).
 
     :param u0: solution u(x,t=t-k)
     :param u1: solution u(x,t=t)
@@ -120,19 +450,23 @@ def wave_do_implicit_step(u0, u1, k, h):
     :param h: spatial meshwidth
     :return: u2: solution u(x,t=t+k)
     """
+    return get_stepper(WaveImplicitStepper, u0.shape[0], k, h).step(u0, u1)
 
-    n = u0.shape[0]
-    r = (c_wave * k / h) ** 2
-    a_h = (-2 * r * sp.eye(n, n) + r * sp.eye(n, n, -1) + r * sp.eye(n, n, 1)).tocsr()
-    a_h[0, 0] = 0
-    a_h[0, 1] = 0
-    a_h[n - 1, n - 2] = 0
-    a_h[n - 1, n - 1] = 0
 
-    iteration_matrix0 = .5 * a_h - 1 * sp.eye(n, n)
-    iteration_matrix2 = -.5 * a_h + 1 * sp.eye(n, n)
-
-    rhs = 2 * u1 + iteration_matrix0.dot(u0)
+def wave_do_crank_nicolson_step(u0, u1, k, h):
+    """
+    Does one timestep for given initial conditions at u0 = u^(j-1) and u1 = u^(j) with spatial meshwidth h and temporal
+    meshwidth k for the 1D wave equation using the Crank-Nicolson scheme. The scheme applies the trapezoidal rule to the
+    first order system u_t = v, v_t = u_xx. Eliminating v yields the two step scheme
+        u^(k+1)-2*u^(k)+u^(k-1) = k^2 * .25 * (A_h * u^(k+1) + 2 * A_h * u^(k) + A_h * u^(k-1))
+    ->  (Id - .25 * k^2 * A_h) * u^(k+1) = (2*Id + .5 * k^2 * A_h) * u^(k) - (Id - .25 * k^2 * A_h) * u^(k-1)
+    It is unconditionally stable, of second order in time and its phase error is smaller than the one of the implicit
+    scheme.
 
-    u2 = lin.spsolve(iteration_matrix2, rhs)
-    return u2
+    :param u0: solution u(x,t=t-k)
+    :param u1: solution u(x,t=t)
+    :param k: temporal meshwidth
+    :param h: spatial meshwidth
+    :return: u2: solution u(x,t=t+k)
+    """
+    return get_stepper(WaveCrankNicolsonStepper, u0.shape[0], k, h).step(u0, u1)
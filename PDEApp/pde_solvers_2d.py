@@ -0,0 +1,103 @@
+from __future__ import division
+import numpy as np
+import scipy.linalg as la
+
+import pde_constants
+import pde_solvers
+
+c_heat = pde_constants.heat_conductivity
+c_wave = pde_constants.wave_number
+
+# The 2D PDEs are discretized on the square [x_min,x_max]^2 with n x n gridpoints. The solution u is stored as n x n
+# array, where the row index corresponds to y and the column index corresponds to x. The first and the last row and
+# column hold the dirichlet boundary values, which do not change in time.
+#
+# The time stepping schemes use alternating direction implicit (ADI) splitting: instead of solving a linear system with
+# the 2D discretization matrix A_h = A_x + A_y, every timestep solves implicit systems with A_x and A_y only. These are
+# independent tridiagonal systems along the rows (x direction) and the columns (y direction) of the grid. All lines are
+# solved at once by scipy.linalg.solve_banded with several right hand sides, therefore a timestep costs O(n^2).
+
+
+def second_difference(u, axis):
+    """
+    applies the stencil [1 -2 1] along the given axis to the inner gridpoints.
+    :param u: n x n array
+    :param axis: 1 for x direction (along the rows), 0 for y direction (along the columns)
+    :return: n x n array, which is zero at the boundary
+    """
+    d = np.zeros_like(u)
+    if axis == 1:
+        d[1:-1, 1:-1] = u[1:-1, :-2] - 2 * u[1:-1, 1:-1] + u[1:-1, 2:]
+    else:
+        d[1:-1, 1:-1] = u[:-2, 1:-1] - 2 * u[1:-1, 1:-1] + u[2:, 1:-1]
+    return d
+
+
+def implicit_matrix(n, r):
+    """
+    assembles the matrix Id - r * [1 -2 1] in the ordered diagonal format of scipy.linalg.solve_banded. The first and
+    the last row are identity rows, therefore the dirichlet boundary values are kept.
+    :param n: number of gridpoints of a line
+    :param r: factor of the stencil
+    :return: 3 x n array
+    """
+    ab = np.zeros((3, n))
+    ab[0, 2:] = -r  # upper diagonal
+    ab[1, :] = 1 + 2 * r  # main diagonal
+    ab[2, :-2] = -r  # lower diagonal
+    ab[1, [0, -1]] = 1
+    return ab
+
+
+def solve_lines(ab, v, axis):
+    """
+    solves the tridiagonal system given by ab along every inner line of v at once.
+    :param ab: matrix in ordered diagonal format (see implicit_matrix)
+    :param v: n x n array, right hand sides
+    :param axis: 1 for solving along the rows (x direction), 0 for solving along the columns (y direction)
+    :return: n x n array holding the solutions. The boundary lines of v are copied.
+    """
+    u = np.array(v)
+    if axis == 1:
+        u[1:-1, :] = la.solve_banded((1, 1), ab, v[1:-1, :].T, check_finite=False).T
+    else:
+        u[:, 1:-1] = la.solve_banded((1, 1), ab, v[:, 1:-1], check_finite=False)
+    return u
+
+
+class ADIHeatStepper(pde_solvers.Stepper):
+    """
+    Peaceman-Rachford ADI scheme for the 2D heat equation u_t = c^2 * (u_xx + u_yy). Each timestep consists of two
+    half steps, which are implicit in one direction and explicit in the other direction:
+        (Id - k/2 * A_x) * u* = (Id + k/2 * A_y) * u^(j)
+        (Id - k/2 * A_y) * u^(j+1) = (Id + k/2 * A_x) * u*
+    The scheme is unconditionally stable and of second order in time and space.
+    """
+
+    def __init__(self, n, k, h):
+        pde_solvers.Stepper.__init__(self, n, k, h)
+        self.r = .5 * (c_heat ** 2) * k / (h ** 2)
+        self.ab = implicit_matrix(n, self.r)
+
+    def step(self, u0, u1):
+        u_half = solve_lines(self.ab, u1 + self.r * second_difference(u1, 0), 1)
+        return solve_lines(self.ab, u_half + self.r * second_difference(u_half, 1), 0)
+
+
+class ADIWaveStepper(pde_solvers.Stepper):
+    """
+    ADI scheme for the 2D wave equation u_tt = c^2 * (u_xx + u_yy) with the factorized implicit operator
+        (Id - k^2/4 * A_x) * (Id - k^2/4 * A_y) * (u^(j+1) - 2*u^(j) + u^(j-1)) = k^2 * (A_x + A_y) * u^(j)
+    The difference d = u^(j+1) - 2*u^(j) + u^(j-1) is computed by solving along the rows and then along the columns.
+    The scheme is unconditionally stable and of second order in time and space.
+    """
+
+    def __init__(self, n, k, h):
+        pde_solvers.Stepper.__init__(self, n, k, h)
+        self.r = (c_wave * k / h) ** 2
+        self.ab = implicit_matrix(n, .25 * self.r)
+
+    def step(self, u0, u1):
+        rhs = self.r * (second_difference(u1, 1) + second_difference(u1, 0))
+        d = solve_lines(self.ab, solve_lines(self.ab, rhs, 1), 0)
+        return 2 * u1 - u0 + d
@@ -5,133 +5,166 @@ Created on Sat Jul 11 22:04:14 2015
 @author: benjamin
 """
 
+from __future__ import division
+
 import logging
 
 logging.basicConfig(level=logging.DEBUG)
 
 import numpy as np
 
-from bokeh.models.widgets import HBox, Slider, RadioButtonGroup, VBoxForm, Dropdown
-from bokeh.models import Plot, ColumnDataSource
-from bokeh.properties import Instance, Color
-from bokeh.plotting import figure
+from bokeh.models import ColumnDataSource, Slider, RadioButtonGroup, TextInput
 from bokeh.models.mappers import LinearColorMapper
-
-from pde_settings import svg_palette_jet
-
-class PDEApp(HBox):
-    # ==============================================================================
-    # Only bokeh quantities for layout, data, controls... go here!
-    # ==============================================================================
-    extra_generated_classes = [["PDEApp", "PDEApp", "HBox"]]
-
-    # layout
-    controls = Instance(VBoxForm)
-
-    # controllable values
-    value1 = Instance(Slider)
-    value2 = Instance(Slider)
-
-    # plot
-    plot = Instance(Plot)
-
-    # data
-    source = Instance(ColumnDataSource)
-
-    @classmethod
-    def create(cls):
-        # ==============================================================================
-        # creates initial layout and data
-        # ==============================================================================
-        obj = cls()
-
-        # initialize data source
-        obj.source = ColumnDataSource(data=dict(z=[]))
-
-        # initialize controls
-        # slider controlling stepsize of the solver
-        obj.value2 = Slider(
-                title="value2", name='value2',
-                value=1, start=-1, end=+1, step=.1
-        )
-        # slider controlling initial value of the ode
-        obj.value1 = Slider(
-                title="value1", name='value1',
-                value=0, start=-1, end=+1, step=.1
-        )
-
-        # initialize plot
-        toolset = "crosshair,pan,reset,resize,wheel_zoom,box_zoom"
-        # Generate a figure container
-        plot = figure(title_text_font_size="12pt",
-                      plot_height=400,
-                      plot_width=400,
-                      tools=toolset,
-                      # title=obj.text.value,
-                      title="somestuff",
-                      x_range=[-1, 1],
-                      y_range=[-1, 1]
-                      )
-        # Plot the numerical solution by the x,t values in the source property
-
-        plot.image(image='z',
-                   x=-1, y=-1, dw=2, dh=2,
-                   #palette="Spectral11",
-                   color_mapper = LinearColorMapper(palette=svg_palette_jet,low=-2,high=2),
-                   source=obj.source
-                   )
-
-        obj.plot = plot
-        # calculate data
-        obj.update_data()
-
-        # lists all the controls in our app
-        obj.controls = VBoxForm(
-                children=[
-                    obj.value1, obj.value2
-                ]
-        )
-
-        # make layout
-        obj.children.append(obj.plot)
-        obj.children.append(obj.controls)
-
-        # don't forget to return!
-        return obj
-
-    def setup_events(self):
-        # ==============================================================================
-        # Here we have to set up the event behaviour.
-        # ==============================================================================
-        # recursively searches the right level?
-        if not self.value1:
-            return
-
-        # event registration
-        self.value2.on_change('value', self, 'input_change')
-        self.value1.on_change('value', self, 'input_change')
-
-    def input_change(self, obj, attrname, old, new):
-        # ==============================================================================
-        # This function is called if input changes
-        # ==============================================================================
-        print "input changed!"
-        self.update_data()
-
-    def update_data(self):
-        # ==============================================================================
-        # Updated the data respective to input
-        # ==============================================================================
-        print "updating data..."
-        v1 = self.value1.value
-        v2 = self.value2.value
-
-        N = 200
-        x,y = np.meshgrid(np.linspace(-1,1,N),np.linspace(-1,1,N))
-        z = v1*x**2 + v2*y**2
-
-        self.source.data = dict(z=[z.tolist()])
-
-        print "data was updated with parameters: v1=" + str(v1) + " and v2=" + str(v2)
-        print "new z:"
-        print z
+from bokeh.layouts import widgetbox, row
+from bokeh.plotting import Figure
+from bokeh.io import curdoc
+
+import pde_settings
+import pde_functions
+import pde_solvers
+
+
+def get_grid():
+    """
+    :return: x and y values of the gridpoints and meshwidth
+    """
+    x = np.linspace(pde_settings.x_min, pde_settings.x_max, pde_settings.n_grid)
+    x_grid, y_grid = np.meshgrid(x, x)
+    return x_grid, y_grid, x[1] - x[0]
+
+
+def get_heat_solution(t):
+    """
+    computes the solution of the heat equation for a given time. The timesteps are computed when they are requested
+    for the first time and kept as float32 arrays.
+    :param t: time
+    :return: solution u(x,y,t)
+    """
+    idx = int(round((t - pde_settings.t_min) / pde_settings.t_step, 0))
+    frames = problem_state['frames']
+    while len(frames) <= idx:
+        print "computing timestep " + str(len(frames)) + "."
+        problem_state['u'] = pde_solvers.heat_do_implicit_step(problem_state['u'], problem_state['f'],
+                                                               pde_settings.t_step, problem_state['h'],
+                                                               pde_settings.heat_conductivity,
+                                                               pde_settings.heat_tolerance)
+        frames.append(problem_state['u'].astype(np.float32))
+    return frames[idx]
+
+
+def update_plot():
+    """
+    updates the image w.r.t the current user input by updating the corresponding bokeh.models.ColumnDataSource
+    """
+    if pde_type.active == 0:  # Poisson equation
+        u = problem_state['poisson']
+    else:  # heat equation
+        u = get_heat_solution(time_slider.value)
+
+    # the colormap covers the values of the solution
+    low = float(u.min())
+    high = float(u.max())
+    if high <= low:
+        high = low + 1
+    color_mapper.low = low
+    color_mapper.high = high
+    source.data = dict(z=[u])
+    print "data was updated."
+
+
+def update_problem():
+    """
+    parses source term and boundary condition and solves the Poisson equation. The computed timesteps of the heat
+    equation are reset to the initial condition.
+    """
+    x_grid, y_grid, h = get_grid()
+    f = pde_functions.parse(source_term.value)(x_grid, y_grid)
+    g = pde_functions.parse(boundary_condition.value)(x_grid, y_grid)
+
+    print "solving Poisson equation."
+    poisson = pde_solvers.poisson_solve(f, g, h, pde_settings.tolerance).astype(np.float32)
+
+    # initial condition of the heat equation: zero inside of the domain, boundary values from g
+    u = np.zeros_like(f)
+    u[[0, -1], :] = g[[0, -1], :]
+    u[:, [0, -1]] = g[:, [0, -1]]
+
+    problem_state.update(f=f, h=h, poisson=poisson, u=u, frames=[u.astype(np.float32)])
+
+
+def input_change(attrname, old, new):
+    """
+    called if source term or boundary condition change
+    :param attrname: not used
+    :param old: not used
+    :param new: not used
+    """
+    update_problem()
+    update_plot()
+
+
+def view_change(attrname, old, new):
+    """
+    called if the pde type or the time change
+    :param attrname: not used
+    :param old: not used
+    :param new: not used
+    """
+    update_plot()
+
+
+# state of the problem. The solutions are kept on the server, only the plotted field is sent to the browser.
+problem_state = dict(f=None,  # source term
+                     h=None,  # meshwidth
+                     poisson=None,  # solution of the Poisson equation
+                     u=None,  # last computed timestep of the heat equation
+                     frames=[])  # computed timesteps of the heat equation
+
+# initialize data source
+source = ColumnDataSource(data=dict(z=[]))
+
+# initialize controls
+# text input for source term
+source_term = TextInput(value=pde_settings.f_init, title="source term f(x,y)")
+source_term.on_change('value', input_change)
+# text input for dirichlet boundary condition
+boundary_condition = TextInput(value=pde_settings.g_init, title="boundary condition g(x,y)")
+boundary_condition.on_change('value', input_change)
+# radiobuttons controlling pde type
+pde_type = RadioButtonGroup(labels=['Poisson', 'Heat'], active=0)
+pde_type.on_change('active', view_change)
+# slider for going though time of the heat equation
+time_slider = Slider(title="time", name='time', value=pde_settings.t_init, start=pde_settings.t_min,
+                     end=pde_settings.t_max, step=pde_settings.t_step)
+time_slider.on_change('value', view_change)
+
+# initialize plot
+toolset = "crosshair,pan,reset,resize,wheel_zoom,box_zoom"
+# Generate a figure container
+plot = Figure(plot_height=400,
+              plot_width=400,
+              tools=toolset,
+              title="Poisson and heat equation",
+              x_range=[pde_settings.x_min, pde_settings.x_max],
+              y_range=[pde_settings.x_min, pde_settings.x_max]
+              )
+
+# Plot the solution as image
+color_mapper = LinearColorMapper(palette=pde_settings.svg_palette_jet, low=-1, high=1)
+plot.image(image='z',
+           x=pde_settings.x_min,
+           y=pde_settings.x_min,
+           dw=pde_settings.x_max - pde_settings.x_min,
+           dh=pde_settings.x_max - pde_settings.x_min,
+           color_mapper=color_mapper,
+           source=source)
+
+# calculate data
+update_problem()
+update_plot()
+
+# lists all the controls in our app
+controls = widgetbox(source_term, boundary_condition, pde_type, time_slider, width=400)
+
+# make layout
+curdoc().add_root(row(plot, controls, width=800))
@@ -1,6 +1,5 @@
 from __future__ import division
 import numpy as np
-from bokeh.properties import Color, Seq, Enum
 
 red = (255,0,0,0)
 green = (0,255,0,0)
@@ -15,3 +14,26 @@ svg_palette_jet = ['#00008f', '#00009f', '#0000af', '#0000bf', '#0000cf', '#0000
                    '#ff9f00', '#ff8f00', '#ff7f00', '#ff6f00', '#ff5f00', '#ff4f00', '#ff3f00', '#ff2f00', '#ff1f00',
                    '#ff0f00', '#ff0000', '#ef0000', '#df0000', '#cf0000', '#bf0000', '#af0000', '#9f0000', '#8f0000',
                    '#7f0000']
+
+# the PDEs are solved on the square [x_min,x_max]^2 with n_grid x n_grid gridpoints. n_grid has to be 2**m + 1 for the
+# multigrid solver.
+x_min = -1.0
+x_max = 1.0
+n_grid = 2 ** 9 + 1
+
+# source term and dirichlet boundary condition. The default source term consists of two opposite charges.
+f_init = 'exp(-50*((x-.3)**2+y**2)) - exp(-50*((x+.3)**2+y**2))'
+g_init = '0'
+
+# reduction of the residual required from the multigrid solver
+tolerance = 1e-8
+
+# settings for the heat equation u_t = c^2 * (u_xx + u_yy) + f with u(t=0) = 0 inside of the domain. For t -> infinity
+# the solution converges to the solution of the Poisson equation. The timesteps are computed, when the time slider
+# reaches them; the temporal meshwidth equals the step of the time slider.
+heat_conductivity = 1.0
+heat_tolerance = 1e-6
+t_init = 0.0
+t_min = 0.0
+t_max = 0.5
+t_step = .02
@@ -0,0 +1,171 @@
+from __future__ import division
+import numpy as np
+
+# The 2D PDEs are discretized on the square [x_min,x_max]^2 with N x N gridpoints, where N = 2**m + 1. The first and
+# the last row and column of a grid hold the dirichlet boundary values. All solvers in this module solve the discretized
+# (shifted) Poisson equation
+#     sigma * u - A_h * u = f,
+# where A_h is the 5-point stencil 1/h^2 * [[0 1 0] [1 -4 1] [0 1 0]]. sigma = 0 gives the Poisson equation, sigma > 0
+# occurs in implicit time stepping schemes for the heat equation.
+
+# number of gauss-seidel sweeps before and after the coarse grid correction of a V-cycle
+n_presmooth = 2
+n_postsmooth = 2
+
+
+def laplace(u, h):
+    """
+    applies the 5-point stencil to the inner gridpoints.
+    :param u: N x N array
+    :param h: meshwidth
+    :return: N x N array holding A_h * u at the inner gridpoints and zero at the boundary
+    """
+    lu = np.zeros_like(u)
+    lu[1:-1, 1:-1] = (u[:-2, 1:-1] + u[2:, 1:-1] + u[1:-1, :-2] + u[1:-1, 2:] - 4 * u[1:-1, 1:-1]) / h ** 2
+    return lu
+
+
+def residual(u, f, h, sigma):
+    """
+    :param u: N x N array, current approximation of the solution
+    :param f: N x N array, right hand side
+    :param h: meshwidth
+    :param sigma: shift of the operator
+    :return: N x N array holding the residual f - (sigma * u - A_h * u) at the inner gridpoints and zero at the boundary
+    """
+    r = f - sigma * u + laplace(u, h)
+    r[[0, -1], :] = 0
+    r[:, [0, -1]] = 0
+    return r
+
+
+def gauss_seidel(u, f, h, sigma, n_sweeps):
+    """
+    does red-black gauss-seidel sweeps in place. The gridpoints are colored like a checkerboard; all points of one
+    color only depend on points of the other color, therefore each color is updated at once by numpy slicing.
+    :param u: N x N array, current approximation of the solution. The boundary values are not changed.
+    :param f: N x N array, right hand side
+    :param h: meshwidth
+    :param sigma: shift of the operator
+    :param n_sweeps: number of sweeps
+    """
+    n = u.shape[0]
+    diagonal = sigma + 4 / h ** 2
+    for _ in range(n_sweeps):
+        for color in [((1, 1), (2, 2)), ((1, 2), (2, 1))]:  # red points, then black points
+            for si, sj in color:
+                rows = slice(si, n - 1, 2)
+                cols = slice(sj, n - 1, 2)
+                neighbours = u[si - 1:n - 2:2, cols] + u[si + 1:n:2, cols] + \
+                    u[rows, sj - 1:n - 2:2] + u[rows, sj + 1:n:2]
+                u[rows, cols] = (f[rows, cols] + neighbours / h ** 2) / diagonal
+
+
+def restrict(r):
+    """
+    restricts a fine grid function to the next coarser grid by full weighting. The gridpoint (i,j) of the coarse grid
+    coincides with the gridpoint (2i,2j) of the fine grid.
+    :param r: N x N array with zero boundary
+    :return: (N+1)/2 x (N+1)/2 array with zero boundary
+    """
+    n_coarse = (r.shape[0] + 1) // 2
+    rc = np.zeros((n_coarse, n_coarse))
+    rc[1:-1, 1:-1] = (4 * r[2:-2:2, 2:-2:2] +
+                      2 * (r[1:-3:2, 2:-2:2] + r[3:-1:2, 2:-2:2] + r[2:-2:2, 1:-3:2] + r[2:-2:2, 3:-1:2]) +
+                      r[1:-3:2, 1:-3:2] + r[1:-3:2, 3:-1:2] + r[3:-1:2, 1:-3:2] + r[3:-1:2, 3:-1:2]) / 16
+    return rc
+
+
+def prolongate(ec):
+    """
+    interpolates a coarse grid function bilinearly to the next finer grid.
+    :param ec: N x N array
+    :return: 2N-1 x 2N-1 array
+    """
+    n_fine = 2 * ec.shape[0] - 1
+    e = np.zeros((n_fine, n_fine))
+    e[::2, ::2] = ec
+    e[1::2, ::2] = .5 * (ec[:-1, :] + ec[1:, :])
+    e[::2, 1::2] = .5 * (ec[:, :-1] + ec[:, 1:])
+    e[1::2, 1::2] = .25 * (ec[:-1, :-1] + ec[1:, :-1] + ec[:-1, 1:] + ec[1:, 1:])
+    return e
+
+
+def v_cycle(u, f, h, sigma):
+    """
+    does one multigrid V-cycle in place: presmoothing, recursive correction on the next coarser grid and postsmoothing.
+    On the coarsest grid with a single inner gridpoint the equation is solved exactly.
+    :param u: N x N array, current approximation of the solution
+    :param f: N x N array, right hand side
+    :param h: meshwidth
+    :param sigma: shift of the operator
+    """
+    if u.shape[0] <= 3:
+        u[1:-1, 1:-1] = (f[1:-1, 1:-1] + (u[:-2, 1:-1] + u[2:, 1:-1] + u[1:-1, :-2] + u[1:-1, 2:]) / h ** 2) / \
+                        (sigma + 4 / h ** 2)
+        return
+    gauss_seidel(u, f, h, sigma, n_presmooth)
+    rc = restrict(residual(u, f, h, sigma))
+    ec = np.zeros_like(rc)
+    v_cycle(ec, rc, 2 * h, sigma)
+    u += prolongate(ec)
+    gauss_seidel(u, f, h, sigma, n_postsmooth)
+
+
+def multigrid_solve(u, f, h, sigma=0.0, tolerance=1e-8, max_cycles=50):
+    """
+    solves sigma * u - A_h * u = f by multigrid V-cycles. Each V-cycle costs O(N^2) operations and reduces the error by
+    a constant factor independent of h, therefore the solution costs O(N^2) operations.
+    :param u: N x N array, initial guess holding the dirichlet boundary values. The solution is written to u.
+    :param f: N x N array, right hand side
+    :param h: meshwidth
+    :param sigma: shift of the operator
+    :param tolerance: the iteration stops, if the maximum norm of the residual is reduced by this factor
+    :param max_cycles: maximum number of V-cycles
+    :return: number of V-cycles
+    """
+    r0 = np.max(np.abs(residual(u, f, h, sigma)))
+    for cycle in range(max_cycles):
+        if np.max(np.abs(residual(u, f, h, sigma))) <= tolerance * r0:
+            return cycle
+        v_cycle(u, f, h, sigma)
+    return max_cycles
+
+
+def poisson_solve(f, g, h, tolerance=1e-8):
+    """
+    solves the 2D Poisson equation
+        -(u_xx + u_yy) = f
+    with dirichlet boundary conditions u = g.
+    :param f: N x N array, right hand side
+    :param g: N x N array holding the boundary values in its first and last row and column
+    :param h: meshwidth
+    :param tolerance: reduction of the residual (see multigrid_solve)
+    :return: N x N array, solution u
+    """
+    u = np.zeros_like(f)
+    u[[0, -1], :] = g[[0, -1], :]
+    u[:, [0, -1]] = g[:, [0, -1]]
+    multigrid_solve(u, f, h, 0.0, tolerance)
+    return u
+
+
+def heat_do_implicit_step(u0, f, k, h, c=1.0, tolerance=1e-6):
+    """
+    Does one timestep of the implicit euler scheme for the 2D heat equation
+        u_t = c^2 * (u_xx + u_yy) + f
+    The implicit equation
+        (u1 - u0) / k = c^2 * A_h * u1 + f
+    ->  1 / (k * c^2) * u1 - A_h * u1 = (u0 / k + f) / c^2
+    is a shifted Poisson equation, which is solved by multigrid starting from u0. The boundary values of u0 are kept.
+    :param u0: N x N array, solution u(x,y,t=t)
+    :param f: N x N array, source term
+    :param k: temporal meshwidth
+    :param h: spatial meshwidth
+    :param c: heat conductivity
+    :param tolerance: reduction of the residual (see multigrid_solve)
+    :return: u1: solution u(x,y,t=t+k)
+    """
+    u1 = np.array(u0)
+    multigrid_solve(u1, (u0 / k + f) / c ** 2, h, 1 / (k * c ** 2), tolerance)
+    return u1